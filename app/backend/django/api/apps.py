@@ -1,9 +1,29 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def servesRequests() -> bool:
+    """
+    False for manage.py commands (migrations, tests, the inference server, ...) and for the file-watching
+    parent process of runserver, which never handle requests.
+    """
+    if os.path.basename(sys.argv[0]) != "manage.py":
+        return True
+    if sys.argv[1:2] != ["runserver"]:
+        return False
+    return os.environ.get("RUN_MAIN") == "true" or "--noreload" in sys.argv
+
+
 class AuthConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
     
     def ready(self):
-        import api.document_models
\ No newline at end of file
+        import api.document_models
+
+        # Serving processes can load their models at startup instead of on the first request (MODEL_WARMUP)
+        if servesRequests():
+            from models.ModelRegistry import warmupFromEnvironment
+            warmupFromEnvironment()
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from models.MeshDictionary import MESH_DICTIONARY_DIR, buildMeshDictionary
+
+
+class Command(BaseCommand):
+    help = "Compiles the canonical names and aliases of scispaCy's MeSH knowledge base into the MeSH dictionary."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=str(MESH_DICTIONARY_DIR),
+            help="Directory of the dictionary (defaults to MESH_DICTIONARY_DIR).",
+        )
+        parser.add_argument(
+            "--min-length",
+            type=int,
+            default=3,
+            help="Names shorter than this many characters are not matched.",
+        )
+
+    def handle(self, *args, **options):
+        from scispacy.candidate_generation import DEFAULT_KNOWLEDGE_BASES
+        kb = DEFAULT_KNOWLEDGE_BASES["mesh"]()
+        stats = buildMeshDictionary(
+            ((entity.canonical_name, entity.aliases) for entity in kb.cui_to_entity.values()),
+            Path(options["output"]),
+            min_length=options["min_length"],
+        )
+        self.stdout.write(
+            f"Wrote {stats['names']} names of {stats['concepts']} MeSH concepts ({stats['nodes']} nodes) to {options['output']}"
+        )
@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from models.MeshConceptIndex import MESH_INDEX_DIR, buildMeshConceptIndex
+
+
+class Command(BaseCommand):
+    help = "Embeds the canonical names and aliases of scispaCy's MeSH knowledge base into the MeSH concept index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=str(MESH_INDEX_DIR),
+            help="Directory of the index (defaults to MESH_INDEX_DIR).",
+        )
+        parser.add_argument("--batch-size", type=int, default=256, help="Names embedded per batch.")
+        parser.add_argument(
+            "--min-length",
+            type=int,
+            default=3,
+            help="Names shorter than this many characters are not indexed.",
+        )
+
+    def handle(self, *args, **options):
+        from scispacy.candidate_generation import DEFAULT_KNOWLEDGE_BASES
+        from models.EmbeddingModels import default_embeddingModel_instance
+        kb = DEFAULT_KNOWLEDGE_BASES["mesh"]()
+        stats = buildMeshConceptIndex(
+            ((entity.canonical_name, entity.aliases) for entity in kb.cui_to_entity.values()),
+            default_embeddingModel_instance,
+            Path(options["output"]),
+            batch_size=options["batch_size"],
+            min_length=options["min_length"],
+        )
+        self.stdout.write(
+            f"Embedded {stats['names']} names of {stats['concepts']} MeSH concepts with {stats['model']} into {options['output']}"
+        )
@@ -0,0 +1,27 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from models.InferenceClient import inferenceServerAuthkey
+from models.InferenceServer import InferenceServer
+
+
+class Command(BaseCommand):
+    help = "Serves the embedding, entailment and MeSH linking models to all web workers over a Unix socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket",
+            default=os.getenv("INFERENCE_SERVER_SOCKET", "/tmp/seba-inference/inference.sock"),
+            help="Path of the Unix socket, in a directory closed to other users (defaults to INFERENCE_SERVER_SOCKET).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=int(os.getenv("INFERENCE_WORKERS", "1")),
+            help="Number of model-owning worker processes (defaults to INFERENCE_WORKERS or 1).",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Serving inference on {options['socket']} with {options['workers']} worker(s)")
+        InferenceServer(options["socket"], workers=options["workers"], authkey=inferenceServerAuthkey()).serve_forever()
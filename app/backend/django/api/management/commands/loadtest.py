@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand
+
+from services.load_test import ENDPOINTS, format_report, run_load_test
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives the LLM endpoints of a running backend at a fixed concurrency and reports throughput and "
+        "p50/p95/p99 latency. Start the backend against 'python manage.py mock_openai' to test without API spend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the backend.")
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            choices=sorted(ENDPOINTS),
+            help="Endpoint to test; repeat for several (defaults to all, one after the other).",
+        )
+        parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight at once.")
+        parser.add_argument("--documents", type=int, default=10, help="Documents per request.")
+        parser.add_argument(
+            "--repeat-queries",
+            action="store_true",
+            help="Send the same query and documents every time, to measure cached responses.",
+        )
+        parser.add_argument("--timeout", type=float, default=300, help="Seconds before a request counts as failed.")
+        parser.add_argument("--json", action="store_true", help="Print the reports as JSON.")
+
+    def handle(self, *args, **options):
+        reports = []
+        for endpoint in options["endpoint"] or list(ENDPOINTS):
+            result = asyncio.run(run_load_test(
+                options["url"],
+                endpoint,
+                requests=options["requests"],
+                concurrency=options["concurrency"],
+                documents=options["documents"],
+                distinct_queries=not options["repeat_queries"],
+                timeout=options["timeout"],
+            ))
+            reports.append(result)
+            if not options["json"]:
+                self.stdout.write(format_report(result))
+        if options["json"]:
+            self.stdout.write(json.dumps(reports, indent=2))
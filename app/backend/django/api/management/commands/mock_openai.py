@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from services.mock_openai import MockBehaviour, create_app
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves a mock OpenAI chat completions API with deterministic answers, for load tests without API spend. "
+        "Point the backend at it with OPENAI_BASE_URL=http://<host>:<port>/v1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8090)
+        parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token.")
+        parser.add_argument("--jitter", type=float, default=0.2, help="Up to this many seconds are added to --latency.")
+        parser.add_argument(
+            "--tokens-per-second",
+            type=float,
+            default=50.0,
+            help="Generation speed after the first token (0 answers at once).",
+        )
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail, e.g. 0.05.")
+        parser.add_argument("--error-status", type=int, default=429, help="Status of failed requests (429 or 5xx).")
+        parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of injected 429 responses.")
+        parser.add_argument("--seed", type=int, default=None, help="Seed of latency jitter and error injection.")
+
+    def handle(self, *args, **options):
+        from aiohttp import web
+        behaviour = MockBehaviour(
+            latency=options["latency"],
+            jitter=options["jitter"],
+            tokens_per_second=options["tokens_per_second"],
+            error_rate=options["error_rate"],
+            error_status=options["error_status"],
+            retry_after=options["retry_after"],
+            seed=options["seed"],
+        )
+        self.stdout.write(f"Mock OpenAI API at http://{options['host']}:{options['port']}/v1")
+        web.run_app(create_app(behaviour), host=options["host"], port=options["port"], print=None)
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from models.OnnxModels import (
+    SAMPLE_TEXTS,
+    OnnxEmbeddingModel,
+    OnnxEntailmentModel,
+    embeddingParity,
+    entailmentParity,
+    exportEmbeddingModel,
+    exportEntailmentModel,
+    quantize,
+    samplePairs,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the embedding and entailment models to ONNX (optionally int8-quantized) and reports their drift "
+        "against the PyTorch models."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", choices=["embedding", "entailment", "all"], default="all")
+        parser.add_argument("--quantize", action="store_true", help="Also write a dynamically int8-quantized model.")
+        parser.add_argument("--no-check", action="store_true", help="Skip the parity check.")
+        parser.add_argument("--sample-file", help="Texts for the parity check, one per line (defaults to built-in samples).")
+        parser.add_argument(
+            "--min-cosine", type=float, default=0.99,
+            help="Fail if any embedding's cosine similarity to the PyTorch embedding is lower.",
+        )
+        parser.add_argument(
+            "--max-probability-drift", type=float, default=0.05,
+            help="Fail if any entailment probability differs more from the PyTorch probability.",
+        )
+
+    def handle(self, *args, **options):
+        texts = SAMPLE_TEXTS
+        if options["sample_file"]:
+            with open(options["sample_file"]) as f:
+                texts = [line.strip() for line in f if line.strip()]
+        variants = [False, True] if options["quantize"] else [False]
+        failures = []
+
+        if options["model"] in ("embedding", "all"):
+            from models.EmbeddingModels import sPubMedBERT
+            reference = sPubMedBERT()
+            directory = exportEmbeddingModel(reference)
+            self.stdout.write(f"Exported {reference.identifier} to {directory}")
+            if options["quantize"]:
+                quantize(directory)
+            if not options["no_check"]:
+                for quantized in variants:
+                    candidate = OnnxEmbeddingModel(directory, quantized=quantized)
+                    report = embeddingParity(reference, candidate, texts)
+                    self.stdout.write(f"{candidate.identifier}: {report}")
+                    if report["min_cosine"] < options["min_cosine"]:
+                        failures.append(candidate.identifier)
+
+        if options["model"] in ("entailment", "all"):
+            from models.EntailmentModels import DeBERTaFinetunedHealth
+            reference = DeBERTaFinetunedHealth()
+            directory = exportEntailmentModel(reference)
+            self.stdout.write(f"Exported {reference.identifier} to {directory}")
+            if options["quantize"]:
+                quantize(directory)
+            if not options["no_check"]:
+                for quantized in variants:
+                    candidate = OnnxEntailmentModel(directory, quantized=quantized)
+                    report = entailmentParity(reference, candidate, samplePairs(texts))
+                    self.stdout.write(f"{candidate.identifier}: {report}")
+                    if report["max_probability_drift"] > options["max_probability_drift"]:
+                        failures.append(candidate.identifier)
+
+        if failures:
+            raise CommandError(f"Parity check failed for {', '.join(failures)}; keep the 'torch' backend for these models.")
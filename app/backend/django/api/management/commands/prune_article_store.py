@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from services.article_store import default_article_store
+
+
+class Command(BaseCommand):
+    help = "Deletes article records older than ARTICLE_STORE_RETENTION and the XML no record points to anymore."
+
+    def handle(self, *args, **options):
+        articles, blobs = default_article_store.prune()
+        self.stdout.write(f"Deleted {articles} records and {blobs} XML versions from {default_article_store.path}")
@@ -6,9 +6,9 @@ from rest_framework.response import Response
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
-import requests
-from xml.etree import ElementTree
-import os
+import httpx
+from services.article_store import fetch_articles
+from services.background_loop import run_sync
 
 def enrich_metadata(pmids: List[str]) -> List[Dict]:
     sch = SemanticScholar()
@@ -75,27 +75,19 @@ def get_document_metadata(request, pmid):
 def get_pubmed_document_metadata(request, pmid):
     """API endpoint to get document metadata by a single PMID."""
     try:
-        fetch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
-        fetch_params = {
-            "db": "pubmed",
-            "id": pmid,
-            "retmode": "xml",
-            "api_key": os.getenv("PUBMED_API_KEY")
-        }
-        fetch_response = requests.get(fetch_url, params=fetch_params)
-        
-        if fetch_response.status_code != 200:
+        # Served from the local article store; only unknown or stale PMIDs go to efetch
+        try:
+            records = run_sync(fetch_articles)([pmid])
+        except httpx.HTTPStatusError:
             return Response({"error": "Failed to fetch metadata"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        root = ElementTree.fromstring(fetch_response.content)
-        article = root.find(".//PubmedArticle")
-        
-        if article is None:
+        if not records:
             return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        title = article.findtext(".//ArticleTitle")
-        abstract = article.findtext(".//Abstract/AbstractText")
-        pub_date = article.findtext(".//PubDate/Year") or article.findtext(".//PubDate/MedlineDate")
+        article = records[0]
+        title = article.title
+        abstract = article.firstAbstractText
+        pub_date = article.year or article.medlineDate
 
         document_data = {
             "pmid": pmid,
@@ -0,0 +1,10 @@
+from django.http import HttpRequest, HttpResponse
+from django.views.decorators.http import require_GET
+
+from services.timing import render_metrics
+
+
+@require_GET
+def metrics(request: HttpRequest) -> HttpResponse:
+    """Stage and request latency histograms of this worker process, in the Prometheus text format."""
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,49 @@
+import json
+
+from django.http import HttpRequest, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from models.ModelRegistry import default_model_registry, registerDefaultModels
+
+LOOPBACK_ADDRESSES = ("127.0.0.1", "::1")
+
+
+def _may_warm_up(request: HttpRequest) -> bool:
+    """Warmups are for readiness hooks on the same host and for staff users."""
+    user = getattr(request, "user", None)
+    return request.META.get("REMOTE_ADDR") in LOOPBACK_ADDRESSES or bool(user and user.is_staff)
+
+
+@require_GET
+def get_model_status(request: HttpRequest) -> JsonResponse:
+    """Which registered models this worker process has loaded."""
+    registerDefaultModels()
+    return JsonResponse({"models": default_model_registry.loaded()})
+
+
+@csrf_exempt
+@require_POST
+def warmup_models(request: HttpRequest) -> JsonResponse:
+    """
+    Loads the models named in the optional body {"models": [...]} (all registered models by default) and
+    returns the seconds each load took. Intended for readiness hooks of serving processes, so only requests
+    from the local host or from staff users are served.
+    """
+    if not _may_warm_up(request):
+        return JsonResponse({"error": "Model warmup is restricted to local and staff requests"}, status=403)
+    registerDefaultModels()
+    try:
+        has_body = request.content_type == "application/json" and request.body
+        names = json.loads(request.body).get("models") if has_body else None
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    if names is not None and not (isinstance(names, list) and all(isinstance(name, str) for name in names)):
+        return JsonResponse({"error": "'models' must be a list of model names"}, status=400)
+
+    unknown = [name for name in names or [] if name not in default_model_registry.names()]
+    if unknown:
+        return JsonResponse({"error": f"Unknown models: {', '.join(unknown)}"}, status=400)
+
+    timings = default_model_registry.warmup(names)
+    return JsonResponse({"loadSeconds": timings, "models": default_model_registry.loaded()})
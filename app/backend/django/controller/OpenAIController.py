@@ -3,7 +3,7 @@ from django.views.decorators.http import require_GET, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.response import Response
 from dotenv import load_dotenv
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from models.Document import Document
 import os
 import re
@@ -11,48 +11,63 @@ import json
 import openai 
 load_dotenv()
 
-from django.http import HttpResponse, HttpRequest, JsonResponse
+from django.http import HttpResponse, HttpRequest, HttpResponseNotAllowed, JsonResponse
 from typing import List
-from openai import AsyncOpenAI
 import os
-from asgiref.sync import async_to_sync
+import asyncio
+import time
+from services.background_loop import run_sync
+from services.timing import record_stage, stage
+from services.event_stream import streaming_response
+from services.singleflight import SingleFlight, request_key
+from services.openai_client import OPENAI_MODEL, count_tokens, default_openai_client
+from services.memo_cache import MemoCache
+
+# Identical concurrent prompts (e.g. many users summarizing the same results) share one completion
+completion_flight = SingleFlight()
+# Completions are reused for identical prompts and parameters: the last LLM_CACHE_MAX_ENTRIES in each process,
+# and for LLM_CACHE_TTL seconds in the shared 'llm_completions' cache (size-bounded by its MAX_ENTRIES)
+completion_cache = MemoCache(
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+    alias="llm_completions",
+    timeout=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+
+# Summaries of documents beyond this many tokens are written from the findings of chunks of this many tokens
+SUMMARY_DOCUMENT_TOKEN_BUDGET = int(os.getenv("SUMMARY_DOCUMENT_TOKEN_BUDGET", "12000"))
+SUMMARY_CHUNK_TOKEN_BUDGET = int(os.getenv("SUMMARY_CHUNK_TOKEN_BUDGET", "4000"))
+SUMMARY_FINDINGS_MAX_TOKENS = int(os.getenv("SUMMARY_FINDINGS_MAX_TOKENS", "500"))
+
+# How /openai/agreeableness rates documents by default, see 'assess_agreeableness'
+AGREEABLENESS_MODES = ("llm", "local", "hybrid")
+AGREEABLENESS_MODE = os.getenv("AGREEABLENESS_MODE", "llm")
+AGREEABLENESS_MIN_CONFIDENCE = float(os.getenv("AGREEABLENESS_MIN_CONFIDENCE", "0.6"))
+
+def completion_key(messages: list, temperature: float, max_tokens: int) -> str:
+    return request_key("completion", OPENAI_MODEL, temperature, max_tokens, messages)
+
+async def coalescedCompletion(messages: list, temperature: float = 0.5, max_tokens: int = 900) -> str:
+    """A completion from the cache, or shared with identical concurrent prompts, or else a new one."""
+    key = completion_key(messages, temperature, max_tokens)
+    if LLM_CACHE_ENABLED:
+        cached = completion_cache.get(key)
+        if cached is not None:
+            return cached
+    completion = await completion_flight.do(key, lambda: genericCompletion(messages, temperature, max_tokens))
+    if LLM_CACHE_ENABLED and completion:
+        completion_cache.set(key, completion)
+    return completion
             
-async def genericCompletion(messages: list) -> str: #TODO
-    client = AsyncOpenAI(api_key="INSERT_API_KEY")
+async def genericCompletion(messages: list, temperature: float = 0.5, max_tokens: int = 900) -> str:
+    # Pooled, paced and retried; see services/openai_client.py
     try:
-        response = await client.chat.completions.create(
-            model="gpt-5-chat-latest",
-            messages=messages,
-            temperature=0.5,
-            max_tokens=900
-        )
-        return response.choices[0].message.content
+        return await default_openai_client.complete(messages, temperature=temperature, max_tokens=max_tokens)
     except Exception as e:
         print(f"Error in genericCompletion: {str(e)}")
         raise Exception(f"Error generating completion: {str(e)}")
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def get_summary(request):
-    @async_to_sync
-    async def process_summary():
-        data = json.loads(request.body)
-        query = data.get('query')
-        documents = data.get('documents', [])
-        
-        formatted_docs = []
-
-        for idx, doc in enumerate(documents):
-            try:
-                abstract = doc.get('abstract', '')
-                doc_id = str(hash(abstract))
-                formatted_docs.append((doc_id, abstract))
-            except Exception as e:
-                print(f"Error processing document {idx + 1}: {str(e)}")
-                continue
-
-        messages = [
-    {"role": "system", "content": """
+SUMMARY_SYSTEM_MESSAGE = {"role": "system", "content": """
     Format:
     [Answer to the question based on the documents in one sentence]
     [Grouping of documents into clear categories with a heading; one sentence summary for each category of grouped documents with references (e.g. [1])]
@@ -72,22 +87,221 @@ def get_summary(request):
 ### Complexities and Considerations
 - **Individual Variability**: The health impact of sitting may vary based on individual activity levels, indicating that for some individuals, particularly those who are already active, the effects of sitting may not be as pronounced ([2], [8]).
 - **Need for Research**: There is a call for more consistent evidence and clearer guidelines regarding sedentary behavior, as current recommendations may not adequately reflect the complexities of sitting's health impacts ([3], [12]).
+    """}
+
+def formatted_documents(documents: List[dict]) -> List[str]:
+    """The abstracts of 'documents'; prompts refer to them by their 1-based position."""
+    formatted_docs = []
+
+    for idx, doc in enumerate(documents):
+        try:
+            formatted_docs.append(doc.get('abstract', ''))
+        except Exception as e:
+            print(f"Error processing document {idx + 1}: {str(e)}")
+            continue
+    return formatted_docs
+
+def summary_messages(query: str, documents: List[dict]) -> List[dict]:
+    """The prompt for a categorized summary of 'documents' answering 'query', citing them as [1], [2], ..."""
+    return [
+        SUMMARY_SYSTEM_MESSAGE,
+        {"role": "user", "content": f"Query: {query}\n\nDocuments:\n{parse_documents_for_summary(formatted_documents(documents))}"}
+    ]
+
+def chunk_documents(formatted_docs: List[str], budget: int) -> List[List[Tuple[int, str]]]:
+    """
+    Splits documents, with their 1-based numbers, into consecutive chunks of at most 'budget' tokens of prompt text
+    (a single larger document is a chunk of its own).
+    """
+    chunks = []
+    chunk, used = [], 0
+    for number, doc in enumerate(formatted_docs, 1):
+        tokens = count_tokens(parse_documents_for_summary([doc], start=number))
+        if chunk and used + tokens > budget:
+            chunks.append(chunk)
+            chunk, used = [], 0
+        chunk.append((number, doc))
+        used += tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+def findings_messages(query: str, chunk: List[Tuple[int, str]]) -> List[dict]:
+    """The prompt of the map step: the findings of one chunk of documents, cited by their global numbers."""
+    documents = "".join(parse_documents_for_summary([doc], start=number) for number, doc in chunk)
+    return [
+        {"role": "system", "content": """
+    List the findings of the documents that help answer the query, one short bullet point per finding.
+    End every bullet point with the numbers of the documents it is based on, exactly as they are numbered below (e.g. [12] or [12], [15]).
+    Skip documents that are not related to the query.
     """},
+        {"role": "user", "content": f"Query: {query}\n\nDocuments:\n{documents}"}
+    ]
+
+def chunk_findings(findings: List[str], budget: int) -> List[List[str]]:
+    """Splits findings into consecutive groups of at most 'budget' tokens (a single larger one is a group of its own)."""
+    groups = []
+    group, used = [], 0
+    for finding in findings:
+        tokens = count_tokens(finding)
+        if group and used + tokens > budget:
+            groups.append(group)
+            group, used = [], 0
+        group.append(finding)
+        used += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+def merge_findings_messages(query: str, findings: List[str]) -> List[dict]:
+    """The prompt of a reduce step: fewer findings with the same content and citations."""
+    return [
+        {"role": "system", "content": """
+    Merge the findings below into fewer short bullet points that help answer the query, combining findings that say the same.
+    End every bullet point with the numbers of all documents its findings cite, exactly as they are cited below (e.g. [12] or [12], [15]).
+    """},
+        {"role": "user", "content": f"Query: {query}\n\nFindings:\n" + "\n".join(findings)}
+    ]
+
+async def summary_prompt(query: str, documents: List[dict]) -> List[dict]:
+    """
+    The prompt of the summary. Documents that fit SUMMARY_DOCUMENT_TOKEN_BUDGET are summarized in one call;
+    larger sets are first reduced to findings chunk by chunk, concurrently, and the summary is written from
+    those findings, which cite the documents by the same numbers. Findings that still exceed the budget are
+    merged group by group, again concurrently, until they fit.
+    """
+    formatted_docs = formatted_documents(documents)
+    if count_tokens(parse_documents_for_summary(formatted_docs)) <= SUMMARY_DOCUMENT_TOKEN_BUDGET:
+        return summary_messages(query, documents)
+
+    chunks = chunk_documents(formatted_docs, SUMMARY_CHUNK_TOKEN_BUDGET)
+    with stage("openai_summary_map"):
+        findings = await asyncio.gather(*(
+            coalescedCompletion(findings_messages(query, chunk), max_tokens=SUMMARY_FINDINGS_MAX_TOKENS)
+            for chunk in chunks
+        ))
+    findings = [finding.strip() for finding in findings]
+
+    while count_tokens("\n".join(findings)) > SUMMARY_DOCUMENT_TOKEN_BUDGET:
+        groups = chunk_findings(findings, SUMMARY_CHUNK_TOKEN_BUDGET)
+        # Merging single findings would not shorten them reliably, so stop once no group combines any
+        if len(groups) == len(findings):
+            break
+        with stage("openai_summary_reduce"):
+            merged = await asyncio.gather(*(
+                coalescedCompletion(merge_findings_messages(query, group), max_tokens=SUMMARY_FINDINGS_MAX_TOKENS)
+                for group in groups
+            ))
+        findings = [finding.strip() for finding in merged]
+
+    return [
+        SUMMARY_SYSTEM_MESSAGE,
+        {"role": "user", "content": (
+            f"Query: {query}\n\n"
+            f"Findings of {len(formatted_docs)} documents, each citing the documents by number:\n"
+            + "\n".join(findings)
+        )}
+    ]
+
+async def summarize(query: str, documents: List[dict]) -> dict:
+    messages = await summary_prompt(query, documents)
+
+    with stage("openai_summary"):
+        summary = await coalescedCompletion(messages)
+
+    return {
+        "summary": summary,
+    }
 
-    {"role": "user", "content": f"Query: {query}\n\nDocuments:\n{parse_documents_for_summary(formatted_docs)}"}
-]
-
-        summary = await genericCompletion(messages)
-       
-        return {
-            "summary": summary,
-        }
+@csrf_exempt
+@require_http_methods(["POST"])
+def get_summary(request):
     try:
-        result = process_summary()
+        data = json.loads(request.body)
+        result = run_sync(summarize)(data.get('query'), data.get('documents', []))
         return JsonResponse(result)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=400)
     
+class CitationParser:
+    """
+    Finds citation markers ('[4]', '[1, 3]') in a text that arrives in pieces; a marker split across pieces is
+    recognized once its closing bracket arrives.
+    """
+    MARKER = re.compile(r"\[(\d+(?:\s*,\s*\d+)*)\]")
+    PARTIAL = re.compile(r"\[[\d,\s]*$")
+    MAX_PARTIAL_LENGTH = 32
+
+    def __init__(self):
+        self.citations: List[int] = []
+        self._pending = ""
+
+    def feed(self, text: str) -> List[int]:
+        """Returns the document numbers cited for the first time in 'text', in order of appearance."""
+        buffer = self._pending + text
+        new = []
+        end = 0
+        for match in self.MARKER.finditer(buffer):
+            for number in re.findall(r"\d+", match.group(1)):
+                if int(number) not in self.citations:
+                    self.citations.append(int(number))
+                    new.append(int(number))
+            end = match.end()
+        partial = self.PARTIAL.search(buffer, end)
+        self._pending = partial.group(0) if partial and len(partial.group(0)) <= self.MAX_PARTIAL_LENGTH else ""
+        return new
+
+async def replay(text: str):
+    """A cached completion as a stream of one delta."""
+    yield text
+
+async def summary_events(query: str, documents: List[dict]):
+    """
+    Events of a streamed summary: 'delta' for every piece of generated text, 'citation' when a document is cited
+    for the first time, then 'done' with the full summary, or 'error'.
+    """
+    parser = CitationParser()
+    parts = []
+    start = time.perf_counter()
+    try:
+        # The same prompt as get_summary, so either endpoint reuses the other's cached summary
+        messages = await summary_prompt(query, documents)
+        key = completion_key(messages, 0.5, 900)
+        cached = completion_cache.get(key) if LLM_CACHE_ENABLED else None
+        deltas = replay(cached) if cached is not None else default_openai_client.stream(messages, temperature=0.5, max_tokens=900)
+        async for delta in deltas:
+            if not parts:
+                record_stage("openai_summary_first_token", time.perf_counter() - start)
+            parts.append(delta)
+            yield {"event": "delta", "text": delta}
+            for number in parser.feed(delta):
+                pmid = documents[number - 1].get("pmid") if 0 < number <= len(documents) else None
+                yield {"event": "citation", "document": number, "pmid": pmid}
+        record_stage("openai_summary_stream", time.perf_counter() - start)
+        summary = "".join(parts)
+        if LLM_CACHE_ENABLED and cached is None and summary:
+            completion_cache.set(key, summary)
+        yield {"event": "done", "summary": summary, "citations": parser.citations}
+    except Exception as e:
+        print(f"Error in summary_events: {str(e)}")
+        yield {"event": "error", "error": str(e)}
+
+async def stream_summary(request):
+    """
+    Streaming variant of get_summary: generated text is forwarded as Server-Sent Events while the model writes,
+    so the first words arrive after the time-to-first-token instead of the full completion.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return streaming_response(summary_events(data.get('query'), data.get('documents', [])), "sse")
+
+# Django 4.2's 'csrf_exempt' does not preserve async views; the middleware only checks this attribute
+stream_summary.csrf_exempt = True
+
 def extract_document_summaries(text: str) -> List[str]:
     # Split by newline and remove empty strings
     lines = [line.strip() for line in text.split('\n') if line.strip()]
@@ -100,27 +314,11 @@ def extract_document_summaries(text: str) -> List[str]:
             summaries.append(summary)
     return summaries
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def get_document_summaries(request):
-    @async_to_sync
-    async def process_document_summaries():
-        data = json.loads(request.body)
-        query = data.get('query')
-        documents = data.get('documents', [])
-        
-        formatted_docs = []
-        for idx, doc in enumerate(documents):
-            try:
-                abstract = doc.get('abstract', '')
-                doc_id = str(hash(abstract))
-                formatted_docs.append((doc_id, abstract))
-            except Exception as e:
-                print(f"Error processing document {idx + 1}: {str(e)}")
-                continue
+async def summarize_documents(query: str, documents: List[dict]) -> dict:
+    formatted_docs = formatted_documents(documents)
 
-        messages = [
-            {"role": "system", "content": """
+    messages = [
+        {"role": "system", "content": """
             Your task is to provide a one-sentence summary for each document specifically addressing how it relates to the given query.
             Format each summary as: "Document [X]: [One sentence summary relating to query]"
             
@@ -129,26 +327,31 @@ def get_document_summaries(request):
             Document 1: This study demonstrates coffee's positive impact on alertness and cognitive function.
             Document 2: Research indicates coffee consumption may reduce risk of liver disease.
             """},
-            {"role": "user", "content": f"Query: {query}\n\nDocuments:\n{parse_documents_for_summary(formatted_docs)}"}
-        ]
+        {"role": "user", "content": f"Query: {query}\n\nDocuments:\n{parse_documents_for_summary(formatted_docs)}"}
+    ]
 
-        summaries = await genericCompletion(messages)
-        parsed_summaries = extract_document_summaries(summaries)
-        
-        return {
-            "documentSummaries": parsed_summaries,
-        }
+    with stage("openai_document_summaries"):
+        summaries = await coalescedCompletion(messages)
+    parsed_summaries = extract_document_summaries(summaries)
+    
+    return {
+        "documentSummaries": parsed_summaries,
+    }
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def get_document_summaries(request):
     try:
-        result = process_document_summaries()
+        data = json.loads(request.body)
+        result = run_sync(summarize_documents)(data.get('query'), data.get('documents', []))
         return JsonResponse(result)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=400)
 
-def parse_documents_for_summary(data: List[tuple]) -> str:
+def parse_documents_for_summary(data: List[str], start: int = 1) -> str:
     all_documents = ""
-    for idx, abstract in enumerate(data, 1):
-        all_documents += f"Document {idx}:\n{abstract[1]}\n\n"
+    for idx, abstract in enumerate(data, start):
+        all_documents += f"Document {idx}:\n{abstract}\n\n"
     return all_documents
 
 def extract_agreeableness(text: str) -> List[dict]:
@@ -167,39 +370,21 @@ def extract_agreeableness(text: str) -> List[dict]:
         })
     return results
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def get_agreeableness(request):
-    @async_to_sync
-    async def process_agreeableness():
-        data = json.loads(request.body)
-        query = data.get('query')
-        documents = data.get('documents', [])
-        document_summaries = data.get('documentSummaries', [])
-        
-        formatted_docs = []
-        for idx, doc in enumerate(documents):
-            try:
-                abstract = doc.get('abstract', '')
-                doc_id = str(hash(abstract))
-                formatted_docs.append((doc_id, abstract))
-            except Exception as e:
-                print(f"Error processing document {idx + 1}: {str(e)}")
-                continue
-
-        # formatted_docs = []
-        # for idx, doc in enumerate(documents):
-        #     try:
-        #         # Use document summary if available, fallback to abstract
-        #         text = document_summaries[idx] if idx < len(document_summaries) else doc.get('abstract', '')
-        #         doc_id = str(hash(text))
-        #         formatted_docs.append((doc_id, text))
-        #     except Exception as e:
-        #         print(f"Error processing document {idx + 1}: {str(e)}")
-        #         continue
-
-        messages = [
-            {"role": "system", "content": """
+async def llm_agreeableness(query: str, documents: List[dict]) -> dict:
+    formatted_docs = formatted_documents(documents)
+
+    # formatted_docs = []
+    # for idx, doc in enumerate(documents):
+    #     try:
+    #         # Use document summary if available, fallback to abstract
+    #         text = document_summaries[idx] if idx < len(document_summaries) else doc.get('abstract', '')
+    #         formatted_docs.append(text)
+    #     except Exception as e:
+    #         print(f"Error processing document {idx + 1}: {str(e)}")
+    #         continue
+
+    messages = [
+        {"role": "system", "content": """
 Step 1: Read the document carefully and assess whether it contains relevant information to answer the query.
 	•	Consider whether the document directly supports a “yes” or “no” answer.
 	•	If the document contains partial or unclear information, reflect that in the percentage breakdown.
@@ -221,34 +406,142 @@ Document 1: Yes: 70%, No: 30% (Mentions related concepts but lacks direct confir
 Document 2: Yes: 40%, No: 60% (Provides some context, but key details are missing)
 Document 3: Yes: 50%, No: 50% (Unclear; contains relevant and irrelevant points equally)
             """},
-            {"role": "user", "content": f"Query: {query}\n\nDocuments:\n{parse_documents_for_summary(formatted_docs)}"}
-        ]
+        {"role": "user", "content": f"Query: {query}\n\nDocuments:\n{parse_documents_for_summary(formatted_docs)}"}
+    ]
 
-        agreeableness_text = await genericCompletion(messages)
-        results = extract_agreeableness(agreeableness_text)
-        
-        # Map results to document IDs
-        response = {}
-        for idx, result in enumerate(results):
-            if idx < len(documents) and documents[idx].get('pmid'):
-                response[documents[idx]['pmid']] = {
-                    'agree': result['agree'],
-                    'disagree': result['disagree'],
-                    #'neutral': result['neutral']
-                }
-
-        return {"agreeableness": response}
+    with stage("openai_agreeableness"):
+        agreeableness_text = await coalescedCompletion(messages)
+    results = extract_agreeableness(agreeableness_text)
+    
+    # Map results to document IDs
+    response = {}
+    for idx, result in enumerate(results):
+        if idx < len(documents) and documents[idx].get('pmid'):
+            response[documents[idx]['pmid']] = {
+                'agree': result['agree'],
+                'disagree': result['disagree'],
+                #'neutral': result['neutral']
+            }
+
+    return {"agreeableness": response}
+
+def local_agreeableness(query: str, documents: List[dict]) -> Tuple[dict, dict]:
+    """
+    Agreeableness from the entailment model, in the shape of the LLM's answer: for every document with a PMID,
+    entailment vs. contradiction of the query by its most relevant sentence, as percentages summing to 100.
+    Also returns the confidence of each, the larger of the two probabilities.
+    """
+    # QueryController imports this module
+    from controller.QueryController import Agreeableness, RelevantSection
+
+    documents = [doc for doc in documents if doc.get('pmid')]
+    sections = RelevantSection.forAbstracts(query, [doc.get('abstract', '') for doc in documents])
+    scores, confidences = {}, {}
+    for doc, prediction in zip(documents, Agreeableness.forSections(query, sections)):
+        total = prediction.agree + prediction.disagree
+        agree = round(100 * prediction.agree / total) if total > 0 else 50
+        scores[doc['pmid']] = {'agree': agree, 'disagree': 100 - agree}
+        confidences[doc['pmid']] = max(prediction.agree, prediction.disagree)
+    return scores, confidences
+
+async def assess_agreeableness(query: str, documents: List[dict], mode: str = None) -> dict:
+    """
+    Agreeableness of every document with the query, by 'mode' (AGREEABLENESS_MODE by default):
+      'llm'    - one completion rating all documents
+      'local'  - the entailment model only, without any completion
+      'hybrid' - the entailment model, with documents rated below AGREEABLENESS_MIN_CONFIDENCE re-rated by the LLM
+    """
+    mode = mode or AGREEABLENESS_MODE
+    if mode not in AGREEABLENESS_MODES:
+        raise ValueError(f"Unknown agreeableness mode '{mode}', expected one of {', '.join(AGREEABLENESS_MODES)}")
+    if mode == "llm":
+        return await llm_agreeableness(query, documents)
+
+    # Off the event loop, so concurrent completions (e.g. of /openai/analysis) keep going
+    with stage("nli_agreeableness"):
+        scores, confidences = await asyncio.to_thread(local_agreeableness, query, documents)
+    uncertain = [doc for doc in documents if confidences.get(doc.get('pmid'), 1.0) < AGREEABLENESS_MIN_CONFIDENCE]
+    if mode == "hybrid" and uncertain:
+        try:
+            scores.update((await llm_agreeableness(query, uncertain))["agreeableness"])
+        except Exception as e:
+            # The local ratings are still an answer
+            print(f"Error escalating agreeableness of {len(uncertain)} documents: {str(e)}")
+    return {"agreeableness": scores}
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def get_agreeableness(request):
     try:
-        result = process_agreeableness()
+        data = json.loads(request.body)
+        result = run_sync(assess_agreeableness)(data.get('query'), data.get('documents', []), data.get('mode'))
         return JsonResponse(result)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=400)
 
+# The parts of a combined analysis, by event name
+ANALYSES = {
+    "summary": summarize,
+    "documentSummaries": summarize_documents,
+    "agreeableness": assess_agreeableness,
+}
+
+async def analysis_events(query: str, documents: List[dict], parts: Optional[List[str]] = None):
+    """
+    Runs the completions of 'parts' concurrently and yields one event per part as soon as it finishes (named
+    like the part, with the same payload as its own endpoint, or 'error' with the part), then 'done'.
+    All parts run if 'parts' is None.
+    """
+    if parts is None:
+        parts = list(ANALYSES)
+
+    async def run(part):
+        try:
+            return part, await ANALYSES[part](query, documents), None
+        except Exception as e:
+            print(f"Error in analysis part {part}: {str(e)}")
+            return part, None, e
+
+    tasks = [asyncio.ensure_future(run(part)) for part in parts]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            part, result, error = await finished
+            if error is not None:
+                yield {"event": "error", "part": part, "error": str(error)}
+            else:
+                yield {"event": part, **result}
+        yield {"event": "done"}
+    finally:
+        # The client went away before all parts finished
+        for task in tasks:
+            task.cancel()
+
+async def analyze(request):
+    """
+    The summary, document summaries and agreeableness of one document set in a single request, streamed as
+    Server-Sent Events in the order they finish; the body is that of the separate endpoints, optionally with
+    'parts' to choose a subset.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    parts = data.get('parts', list(ANALYSES))
+    if not isinstance(parts, list) or not parts or not all(isinstance(part, str) for part in parts):
+        return JsonResponse({"error": "'parts' must be a non-empty list of analysis names"}, status=400)
+    unknown = [part for part in parts if part not in ANALYSES]
+    if unknown:
+        return JsonResponse({"error": f"Unknown parts: {', '.join(unknown)}"}, status=400)
+    return streaming_response(analysis_events(data.get('query'), data.get('documents', []), parts), "sse")
+
+analyze.csrf_exempt = True
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def extract_query_keywords(request):
-    @async_to_sync
+    @run_sync
     async def process_keywords():
         data = json.loads(request.body)
         queries = data.get('queries', [])
@@ -269,7 +562,8 @@ def extract_query_keywords(request):
             {"role": "user", "content": f"Queries:\n{formatted_queries}"}
         ]
 
-        keywords = await genericCompletion(messages)
+        with stage("openai_query_keywords"):
+            keywords = await coalescedCompletion(messages)
         return {"keywords": keywords}
 
     try:
@@ -309,7 +603,8 @@ def extract_medical_keywords(request):
         ]
 
 
-        keywords = async_to_sync(genericCompletion)(messages)
+        with stage("openai_medical_keywords"):
+            keywords = run_sync(coalescedCompletion)(messages)
         return JsonResponse({"keywords": keywords})
 
     except Exception as e:
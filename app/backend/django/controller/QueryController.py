@@ -8,32 +8,63 @@ from django.core.exceptions import ValidationError
 import openai
 #from WeaviateWrapper import WeaviateWrapper, DocumentFilter, InvalidFilterException, DocumentNotFoundException
 from models.Document import Document
-from search_service import SearchService
 from typing import List
 import os
-import requests
-from xml.etree import ElementTree
 import json
 import numpy as np
 from operator import itemgetter
 import re
 from typing import List, Optional, Tuple
 from models.EmbeddingModels import default_embeddingModel_instance
+from models.RelevantSentences import findRelevantSentences
 from models.EntailmentModels import default_entailmentModel_instance, AbstractEntailmentModel
-import concurrent.futures
-from functools import partial
-import spacy
-from scispacy.linking import EntityLinker
-from django.http import StreamingHttpResponse
-from openai import AsyncOpenAI
+from models.EntityLinking import (
+    MESH_LINKER,
+    default_entityLinker_instance,
+    default_meshConceptIndex_instance,
+    default_meshDictionary_instance,
+)
+from services.ncbi_client import default_pubmed_client
+from services.article_store import default_article_store, fetch_articles, efetch_articles
+from services.pubmed_parser import PubmedArticleRecord
+from services.timing import stage
+from services.singleflight import SingleFlight, request_key
+from services.result_cache import StaleWhileRevalidateCache
+from services.memo_cache import MemoCache
+from services.event_stream import streaming_response
 from typing import Dict, List
 import asyncio
 from django.views.decorators.http import require_http_methods
-from asgiref.sync import async_to_sync
 from controller.OpenAIController import get_summary
 from dotenv import load_dotenv
 load_dotenv()
 
+# Number of abstracts encoded per padded forward pass of the embedding model
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# Number of (sentence, query) pairs per padded forward pass of the entailment model
+NLI_BATCH_SIZE = int(os.getenv("NLI_BATCH_SIZE", "16"))
+# Number of PMIDs per efetch call when streaming results
+STREAM_EFETCH_BATCH_SIZE = int(os.getenv("STREAM_EFETCH_BATCH_SIZE", "10"))
+
+# Identical concurrent queries share one pipeline run
+query_flight = SingleFlight()
+# Ranked results are shared across users; after QUERY_CACHE_TTL seconds they are served stale for up to
+# QUERY_CACHE_STALE_TTL more seconds while being refreshed in the background
+query_results_cache = StaleWhileRevalidateCache(
+    "query_results",
+    ttl=float(os.getenv("QUERY_CACHE_TTL", str(24 * 3600))),
+    stale_ttl=float(os.getenv("QUERY_CACHE_STALE_TTL", str(7 * 24 * 3600))),
+    flight=query_flight,
+    enabled=os.getenv("QUERY_CACHE_ENABLED", "1") == "1",
+)
+# MeSH linking of a query text runs once per deployment: MESH_CACHE_MAX_ENTRIES queries are kept in-process,
+# and all linked queries in the shared 'mesh_terms' cache unless MESH_CACHE_PERSISTENT is disabled
+mesh_link_cache = MemoCache(
+    max_entries=int(os.getenv("MESH_CACHE_MAX_ENTRIES", "4096")),
+    alias="mesh_terms" if os.getenv("MESH_CACHE_PERSISTENT", "1") == "1" else None,
+    timeout=float(os.getenv("MESH_CACHE_TTL", str(30 * 24 * 3600))),
+)
+
 async def queryDocuments(request: HttpRequest, queryText: str) -> HttpResponse:
     request_type = request.GET.get('type', 'all')
 
@@ -46,183 +77,195 @@ async def queryDocuments(request: HttpRequest, queryText: str) -> HttpResponse:
         'min_citations': request.GET.get('min_citations'),
         'max_citations': request.GET.get('max_citations'),
     }
-    # Delivers top n documents
-    initial_results = await get_base_query_results(queryText, filters)
+    # Optionally stream ranked documents first and patch in later stages (?stream=1 for NDJSON, ?stream=sse for SSE)
+    stream = request.GET.get('stream')
+    if stream:
+        mode = "sse" if stream == "sse" else "ndjson"
+        return streaming_response(stream_base_query_results(queryText, filters), mode)
+
+    # Delivers top n documents, from the shared result cache when another user asked the same question
+    initial_results = await query_results_cache.get_or_compute(
+        query_key(queryText, filters), lambda: get_base_query_results(queryText, filters)
+    )
     print("Successfully fetched the top documents")
     
     return JsonResponse({"documents": initial_results}, safe=False)
 
+def normalize_query(queryText: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used to recognize identical questions."""
+    return " ".join(queryText.split()).casefold()
+
+def query_key(queryText: str, filters: dict) -> str:
+    # Results depend on the embedding model, so a model change never serves rankings of the previous one.
+    # The configured identifier is known without loading the model (or asking the inference server).
+    return request_key("query", normalize_query(queryText), filters, default_embeddingModel_instance.configuredIdentifier)
+
 async def get_base_query_results(queryText: str, filters: dict):
-    enhanced_query = extract_keywords(queryText, filters)
-    query_embedding = get_embedding(queryText)
+    # The query embedding is computed first, so the MeSH concept index can reuse it
+    # Model calls run in worker threads: on the event loop they would block every other request, and concurrent
+    # requests could never join the same micro-batch
+    with stage("embed_query"):
+        query_embedding = await asyncio.to_thread(get_embedding, queryText)
+    with stage("extract_keywords"):
+        enhanced_query = await asyncio.to_thread(extract_keywords, queryText, filters, query_embedding)
     
     # PubMed search
-    search_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-    search_params = {
-        "db": "pubmed",
-        "term": enhanced_query,
-        "retmax": filters.get('max_results') + 30,
-        "sort": "relevance",
-        "retmode": "json",
-        "api_key": os.getenv("PUBMED_API_KEY"),
-        "field": "citation_count"
-
-    }
-    search_response = requests.get(search_url, params=search_params)
-    search_data = search_response.json()
-    pmids = search_data.get("esearchresult", {}).get("idlist", [])
-
-    # Fetch metadata
-    fetch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
-    fetch_params = {
-        "db": "pubmed",
-        "id": ",".join(pmids),
-        "retmode": "xml",
-        "api_key": os.getenv("PUBMED_API_KEY")
-    }
-    fetch_response = requests.get(fetch_url, params=fetch_params)
-    root = ElementTree.fromstring(fetch_response.content)
-
-    # Process and sort results
-    initial_results = []
-    for article in root.findall(".//PubmedArticle"):
-        abstract = article.findall(".//Abstract/AbstractText")
-        if abstract is None:
-            continue
-
-        complete_abstract = []
-
-        for section in abstract:
-            label = section.get('Label', '')  # Get section label if exists
-            text = section.text or ''         # Get section text
-            
-            if label:
-                complete_abstract.append(f"{label}: {text}")
-            else:
-                complete_abstract.append(text)
-        complete_abstract_text = ' '.join(complete_abstract)
-        
-        doc_embedding = get_embedding(complete_abstract_text)
-        similarity = cosine_similarity(query_embedding, doc_embedding)
-        
-        initial_results.append({
-            "pmid": article.findtext(".//PMID"),
-            "title": article.findtext(".//ArticleTitle"),
-            "abstract": complete_abstract_text,
-            "publicationDate": article.findtext(".//PubDate/Year"),
-            "similarity": similarity,
-        })
-
-    initial_results.sort(key=itemgetter("similarity"), reverse=True)
-    # Get top N documents
-    top_documents = initial_results[:filters.get('max_results')]
-    pmids = [doc["pmid"] for doc in top_documents]
-    citation_data = fetch_icite_citation_data(pmids)
-    citation_dict = {}
-    if citation_data and 'data' in citation_data:
-        citation_dict = {str(paper['pmid']): {
-            'total': paper.get('citation_count', 0)  # Only keep total citations
-        } for paper in citation_data['data']}
-
-    for doc in top_documents:        
-        citation_info = citation_dict.get(doc["pmid"], {'total': 0})
-        doc["citations"] = {"total": citation_info['total']}
+    with stage("esearch"):
+        pmids = await default_pubmed_client.esearch(enhanced_query, retmax=filters.get('max_results') + 30)
+
+    # Fetch metadata (stored articles are served locally); all candidates are gathered first,
+    # so their abstracts can be embedded in one batched pass
+    with stage("efetch"):
+        candidates = article_documents(await fetch_articles(pmids))
+
+    # Score all candidates at once and keep the top N, best first
+    with stage("embed_documents"):
+        doc_embeddings = await asyncio.to_thread(
+            get_embeddings, [doc["abstract"] for doc in candidates], pmids=[doc["pmid"] for doc in candidates]
+        )
+    with stage("rank"):
+        top_indices, top_similarities = rank_by_similarity(query_embedding, doc_embeddings, filters.get('max_results'))
+    top_documents = []
+    for idx, similarity in zip(top_indices, top_similarities):
+        doc = candidates[idx]
+        doc["similarity"] = float(similarity)
+        top_documents.append(doc)
+
+    with stage("icite"):
+        citation_counts = await fetch_citation_counts([doc["pmid"] for doc in top_documents])
+    for doc in top_documents:
+        doc["citations"] = {"total": citation_counts.get(doc["pmid"], 0)}
     return top_documents
 
+async def stream_base_query_results(queryText: str, filters: dict):
+    """
+    Streaming variant of get_base_query_results, yielding events as the pipeline progresses:
+      'documents'        - newly scored candidates, once per efetch batch, in arrival order
+      'ranking'          - the PMIDs of the top N documents, best first
+      'citations'        - total citation counts of the top N documents
+      'relevantSections' - the most relevant sentence of each top N document
+      'done' / 'error'
+    """
+    arrivals = []
+    try:
+        with stage("embed_query"):
+            query_embedding = await asyncio.to_thread(get_embedding, queryText)
+        with stage("extract_keywords"):
+            enhanced_query = await asyncio.to_thread(extract_keywords, queryText, filters, query_embedding)
+        with stage("esearch"):
+            pmids = await default_pubmed_client.esearch(enhanced_query, retmax=filters.get('max_results') + 30)
+
+        # Stored articles are scored right away; the rest is fetched in small concurrent batches,
+        # each scored as soon as it arrives
+        stored, _ = await asyncio.to_thread(default_article_store.get_many, pmids)
+        missing = [pmid for pmid in pmids if pmid not in stored]
+        batches = [missing[i:i + STREAM_EFETCH_BATCH_SIZE] for i in range(0, len(missing), STREAM_EFETCH_BATCH_SIZE)]
+
+        async def stored_records():
+            return [stored[pmid] for pmid in pmids if pmid in stored]
+
+        async def fetched_records(batch):
+            with stage("efetch"):
+                return await efetch_articles(batch)
+
+        coroutines = ([stored_records()] if stored else []) + [fetched_records(batch) for batch in batches]
+        # Tasks, so batches still in flight are cancelled if the client disconnects or a later step fails
+        arrivals = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+        scored = []
+        for arrival in asyncio.as_completed(arrivals):
+            candidates = article_documents(await arrival)
+            if not candidates:
+                continue
+            with stage("embed_documents"):
+                doc_embeddings = await asyncio.to_thread(
+                    get_embeddings, [doc["abstract"] for doc in candidates], pmids=[doc["pmid"] for doc in candidates]
+                )
+            for doc, similarity in zip(candidates, similarity_scores(query_embedding, doc_embeddings)):
+                doc["similarity"] = float(similarity)
+            scored.extend(candidates)
+            yield {"event": "documents", "documents": candidates}
+
+        scored.sort(key=itemgetter("similarity"), reverse=True)
+        top_documents = scored[:filters.get('max_results')]
+        yield {"event": "ranking", "pmids": [doc["pmid"] for doc in top_documents]}
+
+        with stage("icite"):
+            citation_counts = await fetch_citation_counts([doc["pmid"] for doc in top_documents])
+        yield {"event": "citations", "citations": {
+            doc["pmid"]: {"total": citation_counts.get(doc["pmid"], 0)} for doc in top_documents
+        }}
+
+        with stage("relevant_sections"):
+            sections = await asyncio.to_thread(
+                RelevantSection.forAbstracts,
+                queryText, [doc["abstract"] for doc in top_documents], query_embedding=query_embedding
+            )
+        yield {"event": "relevantSections", "relevantSections": {
+            doc["pmid"]: {
+                "mostRelevantSentence": section.mostRelevantSentence,
+                "similarityScore": doc["similarity"]
+            } for doc, section in zip(top_documents, sections)
+        }}
+        yield {"event": "done"}
+    except Exception as e:
+        print(f"Error in stream_base_query_results: {str(e)}")
+        yield {"event": "error", "error": str(e)}
+    finally:
+        for arrival in arrivals:
+            arrival.cancel()
+
 async def get_further_reads_results(queryText: str, filters: dict):
-    enhanced_query = extract_keywords(queryText, filters)
+    with stage("extract_keywords"):
+        enhanced_query = await asyncio.to_thread(extract_keywords, queryText, filters)
     
     # PubMed search
-    search_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-    search_params = {
-        "db": "pubmed",
-        "term": enhanced_query,
-        "retmax": 5,
-        "sort": "relevance",
-        "retmode": "json",
-        "api_key": os.getenv("PUBMED_API_KEY"),
-        "field": "citation_count"
-
-    }
-    search_response = requests.get(search_url, params=search_params)
-    search_data = search_response.json()
-    pmids = search_data.get("esearchresult", {}).get("idlist", [])
+    with stage("esearch"):
+        pmids = await default_pubmed_client.esearch(enhanced_query, retmax=5)
 
     # Fetch metadata
-    fetch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
-    fetch_params = {
-        "db": "pubmed",
-        "id": ",".join(pmids),
-        "retmode": "xml",
-        "api_key": os.getenv("PUBMED_API_KEY")
-    }
-    fetch_response = requests.get(fetch_url, params=fetch_params)
-    root = ElementTree.fromstring(fetch_response.content)
-
-    # Process and sort results
-    initial_results = []
-    for article in root.findall(".//PubmedArticle"):
-        abstract = article.findall(".//Abstract/AbstractText")
-        if abstract is None:
-            continue
-
-        complete_abstract = []
-
-        for section in abstract:
-            label = section.get('Label', '')  # Get section label if exists
-            text = section.text or ''         # Get section text
-            
-            if label:
-                complete_abstract.append(f"{label}: {text}")
-            else:
-                complete_abstract.append(text)
-        complete_abstract_text = ' '.join(complete_abstract)
-        
-        initial_results.append({
-            "pmid": article.findtext(".//PMID"),
-            "title": article.findtext(".//ArticleTitle"),
-            "abstract": complete_abstract_text,
-            "publicationDate": article.findtext(".//PubDate/Year")
-        })
+    with stage("efetch"):
+        initial_results = article_documents(await fetch_articles(pmids))
 
     # Get top N documents
     top_documents = initial_results[:filters.get('max_results')]
-    pmids = [doc["pmid"] for doc in top_documents]
-    citation_data = fetch_icite_citation_data(pmids)
-    citation_dict = {}
-    if citation_data and 'data' in citation_data:
-        citation_dict = {str(paper['pmid']): {
-            'total': paper.get('citation_count', 0)  # Only keep total citations
-        } for paper in citation_data['data']}
-
-    for doc in top_documents:        
-        citation_info = citation_dict.get(doc["pmid"], {'total': 0})
-        doc["citations"] = {"total": citation_info['total']}
+    with stage("icite"):
+        citation_counts = await fetch_citation_counts([doc["pmid"] for doc in top_documents])
+    for doc in top_documents:
+        doc["citations"] = {"total": citation_counts.get(doc["pmid"], 0)}
     return top_documents
 
+def article_documents(records: List[PubmedArticleRecord]) -> List[dict]:
+    """Turn article records into document dicts with the complete, section-labelled abstract."""
+    return [{
+        "pmid": record.pmid,
+        "title": record.title,
+        "abstract": record.completeAbstract,
+        "publicationDate": record.year
+    } for record in records]
+
+async def fetch_citation_counts(pmids: List[str]) -> Dict[str, int]:
+    """Map each PMID to its total iCite citation count (PMIDs unknown to iCite are omitted)."""
+    citation_data = await fetch_icite_citation_data(pmids)
+    if not citation_data or 'data' not in citation_data:
+        return {}
+    return {str(paper['pmid']): paper.get('citation_count', 0) for paper in citation_data['data']}  # Only keep total citations
+
 async def get_detailed_analysis_results(top_5, queryText: str):
-    pmids = [doc["pmid"] for doc in top_5]
-    citation_data = fetch_icite_citation_data(pmids)
-    citation_dict = {}
-    if citation_data and 'data' in citation_data:
-        citation_dict = {str(paper['pmid']): {
-            'total': paper.get('citation_count', 0)  # Only keep total citations
-        } for paper in citation_data['data']}
+    citation_counts = await fetch_citation_counts([doc["pmid"] for doc in top_5])
     print("Successfully fetched the citations for the top documents")
 
+    relevant_sections = await asyncio.to_thread(RelevantSection.forAbstracts, queryText, [doc["abstract"] for doc in top_5])
+    agreeableness_results = await asyncio.to_thread(Agreeableness.forSections, queryText, relevant_sections)
+
     detailed_results = [] 
-    for doc in top_5:
-        relevant_section = RelevantSection(queryText, doc["abstract"])
-        agreeableness = Agreeableness(queryText, relevant_section)
-        
-        citation_info = citation_dict.get(doc["pmid"], {'total': 0})
+    for doc, relevant_section, agreeableness in zip(top_5, relevant_sections, agreeableness_results):
         detailed_results.append({
             "pmid": doc["pmid"],
             "title": doc["title"],
             "abstract": doc["abstract"],
             "publicationDate": doc["publicationDate"],
             "overallSimilarity": float(doc["similarity"]),
-            "citations": {"total": citation_info['total']},
+            "citations": {"total": citation_counts.get(doc["pmid"], 0)},
             "relevantSection": {
                 "embeddingModel": relevant_section.embeddingModel,
                 "mostRelevantSentence": relevant_section.mostRelevantSentence,
@@ -250,23 +293,22 @@ def get_relevant_sections(request: HttpRequest) -> JsonResponse:
             return JsonResponse({"error": "Missing documents or query"}, status=400)
 
         # Get query embedding once for all documents
-        query_embedding = get_embedding(query_text)
-        
+        with stage("embed_query"):
+            query_embedding = get_embedding(query_text)
+        documents = [doc for doc in documents if doc.get("pmid")]
+        abstracts = [doc.get("abstract", "") for doc in documents]
+
+        # Score every abstract, and every sentence of every abstract, in batched passes
+        with stage("embed_documents"):
+            abstract_embeddings = get_embeddings(abstracts, pmids=[doc["pmid"] for doc in documents])
+        with stage("relevant_sections"):
+            sections = RelevantSection.forAbstracts(query_text, abstracts, query_embedding=query_embedding)
+
         # Map to store pmid -> relevant section
         relevant_sections = {}
-        
-        # Process each document
-        for doc in documents:
-            pmid = doc.get("pmid")
-            if not pmid:
-                continue
-                
-            abstract = doc.get("abstract", "")
-            similarity = cosine_similarity(query_embedding, get_embedding(abstract))
-            
-            relevant_section = RelevantSection(query_text, abstract)
-
-            relevant_sections[pmid] = {
+        for doc, abstract_embedding, relevant_section in zip(documents, abstract_embeddings, sections):
+            similarity = cosine_similarity(query_embedding, abstract_embedding)
+            relevant_sections[doc["pmid"]] = {
                 "mostRelevantSentence": relevant_section.mostRelevantSentence,
                 "similarityScore": float(similarity)
             }
@@ -279,32 +321,66 @@ def get_relevant_sections(request: HttpRequest) -> JsonResponse:
         print(f"Error in get_relevant_sections: {str(e)}")
         return JsonResponse({"error": str(e)}, status=500)
 
-def get_embedding(text: str):
-    """Get embedding vector for text using default embedding model."""
-    return default_embeddingModel_instance.embed(text)
+def get_embedding(text: str, pmid: Optional[str] = None):
+    """Get embedding vector for text using default embedding model; documents with a PMID are read through the embedding cache."""
+    return default_embeddingModel_instance.embed(text, pmid=pmid)
+
+def get_embeddings(texts: List[str], pmids: Optional[List[str]] = None) -> np.ndarray:
+    """Get embedding matrix for texts, encoded in padded batches of EMBEDDING_BATCH_SIZE and read through the embedding cache if pmids are given."""
+    return default_embeddingModel_instance.embedTexts(texts, batch_size=EMBEDDING_BATCH_SIZE, pmids=pmids)
 
 def cosine_similarity(v1, v2):
     """Calculate cosine similarity between two vectors."""
     return np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
 
+def similarity_scores(query_embedding, doc_embeddings: np.ndarray) -> np.ndarray:
+    """Cosine similarity of every document to the query, via one normalized matrix-vector product."""
+    query = np.asarray(query_embedding, dtype=np.float32)
+    docs = np.asarray(doc_embeddings, dtype=np.float32)
+    if docs.shape[0] == 0:
+        return np.zeros(0, dtype=np.float32)
+    query = query / max(np.linalg.norm(query), 1e-12)
+    norms = np.linalg.norm(docs, axis=1, keepdims=True)
+    return (docs / np.maximum(norms, 1e-12)) @ query
+
+def rank_by_similarity(query_embedding, doc_embeddings: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score every document against the query with one normalized matrix-vector product.
+    Returns the indices and cosine similarities of the top_k documents, best first.
+    """
+    similarities = similarity_scores(query_embedding, doc_embeddings)
+    if similarities.shape[0] == 0 or top_k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    k = min(top_k, similarities.shape[0])
+    top_indices = np.argpartition(-similarities, k - 1)[:k]
+    top_indices = top_indices[np.argsort(-similarities[top_indices], kind="stable")]
+    return top_indices, similarities[top_indices]
+
 
 class RelevantSection:
     def __init__(self, query: str, abstract: str):
-        sentences = re.split(r'(?<=[.!?]) +', abstract)
-        maxSimilarity = None
-        mostRelevantSentence: str = None
-        model = default_embeddingModel_instance
-        
-        for sentence in sentences:
-            similarity = model.unitCosineSimilarity(query, sentence, prune=False)
-            if maxSimilarity is None or similarity > maxSimilarity:
-                maxSimilarity = similarity
-                mostRelevantSentence = sentence
-                
-        self.embeddingModel = model.identifier
+        [(mostRelevantSentence, maxSimilarity)] = findRelevantSentences(
+            query, [abstract], batch_size=EMBEDDING_BATCH_SIZE
+        )
+        self.embeddingModel = default_embeddingModel_instance.identifier
         self.mostRelevantSentence = mostRelevantSentence
         self.similarityScore = maxSimilarity
 
+    @classmethod
+    def forAbstracts(cls, query: str, abstracts: List[str], query_embedding=None) -> List['RelevantSection']:
+        """Find the relevant sections of many abstracts with one query encoding and batched sentence encoding."""
+        sections = []
+        for mostRelevantSentence, maxSimilarity in findRelevantSentences(
+            query, abstracts, query_embedding=query_embedding, batch_size=EMBEDDING_BATCH_SIZE
+        ):
+            section = cls.__new__(cls)
+            section.embeddingModel = default_embeddingModel_instance.identifier
+            section.mostRelevantSentence = mostRelevantSentence
+            section.similarityScore = maxSimilarity
+            sections.append(section)
+        return sections
+
 class Agreeableness:
     def __init__(self, query: str, relevantSection: RelevantSection):
         model = default_entailmentModel_instance
@@ -312,46 +388,66 @@ class Agreeableness:
             sentence_a=relevantSection.mostRelevantSentence,
             sentence_b=query
         )
-        self.entailmentModel = model.identifier
+        self._assign(model.identifier, prediction)
+
+    def _assign(self, entailmentModel: str, prediction: AbstractEntailmentModel.Prediction):
+        self.entailmentModel = entailmentModel
         self.agree: float = prediction.entailment
         self.disagree: float = prediction.contradiction
         self.neutral: Optional[float] = prediction.neutral
 
-def fetch_icite_citation_data(pmids):
-    base_url = "https://icite.od.nih.gov/api/pubs"
-    params = {"pmids": ",".join(pmids)}
-    response = requests.get(base_url, params=params, verify=False)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Error fetching citation data: {response.status_code}")
-        return None
-
-# Initialize spaCy model with MeSH linker (moved outside function for performance)
-nlp = spacy.load("en_core_sci_sm")
-nlp.add_pipe("scispacy_linker", config={
-    "resolve_abbreviations": True, 
-    "linker_name": "mesh"
-})
-
-def extract_keywords(user_query: str, filters: dict) -> str:
+    @classmethod
+    def forSections(cls, query: str, relevantSections: List[RelevantSection]) -> List['Agreeableness']:
+        """Predict the agreeableness of many relevant sections with a single batched NLI call."""
+        model = default_entailmentModel_instance
+        predictions = model.predict_batch(
+            [(section.mostRelevantSentence, query) for section in relevantSections],
+            batch_size=NLI_BATCH_SIZE
+        )
+        results = []
+        for prediction in predictions:
+            agreeableness = cls.__new__(cls)
+            agreeableness._assign(model.identifier, prediction)
+            results.append(agreeableness)
+        return results
+
+async def fetch_icite_citation_data(pmids):
+    return await default_pubmed_client.fetch_icite(pmids)
+
+def link_query(user_query: str, query_embedding: Optional[List[float]] = None) -> List[Tuple[str, List[str]]]:
+    """
+    The entities of a query with their linked MeSH terms, memoized per (whitespace-normalized) query text.
+    'query_embedding' is the query's embedding if already computed, for the MeSH concept index.
+    """
+    text = " ".join(user_query.split())
+
+    def link() -> List[Tuple[str, List[str]]]:
+        if default_meshConceptIndex_instance is not None:
+            entities = default_meshConceptIndex_instance.link(text, embedding=query_embedding)
+            if entities:
+                return entities
+        if default_meshDictionary_instance is not None:
+            entities = default_meshDictionary_instance.link(text)
+            if entities:
+                return entities
+        # The scispaCy MeSH linker runs in-process, or in the inference server if one is configured
+        return default_entityLinker_instance.link(text)
+
+    # The concept index's links depend on its embedding model, k and similarity threshold
+    index = default_meshConceptIndex_instance.configuredIdentifier if default_meshConceptIndex_instance is not None else None
+    return mesh_link_cache.get_or_compute(request_key("mesh", MESH_LINKER, index, text), link)
+
+def extract_keywords(user_query: str, filters: dict, query_embedding: Optional[List[float]] = None) -> str:
     """Extract MeSH terms from user query and construct PubMed query."""
-    doc = nlp(user_query)
     query_construct = []
 
-    for ent in doc.ents:
-        if ent._.kb_ents:
-            mesh_ids = ent._.kb_ents
-            mesh_terms = [
-                nlp.get_pipe("scispacy_linker").kb.cui_to_entity[mesh_id[0]].canonical_name.lower()
-                for mesh_id in mesh_ids
-            ]
-            if mesh_terms:
-                # Combine MeSH terms with OR
-                query_construct.append(f"({' OR '.join(mesh_terms)})")
+    for entity_text, mesh_terms in link_query(user_query, query_embedding):
+        if mesh_terms:
+            # Combine MeSH terms with OR
+            query_construct.append(f"({' OR '.join(mesh_terms)})")
         else:
             # Add original term if no MeSH match found
-            query_construct.append(ent.text)
+            query_construct.append(entity_text)
 
     #Add filters once, outside the entity loop
     if filters.get('publication_types'):
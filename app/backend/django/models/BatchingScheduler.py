@@ -0,0 +1,144 @@
+# Dynamic micro-batching of model calls made concurrently by different requests
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from services.timing import record_stage
+
+MICRO_BATCHING = os.getenv("MICRO_BATCHING", "1") == "1"
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+EMBEDDING_MAX_LATENCY = float(os.getenv("EMBEDDING_MAX_LATENCY_MS", "5")) / 1000
+NLI_MAX_BATCH_SIZE = int(os.getenv("NLI_MAX_BATCH_SIZE", "16"))
+NLI_MAX_LATENCY = float(os.getenv("NLI_MAX_LATENCY_MS", "5")) / 1000
+
+
+class _Request:
+    __slots__ = ("future", "results", "remaining", "enqueued_at")
+
+    def __init__(self, size: int):
+        self.future: Future = Future()
+        self.results: List[Any] = [None] * size
+        self.remaining = size
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatcher:
+    """
+    Gathers the items submitted from any thread and runs them through 'run_batch' together.
+
+    A batch is dispatched once it holds 'max_batch_size' items or 'max_latency' seconds after its first item
+    arrived, whichever comes first. Large submissions are split across batches; each caller is handed its
+    own results, in order, once all of its items are done. All batches run on one thread, so the model
+    behind 'run_batch' is never called concurrently.
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[List[Any]], Sequence[Any]], max_batch_size: int, max_latency: float):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue: Deque[Tuple[_Request, int, Any]] = deque()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, items: Sequence[Any]) -> List[Any]:
+        """Blocks until all 'items' have been run and returns their results in order."""
+        if not items:
+            return []
+        request = _Request(len(items))
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f"batcher-{self.name}", daemon=True)
+                self._thread.start()
+            self._queue.extend((request, index, item) for index, item in enumerate(items))
+            self._condition.notify()
+        return request.future.result()
+
+    def _loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                # Items that waited while the previous batch ran count that time against their latency budget
+                deadline = self._queue[0][0].enqueued_at + self.max_latency
+                while len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch_size))]
+            self._run(batch)
+
+    def _run(self, batch: List[Tuple[_Request, int, Any]]) -> None:
+        start = time.perf_counter()
+        try:
+            outputs = self.run_batch([item for _, _, item in batch])
+        except BaseException as e:
+            for request, _, _ in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        finally:
+            record_stage(f"{self.name}_batch", time.perf_counter() - start)
+
+        for (request, index, _), output in zip(batch, outputs):
+            if request.future.done():
+                continue
+            request.results[index] = output
+            request.remaining -= 1
+            if request.remaining == 0:
+                request.future.set_result(request.results)
+        if len(outputs) != len(batch):
+            # Never leave a caller waiting for an output that will not come
+            error = RuntimeError(f"{self.name} batch of {len(batch)} items returned {len(outputs)} outputs")
+            for request, _, _ in batch:
+                if not request.future.done():
+                    request.future.set_exception(error)
+
+
+def withEmbeddingBatching(model, max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE, max_latency: float = EMBEDDING_MAX_LATENCY):
+    """
+    Routes all encoder calls of a local embedding model ('_encode', and through it 'embedTexts', as well as
+    'embedText') through a shared MicroBatcher. Does nothing if MICRO_BATCHING is disabled.
+    """
+    if not MICRO_BATCHING:
+        return model
+    encode = model._encode
+    model.batcher = MicroBatcher("embedding", lambda texts: encode(texts, max_batch_size), max_batch_size, max_latency)
+
+    def batchedEncode(texts: List[str], batch_size: int) -> np.ndarray:
+        if not texts:
+            return encode(texts, batch_size)
+        return np.stack(model.batcher.submit(list(texts)))
+
+    def batchedEmbedText(text: str, asTensor: bool = False):
+        vector = batchedEncode([text], 1)[0]
+        if asTensor:
+            return torch.from_numpy(vector).unsqueeze(0)
+        return vector.tolist()
+
+    model._encode = batchedEncode
+    model.embedText = batchedEmbedText
+    return model
+
+
+def withEntailmentBatching(model, max_batch_size: int = NLI_MAX_BATCH_SIZE, max_latency: float = NLI_MAX_LATENCY):
+    """
+    Routes 'predict' and 'predict_batch' of a local entailment model through a shared MicroBatcher, so pairs
+    from concurrent requests share length-bucketed, padded forward passes. Does nothing if MICRO_BATCHING is disabled.
+    """
+    if not MICRO_BATCHING:
+        return model
+    predict_batch = model.predict_batch
+    model.batcher = MicroBatcher(
+        "entailment", lambda pairs: predict_batch(pairs, batch_size=max_batch_size), max_batch_size, max_latency
+    )
+    model.predict_batch = lambda pairs, batch_size=max_batch_size: model.batcher.submit(list(pairs))
+    model.predict = lambda sentence_a, sentence_b: model.batcher.submit([(sentence_a, sentence_b)])[0]
+    return model
@@ -4,6 +4,7 @@ import json
 import re
 from .EmbeddingModels import default_embeddingModel_instance
 from .EntailmentModels import default_entailmentModel_instance, AbstractEntailmentModel
+from .RelevantSentences import findRelevantSentences
 
 class Document:
     """
@@ -32,17 +33,9 @@ class Document:
                 query: str,
                 abstract: str
             ):
-                # Separate the abstract into sentences
-                sentences = re.split(r'(?<=[.!?]) +', abstract)
-                # Calculate cosine similarity between each sentence and the query, and retain the best sentence
-                maxSimilarity = None
-                mostRelevantSentence: str = None
+                # Encode the query once and all sentences of the abstract in one batch, and retain the best sentence
                 model = default_embeddingModel_instance
-                for sentence in sentences:
-                    similarity = model.unitCosineSimilarity(query, sentence, prune=False)
-                    if maxSimilarity == None or similarity > maxSimilarity:
-                        maxSimilarity = similarity
-                        mostRelevantSentence = sentence
+                [(mostRelevantSentence, maxSimilarity)] = findRelevantSentences(query, [abstract], model=model)
                 # Assign final values
                 self.embeddingModel = model.identifier
                 self.mostRelevantSentence=mostRelevantSentence
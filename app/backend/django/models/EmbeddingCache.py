@@ -0,0 +1,208 @@
+# Persistent, process-shared cache of document embeddings, keyed by (embedding model, PMID, abstract content hash)
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache" / "embeddings"
+
+# Entries whose last access is more recent than this are not touched again on read, to keep readers write-free
+ACCESS_RESOLUTION_SECONDS = 60.0
+# Slots reserved but not marked ready for this long are assumed abandoned (their writer died) and rewritten
+RESERVATION_TIMEOUT_SECONDS = 60.0
+
+
+class EmbeddingCache:
+    """
+    A disk-backed embedding store shared by all worker processes on a host.
+
+    Vectors live in a fixed-capacity memory-mapped matrix ('vectors.bin', one row per slot); a SQLite index
+    (WAL mode) maps (pmid, content hash) to a slot and tracks recency. When the store is full, the least
+    recently used entries are evicted and their slots reused. Each model identifier, dimension and dtype
+    gets its own directory, so switching models never returns stale vectors.
+
+    The capacity of an existing store is fixed at creation; delete its directory to resize it.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        model_identifier: str,
+        dimension: int,
+        capacity: int,
+        dtype: str = "float16",
+    ):
+        self.model_identifier = model_identifier
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        safe_identifier = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_identifier)
+        self.path = Path(directory) / f"{safe_identifier}-{dimension}-{self.dtype.name}"
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " pmid TEXT NOT NULL,"
+                " content_hash TEXT NOT NULL,"
+                " slot INTEGER NOT NULL UNIQUE,"
+                " ready INTEGER NOT NULL DEFAULT 0,"
+                " last_access REAL NOT NULL,"
+                " PRIMARY KEY (pmid, content_hash))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            connection.execute("INSERT OR IGNORE INTO meta VALUES ('capacity', ?)", (str(capacity),))
+            connection.execute("INSERT OR IGNORE INTO meta VALUES ('next_slot', '0')")
+            self.capacity = int(connection.execute("SELECT value FROM meta WHERE key = 'capacity'").fetchone()[0])
+
+        vectors_path = self.path / "vectors.bin"
+        size = self.capacity * self.dimension * self.dtype.itemsize
+        with open(vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._vectors = np.memmap(vectors_path, dtype=self.dtype, mode="r+", shape=(self.capacity, self.dimension))
+
+    @classmethod
+    def fromEnvironment(cls, model_identifier: str, dimension: int) -> Optional['EmbeddingCache']:
+        """
+        Returns the cache configured by the EMBEDDING_CACHE_* environment variables, or None if it is disabled.
+        """
+        if os.getenv("EMBEDDING_CACHE_ENABLED", "1") != "1":
+            return None
+        return cls(
+            directory=Path(os.getenv("EMBEDDING_CACHE_DIR", str(DEFAULT_CACHE_DIR))),
+            model_identifier=model_identifier,
+            dimension=dimension,
+            # 200k entries of 768 float16 values take ~300 MB on disk
+            capacity=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000")),
+            dtype=os.getenv("EMBEDDING_CACHE_DTYPE", "float16"),
+        )
+
+    @staticmethod
+    def contentHash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared across threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path / "index.sqlite3", timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _lookup(self, keys: Sequence[Tuple[str, str]], ready_only: bool = True) -> dict:
+        connection = self._connection()
+        found = {}
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 400):
+            chunk = keys[start:start + 400]
+            clause = " OR ".join(["(pmid = ? AND content_hash = ?)"] * len(chunk))
+            params = [value for key in chunk for value in key]
+            rows = connection.execute(
+                f"SELECT pmid, content_hash, slot, last_access FROM entries WHERE ready >= ? AND ({clause})",
+                [int(ready_only)] + params
+            ).fetchall()
+            for pmid, content_hash, slot, last_access in rows:
+                found[(pmid, content_hash)] = (slot, last_access)
+        return found
+
+    def get_many(self, items: Sequence[Tuple[Optional[str], str]]) -> List[Optional[np.ndarray]]:
+        """
+        Returns the cached float32 vector for every (pmid, text) pair, or None where there is no entry.
+        """
+        keys = [(pmid or "", self.contentHash(text)) for pmid, text in items]
+        if not keys:
+            return []
+        found = self._lookup(keys)
+        vectors = {key: np.array(self._vectors[slot], dtype=np.float32) for key, (slot, _) in found.items()}
+
+        # A slot is only reused after its old row is deleted, so re-checking after the copy
+        # guarantees none of the vectors were overwritten by a concurrent eviction
+        if vectors:
+            still_there = self._lookup(list(vectors))
+            for key, (slot, _) in found.items():
+                if still_there.get(key, (None,))[0] != slot:
+                    del vectors[key]
+
+        now = time.time()
+        stale = [key for key, (_, last_access) in found.items() if key in vectors and now - last_access > ACCESS_RESOLUTION_SECONDS]
+        if stale:
+            self._connection().executemany(
+                "UPDATE entries SET last_access = ? WHERE pmid = ? AND content_hash = ?",
+                [(now, pmid, content_hash) for pmid, content_hash in stale]
+            )
+        return [vectors.get(key) for key in keys]
+
+    def put_many(self, items: Sequence[Tuple[Optional[str], str]], vectors: np.ndarray) -> None:
+        """
+        Stores one vector per (pmid, text) pair, evicting the least recently used entries if the store is full.
+        """
+        rows = {}
+        for (pmid, text), vector in zip(items, vectors):
+            rows[(pmid or "", self.contentHash(text))] = vector
+        if not rows:
+            return
+        connection = self._connection()
+        now = time.time()
+
+        # Phase 1: reserve slots. Evicted rows are deleted and committed before their slots are overwritten.
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            present = self._lookup(list(rows), ready_only=False)
+            ready = self._lookup(list(present))
+            reclaimed = [
+                (key, slot) for key, (slot, last_access) in present.items()
+                if key not in ready and now - last_access > RESERVATION_TIMEOUT_SECONDS
+            ]
+            connection.executemany(
+                "UPDATE entries SET last_access = ? WHERE pmid = ? AND content_hash = ?",
+                [(now, pmid, content_hash) for (pmid, content_hash), _ in reclaimed]
+            )
+            keys = [key for key in rows if key not in present][:self.capacity]
+
+            next_slot = int(connection.execute("SELECT value FROM meta WHERE key = 'next_slot'").fetchone()[0])
+            slots = list(range(next_slot, min(self.capacity, next_slot + len(keys))))
+            connection.execute("UPDATE meta SET value = ? WHERE key = 'next_slot'", (str(next_slot + len(slots)),))
+            if len(slots) < len(keys):
+                # Slots still reserved by a live writer are not evicted; its vector would land in the new entry's slot
+                evicted = connection.execute(
+                    "SELECT pmid, content_hash, slot FROM entries WHERE ready = 1 OR last_access < ?"
+                    " ORDER BY last_access LIMIT ?",
+                    (now - RESERVATION_TIMEOUT_SECONDS, len(keys) - len(slots))
+                ).fetchall()
+                connection.executemany(
+                    "DELETE FROM entries WHERE pmid = ? AND content_hash = ?",
+                    [(pmid, content_hash) for pmid, content_hash, _ in evicted]
+                )
+                slots += [slot for _, _, slot in evicted]
+            reserved = list(zip(keys, slots))
+
+            connection.executemany(
+                "INSERT INTO entries VALUES (?, ?, ?, 0, ?)",
+                [(pmid, content_hash, slot, now) for (pmid, content_hash), slot in reserved]
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        # Phase 2: write the vectors, then mark them readable
+        writes = reserved + reclaimed
+        for key, slot in writes:
+            self._vectors[slot] = np.asarray(rows[key]).astype(self.dtype, copy=False)
+        self._vectors.flush()
+        connection.executemany(
+            "UPDATE entries SET ready = 1 WHERE pmid = ? AND content_hash = ? AND slot = ?",
+            [(pmid, content_hash, slot) for (pmid, content_hash), slot in writes]
+        )
@@ -1,13 +1,26 @@
 # Embedding Wrapper classes to wrap a given model and define a common interface
 from abc import ABC
-from sentence_transformers import SentenceTransformer
-from typing import List, Union
+from typing import TYPE_CHECKING, List, Optional, Union
+import os
+import threading
+import numpy as np
 import torch
+from .BatchingScheduler import withEmbeddingBatching
+from .EmbeddingCache import EmbeddingCache
+from .InferenceClient import InferenceClient, defaultInferenceClient, inferenceServerAddress
+from .ModelRegistry import default_model_registry
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+_cache_lock = threading.Lock()
+
+DEFAULT_EMBEDDING_MODEL = "pritamdeka/S-PubMedBert-MS-MARCO-SCIFACT"
 
 class AbstractEmbeddingModel(ABC):
 
   def __init__(self):
-    self.model: SentenceTransformer = None
+    self.model: 'SentenceTransformer' = None
     self.identifier : str = ""
     raise NotImplementedError("This is an abstract class; 'init' must be implemented in subclasses.")
 
@@ -17,6 +30,46 @@ class AbstractEmbeddingModel(ABC):
        return embedding
     else:
       return embedding.tolist()[0]
+
+  @property
+  def cache(self) -> Optional[EmbeddingCache]:
+    """
+    The persistent document-embedding cache of this model, opened on first use (None if disabled).
+    """
+    if not hasattr(self, "_cache"):
+      with _cache_lock:
+        if not hasattr(self, "_cache"):
+          self._cache = EmbeddingCache.fromEnvironment(self.identifier, self.embeddingDimension())
+    return self._cache
+
+  def embeddingDimension(self) -> int:
+    return self.model.get_sentence_embedding_dimension()
+
+  def embedTexts(self, texts: List[str], batch_size: int = 32, pmids: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Embeds all texts in padded batches of 'batch_size' and returns a (len(texts), dim) float32 matrix.
+    If 'pmids' are given, documents are read through the embedding cache and only misses are encoded.
+    """
+    if pmids is None or self.cache is None:
+      return self._encode(texts, batch_size)
+
+    items = list(zip(pmids, texts))
+    cached = self.cache.get_many(items)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+    if missing:
+      encoded = self._encode([texts[i] for i in missing], batch_size)
+      self.cache.put_many([items[i] for i in missing], encoded)
+      for i, vector in zip(missing, encoded):
+        cached[i] = vector
+    if not cached:
+      return self._encode([], batch_size)
+    return np.stack(cached).astype(np.float32, copy=False)
+
+  def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+    if not texts:
+      return np.zeros((0, self.embeddingDimension()), dtype=np.float32)
+    embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return embeddings.astype(np.float32, copy=False)
   
   def unitCosineSimilarity(self, text1: str, text2: str, prune: bool = True) -> float:
       embedding1: torch.tensor = self.embedText(text1, asTensor=True)
@@ -31,17 +84,76 @@ class AbstractEmbeddingModel(ABC):
 
 class sPubMedBERT(AbstractEmbeddingModel):
     def __init__(self):
-        self.model = SentenceTransformer('pritamdeka/S-PubMedBert-MS-MARCO-SCIFACT')
-        self.identifier : str = "pritamdeka/S-PubMedBert-MS-MARCO-SCIFACT"
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(DEFAULT_EMBEDDING_MODEL)
+        self.identifier : str = DEFAULT_EMBEDDING_MODEL
 
-    def embed(self, text: str):
+    def embed(self, text: str, pmid: Optional[str] = None):
+        # Documents with a PMID are read through the embedding cache
+        if pmid is not None:
+            return self.embedTexts([text], pmids=[pmid])[0].tolist()
         # This should use the embedText method from the parent class
         return self.embedText(text)
     
 class simSce(AbstractEmbeddingModel):
     def __init__(self):
+        from sentence_transformers import SentenceTransformer
         self.model = SentenceTransformer('kamalkraj/BioSimCSE-BioLinkBERT-BASE')
         self.identifier : str = "kamalkraj/BioSimCSE-BioLinkBERT-BASE"
 
-# A singleton representing the default model
-default_embeddingModel_instance: AbstractEmbeddingModel = sPubMedBERT()
+class RemoteEmbeddingModel(sPubMedBERT):
+    """
+    Thin client for the embedding model owned by the inference server; the model itself is never loaded here.
+    Document embeddings are still read through this host's embedding cache, so only misses are sent.
+    """
+    def __init__(self, client: Optional[InferenceClient] = None):
+        self.model = None
+        self.client = client or defaultInferenceClient()
+        self._info = None
+
+    def _serverInfo(self) -> dict:
+        if self._info is None:
+            self._info = self.client.call("embedding_info")
+        return self._info
+
+    @property
+    def identifier(self) -> str:
+        return self._serverInfo()["identifier"]
+
+    def embeddingDimension(self) -> int:
+        return self._serverInfo()["dimension"]
+
+    def embedText(self, text: str, asTensor: bool = False) -> Union[List[float], torch.tensor]:
+        embedding = self.client.call("embed_texts", texts=[text], batch_size=1)[0]
+        if asTensor:
+            return torch.from_numpy(embedding).unsqueeze(0)
+        return embedding.tolist()
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.embeddingDimension()), dtype=np.float32)
+        return self.client.call("embed_texts", texts=texts, batch_size=batch_size)
+
+def configuredEmbeddingIdentifier() -> str:
+    """
+    The identifier of the default model under EMBEDDING_BACKEND, as 'localEmbeddingModel' (or an inference server
+    with the same configuration) reports it once loaded.
+    """
+    selected = os.getenv("EMBEDDING_BACKEND", "torch").strip() or "torch"
+    return DEFAULT_EMBEDDING_MODEL if selected == "torch" else f"{DEFAULT_EMBEDDING_MODEL}+{selected}"
+
+def localEmbeddingModel() -> AbstractEmbeddingModel:
+    """The in-process default model, run with the EMBEDDING_BACKEND ('torch', 'onnx' or 'onnx-int8', see OnnxModels.py)."""
+    from .OnnxModels import OnnxEmbeddingModel, backend
+    selected = backend("EMBEDDING_BACKEND")
+    if selected == "torch":
+        return sPubMedBERT()
+    return OnnxEmbeddingModel.fromExport(DEFAULT_EMBEDDING_MODEL, quantized=selected == "onnx-int8")
+
+# A singleton representing the default model, served by the inference server if INFERENCE_SERVER_SOCKET is set.
+# It is loaded on first use (or by the warmup, see ModelRegistry.py); a local model micro-batches concurrent calls.
+default_embeddingModel_instance: AbstractEmbeddingModel = default_model_registry.register(
+    "embedding",
+    lambda: RemoteEmbeddingModel() if inferenceServerAddress() else withEmbeddingBatching(localEmbeddingModel()),
+    identifier=configuredEmbeddingIdentifier(),
+)
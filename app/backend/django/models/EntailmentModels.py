@@ -1,8 +1,13 @@
 from abc import ABC, abstractmethod
-from typing import Optional
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from typing import TYPE_CHECKING, List, Optional, Tuple
 import torch
 from torch import Tensor
+from .BatchingScheduler import withEntailmentBatching
+from .InferenceClient import InferenceClient, defaultInferenceClient, inferenceServerAddress
+from .ModelRegistry import default_model_registry
+
+if TYPE_CHECKING:
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
 class AbstractEntailmentModel(ABC):
     """
@@ -36,6 +41,12 @@ class AbstractEntailmentModel(ABC):
     def predict(self, sentence_a: str, sentence_b: str) -> 'AbstractEntailmentModel.Prediction':
         raise NotImplementedError("This is an abstract class; 'predict' method must be implemented in subclasses.")
 
+    def predict_batch(self, pairs: List[Tuple[str, str]], batch_size: int = 16) -> List['AbstractEntailmentModel.Prediction']:
+        """
+        Predicts every (sentence_a, sentence_b) pair. Subclasses that support batched inference override this.
+        """
+        return [self.predict(sentence_a, sentence_b) for sentence_a, sentence_b in pairs]
+
 class AbstractSequenceClassificationModel(AbstractEntailmentModel):
     """
     Abstract wraper class for models subclassing from Huggingface's 'AutoModelForSequenceClassification'.
@@ -43,8 +54,8 @@ class AbstractSequenceClassificationModel(AbstractEntailmentModel):
 
     @abstractmethod
     def __init__(self):
-        self.model: AutoModelForSequenceClassification = None
-        self.tokenizer: AutoTokenizer = None
+        self.model: 'AutoModelForSequenceClassification' = None
+        self.tokenizer: 'AutoTokenizer' = None
         self.identifier: str = ""
         raise NotImplementedError("This is an abstract class; 'init' must be implemented in subclasses.")
 
@@ -56,18 +67,67 @@ class AbstractSequenceClassificationModel(AbstractEntailmentModel):
         """
         raise NotImplementedError("This is an abstract class; '_tokenize' must be implemented in subclasses.")
 
+    @abstractmethod
+    def _tokenizeBatch(self, pairs: List[Tuple[str, str]]) -> dict[str, torch.Tensor]:
+        """
+        Returns the tokenized input for a batch of pairs, padded to the longest pair of the batch.
+        Implementation is subclass responsibility.
+        """
+        raise NotImplementedError("This is an abstract class; '_tokenizeBatch' must be implemented in subclasses.")
+
+    @abstractmethod
+    def _toPrediction(self, probs: torch.Tensor) -> 'AbstractEntailmentModel.Prediction':
+        """
+        Maps the probabilities of a single pair to a 'Prediction'.
+        Implementation is subclass responsibility, since label orders differ between models.
+        """
+        raise NotImplementedError("This is an abstract class; '_toPrediction' must be implemented in subclasses.")
+
     def _predictProbabilities(self, sentence_a: str, sentence_b: str) -> torch.Tensor:
         """
         Returns the final probabilities producecd by a model.
         Hanling those is a subclass responsibility, sice prediction formats might differ (e.g. one model might decide to predicit netrality, some do not.) 
         """
         inputs = self._tokenize(sentence_a, sentence_b)
-        outputs = self.model(**inputs)
+        with torch.inference_mode():
+            outputs = self.model(**inputs)
         probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
         return probs
 
+    def _predictProbabilitiesBatch(self, pairs: List[Tuple[str, str]], batch_size: int = 16) -> torch.Tensor:
+        """
+        Returns a (len(pairs), num_labels) tensor of probabilities.
+        Pairs are sorted by length and bucketed into batches of 'batch_size', so each batch is padded only
+        to its own longest pair; results are returned in the original order.
+        """
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        probs: List[Optional[torch.Tensor]] = [None] * len(pairs)
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                bucket = order[start:start + batch_size]
+                inputs = self._tokenizeBatch([pairs[i] for i in bucket])
+                outputs = self.model(**inputs)
+                bucket_probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
+                for row, i in enumerate(bucket):
+                    probs[i] = bucket_probs[row]
+        return torch.stack(probs)
+
+    def predict(self, sentence_a: str, sentence_b: str) -> 'AbstractEntailmentModel.Prediction':
+        probs = self._predictProbabilities(sentence_a, sentence_b)
+        return self._toPrediction(probs[0])
+
+    def predict_batch(self, pairs: List[Tuple[str, str]], batch_size: int = 16) -> List['AbstractEntailmentModel.Prediction']:
+        """
+        Predicts every (sentence_a, sentence_b) pair with length-bucketed, dynamically padded, gradient-free batches.
+        """
+        if not pairs:
+            return []
+        probs = self._predictProbabilitiesBatch(pairs, batch_size=batch_size)
+        return [self._toPrediction(row) for row in probs]
+
 class DeBERTaV3(AbstractSequenceClassificationModel):
     def __init__(self):
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
         # Use specific version and disable fast tokenizer
         self.tokenizer = AutoTokenizer.from_pretrained(
             "tasksource/deberta-base-long-nli",
@@ -84,16 +144,25 @@ class DeBERTaV3(AbstractSequenceClassificationModel):
     def _tokenize(self, sentence_a: str, sentence_b: str) -> dict[str, torch.Tensor]:
         return self.tokenizer(sentence_a, sentence_b, return_tensors="pt")
 
-    def predict(self, sentence_a: str, sentence_b: str) -> 'AbstractEntailmentModel.Prediction':
-        probs = self._predictProbabilities(sentence_a, sentence_b)
+    def _tokenizeBatch(self, pairs: List[Tuple[str, str]]) -> dict[str, torch.Tensor]:
+        return self.tokenizer(
+            [sentence_a for sentence_a, _ in pairs],
+            [sentence_b for _, sentence_b in pairs],
+            padding=True,
+            truncation=True,
+            return_tensors="pt"
+        )
+
+    def _toPrediction(self, probs: torch.Tensor) -> 'AbstractEntailmentModel.Prediction':
         return AbstractEntailmentModel.Prediction(
-            contradiction=probs[0][0].item(),
-            entailment=probs[0][1].item(),
-            neutral=probs[0][2].item(),
+            contradiction=probs[0].item(),
+            entailment=probs[1].item(),
+            neutral=probs[2].item(),
         )
     
 class DeBERTaFinetunedHealth(DeBERTaV3):
     def __init__(self):
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
         self.model = AutoModelForSequenceClassification.from_pretrained("tasksource/deberta-base-long-nli")
         self.tokenizer = AutoTokenizer.from_pretrained("tasksource/deberta-base-long-nli")
         self.identifier = "tasksource/deberta-base-long-nli"
@@ -101,9 +170,54 @@ class DeBERTaFinetunedHealth(DeBERTaV3):
 
     def _tokenize(self, sentence_a: str, sentence_b: str) -> dict[str, torch.Tensor]:
         return self.tokenizer(f"{sentence_b} [SEP] {sentence_a}", return_tensors="pt")
+
+    def _tokenizeBatch(self, pairs: List[Tuple[str, str]]) -> dict[str, torch.Tensor]:
+        return self.tokenizer(
+            [f"{sentence_b} [SEP] {sentence_a}" for sentence_a, sentence_b in pairs],
+            padding=True,
+            truncation=True,
+            return_tensors="pt"
+        )
    
-#A singleton representing the default model
-default_entailmentModel_instance: AbstractEntailmentModel = DeBERTaFinetunedHealth()
+class RemoteEntailmentModel(AbstractEntailmentModel):
+    """
+    Thin client for the entailment model owned by the inference server; the model itself is never loaded here.
+    """
+    def __init__(self, client: Optional[InferenceClient] = None):
+        self.client = client or defaultInferenceClient()
+        self._identifier = None
+
+    @property
+    def identifier(self) -> str:
+        if self._identifier is None:
+            self._identifier = self.client.call("entailment_info")["identifier"]
+        return self._identifier
+
+    def predict(self, sentence_a: str, sentence_b: str) -> 'AbstractEntailmentModel.Prediction':
+        return self.predict_batch([(sentence_a, sentence_b)])[0]
+
+    def predict_batch(self, pairs: List[Tuple[str, str]], batch_size: int = 16) -> List['AbstractEntailmentModel.Prediction']:
+        if not pairs:
+            return []
+        probabilities = self.client.call("predict_batch", pairs=list(pairs), batch_size=batch_size)
+        return [
+            AbstractEntailmentModel.Prediction(contradiction=contradiction, entailment=entailment, neutral=neutral)
+            for contradiction, entailment, neutral in probabilities
+        ]
+
+def localEntailmentModel() -> AbstractEntailmentModel:
+    """The in-process default model, run with the ENTAILMENT_BACKEND ('torch', 'onnx' or 'onnx-int8', see OnnxModels.py)."""
+    from .OnnxModels import OnnxEntailmentModel, backend
+    selected = backend("ENTAILMENT_BACKEND")
+    if selected == "torch":
+        return DeBERTaFinetunedHealth()
+    return OnnxEntailmentModel.fromExport("tasksource/deberta-base-long-nli", quantized=selected == "onnx-int8")
+
+#A singleton representing the default model, served by the inference server if INFERENCE_SERVER_SOCKET is set.
+#It is loaded on first use (or by the warmup, see ModelRegistry.py); a local model micro-batches concurrent calls.
+default_entailmentModel_instance: AbstractEntailmentModel = default_model_registry.register(
+    "entailment", lambda: RemoteEntailmentModel() if inferenceServerAddress() else withEntailmentBatching(localEntailmentModel())
+)
 
 # class BioBERTNLI(AbstractEntailmentModel):
 #     def __init__(self):
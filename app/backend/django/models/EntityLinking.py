@@ -0,0 +1,135 @@
+# Entity linking wrapper classes to map biomedical entities of a query to MeSH terms behind a common interface
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .InferenceClient import InferenceClient, defaultInferenceClient, inferenceServerAddress
+from .ModelRegistry import default_model_registry
+
+
+class AbstractEntityLinker(ABC):
+    """
+    Base class for any given entity linker.
+    """
+
+    @abstractmethod
+    def __init__(self):
+        self.identifier: str = ""
+        raise NotImplementedError("This is an abstract class; 'init' must be implemented in subclasses.")
+
+    @abstractmethod
+    def link(self, text: str) -> List[Tuple[str, List[str]]]:
+        """
+        Returns every entity of 'text' together with the lowercased canonical names of the MeSH concepts it was
+        linked to (empty if it could not be linked), in order of appearance.
+        """
+        raise NotImplementedError("This is an abstract class; 'link' method must be implemented in subclasses.")
+
+
+class ScispacyMeshLinker(AbstractEntityLinker):
+    def __init__(self):
+        import spacy
+        from scispacy.linking import EntityLinker  # noqa: F401 - registers the 'scispacy_linker' pipe
+        self.nlp = spacy.load("en_core_sci_sm")
+        self.nlp.add_pipe("scispacy_linker", config={
+            "resolve_abbreviations": True,
+            "linker_name": "mesh"
+        })
+        self.identifier: str = "en_core_sci_sm/scispacy_linker:mesh"
+
+    def link(self, text: str) -> List[Tuple[str, List[str]]]:
+        doc = self.nlp(text)
+        kb = self.nlp.get_pipe("scispacy_linker").kb
+        return [
+            (ent.text, [kb.cui_to_entity[mesh_id[0]].canonical_name.lower() for mesh_id in ent._.kb_ents])
+            for ent in doc.ents
+        ]
+
+
+class DictionaryMeshLinker(AbstractEntityLinker):
+    """
+    Links every MeSH name or alias occurring in the text, using the memory-mapped automaton of MeshDictionary.py.
+    There is no NER step, so text without any MeSH name yields no entities at all.
+    """
+    def __init__(self, directory: Optional[Path] = None):
+        from .MeshDictionary import MESH_DICTIONARY_DIR, MeshDictionary
+        self.dictionary = MeshDictionary(directory or MESH_DICTIONARY_DIR)
+        self.identifier: str = "mesh-dictionary"
+
+    def link(self, text: str) -> List[Tuple[str, List[str]]]:
+        return [
+            (text[start:end], [self.dictionary.conceptName(concept) for concept in concepts])
+            for start, end, concepts in self.dictionary.matches(text)
+        ]
+
+
+class EmbeddingMeshLinker(AbstractEntityLinker):
+    """
+    Links a text as a whole to the MeSH concepts with names closest to its embedding (see MeshConceptIndex.py);
+    no NER pipeline runs. The concepts expand the text rather than replace it: the text is returned as an unlinked
+    entity followed by the same text linked to the concepts, so a query needs its own terms and one of the concepts.
+    Callers that already embedded the text with the default model pass its 'embedding'.
+    """
+    def __init__(self, directory: Optional[Path] = None, k: int = 5, min_similarity: float = 0.5):
+        from .EmbeddingModels import default_embeddingModel_instance
+        from .MeshConceptIndex import MESH_INDEX_DIR, MeshConceptIndex
+        self.index = MeshConceptIndex(directory or MESH_INDEX_DIR)
+        self.embeddingModel = default_embeddingModel_instance
+        if self.embeddingModel.identifier != self.index.model_identifier:
+            raise ValueError(
+                f"The MeSH concept index was built with '{self.index.model_identifier}', not with the default embedding "
+                f"model '{self.embeddingModel.identifier}'; rebuild it with 'python manage.py build_mesh_index'."
+            )
+        self.k = k
+        self.min_similarity = min_similarity
+        self.identifier: str = meshIndexIdentifier(self.index.model_identifier, k, min_similarity)
+
+    def link(self, text: str, embedding: Optional[List[float]] = None) -> List[Tuple[str, List[str]]]:
+        if embedding is None:
+            embedding = self.embeddingModel.embedText(text)
+        names = [name for name, _ in self.index.nearest(embedding, k=self.k, min_similarity=self.min_similarity)]
+        return [(text, []), (text, names)] if names else []
+
+
+def meshIndexIdentifier(model_identifier: str, k: int, min_similarity: float) -> str:
+    """Identifies the links of an EmbeddingMeshLinker: its index's embedding model, 'k' and 'min_similarity'."""
+    return f"mesh-index:{model_identifier}:k={k}:min_similarity={min_similarity}"
+
+
+class RemoteEntityLinker(AbstractEntityLinker):
+    """
+    Thin client for the entity linker owned by the inference server; the pipeline and its KB are never loaded here.
+    """
+    def __init__(self, client: Optional[InferenceClient] = None):
+        self.client = client or defaultInferenceClient()
+        self.identifier: str = "remote"
+
+    def link(self, text: str) -> List[Tuple[str, List[str]]]:
+        return self.client.call("link_entities", text=text)
+
+
+# A singleton representing the default linker, served by the inference server if INFERENCE_SERVER_SOCKET is set.
+# It is loaded on first use (or by the warmup, see ModelRegistry.py).
+default_entityLinker_instance: AbstractEntityLinker = default_model_registry.register(
+    "entity_linker", lambda: RemoteEntityLinker() if inferenceServerAddress() else ScispacyMeshLinker()
+)
+
+# With MESH_LINKER=dictionary, queries are first matched against the MeSH dictionary in every web worker (the
+# mapped arrays are shared between processes); with MESH_LINKER=embedding, they are first looked up by their
+# embedding in the MeSH concept index. The linker above only runs for queries without any match.
+MESH_LINKER = os.getenv("MESH_LINKER", "scispacy")
+default_meshDictionary_instance: Optional[AbstractEntityLinker] = (
+    default_model_registry.register("mesh_dictionary", DictionaryMeshLinker) if MESH_LINKER == "dictionary" else None
+)
+MESH_INDEX_TOP_K = int(os.getenv("MESH_INDEX_TOP_K", "5"))
+MESH_INDEX_MIN_SIMILARITY = float(os.getenv("MESH_INDEX_MIN_SIMILARITY", "0.5"))
+default_meshConceptIndex_instance: Optional[EmbeddingMeshLinker] = None
+if MESH_LINKER == "embedding":
+    from .EmbeddingModels import configuredEmbeddingIdentifier
+    # The index must have been built with the default embedding model, so its identifier is known without loading it
+    default_meshConceptIndex_instance = default_model_registry.register(
+        "mesh_index",
+        lambda: EmbeddingMeshLinker(k=MESH_INDEX_TOP_K, min_similarity=MESH_INDEX_MIN_SIMILARITY),
+        identifier=meshIndexIdentifier(configuredEmbeddingIdentifier(), MESH_INDEX_TOP_K, MESH_INDEX_MIN_SIMILARITY),
+    )
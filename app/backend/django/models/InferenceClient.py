@@ -0,0 +1,121 @@
+# Client side of the local inference service (see InferenceServer.py)
+import os
+import threading
+from multiprocessing.connection import Client, Connection
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Seconds a call waits for the server's answer before giving up on it
+INFERENCE_SERVER_TIMEOUT = float(os.getenv("INFERENCE_SERVER_TIMEOUT", "120"))
+
+# Set inside the inference server, whose workers must run the models themselves instead of calling the server
+_serving = False
+
+
+def markServing() -> None:
+    global _serving
+    _serving = True
+
+
+def inferenceServerAddress() -> Optional[str]:
+    """
+    The Unix socket of the inference server (INFERENCE_SERVER_SOCKET), or None to run models in-process.
+    """
+    if _serving:
+        return None
+    return os.getenv("INFERENCE_SERVER_SOCKET") or None
+
+
+def authkeyPath(address: str) -> str:
+    """Where the server at 'address' keeps the authkey it generates if INFERENCE_SERVER_AUTHKEY is not set."""
+    return os.path.join(os.path.dirname(os.path.abspath(address)), "authkey")
+
+
+def inferenceServerAuthkey(address: Optional[str] = None) -> Optional[bytes]:
+    """INFERENCE_SERVER_AUTHKEY, or else the key generated by the server at 'address' (if readable)."""
+    authkey = os.getenv("INFERENCE_SERVER_AUTHKEY")
+    if authkey:
+        return authkey.encode("utf-8")
+    if address is None:
+        return None
+    try:
+        with open(authkeyPath(address), "rb") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+class InferenceServerError(Exception):
+    """
+    The inference server could not be reached or failed to serve a call.
+    """
+
+
+class InferenceClient:
+    """
+    Calls methods of the inference server. Each thread keeps one connection, which is re-established once
+    if the server restarted in the meantime. A call the server does not answer within 'timeout' seconds fails.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None, timeout: Optional[float] = None):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = INFERENCE_SERVER_TIMEOUT if timeout is None else timeout
+        self._local = threading.local()
+
+    def _connection(self) -> Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.connection = connection
+        return connection
+
+    def _drop(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def call(self, method: str, **kwargs) -> Any:
+        # All server methods are side-effect free, so a call interrupted by a lost connection is simply repeated
+        for attempt in range(2):
+            try:
+                connection = self._connection()
+                connection.send((method, kwargs))
+                if not connection.poll(self.timeout):
+                    # A late answer would be read as the answer to the next call on this connection
+                    self._drop()
+                    raise InferenceServerError(
+                        f"Inference server at {self.address} did not answer '{method}' within {self.timeout} seconds."
+                    )
+                status, payload = connection.recv()
+                break
+            except (EOFError, OSError) as e:
+                self._drop()
+                if attempt:
+                    raise InferenceServerError(f"Inference server at {self.address} is unavailable: {str(e)}") from e
+        if status == "error":
+            raise InferenceServerError(payload)
+        return payload
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def defaultInferenceClient() -> InferenceClient:
+    """
+    The client for the configured server address, shared by all remote models of the process.
+    """
+    address = inferenceServerAddress()
+    if address is None:
+        raise InferenceServerError("INFERENCE_SERVER_SOCKET is not set.")
+    with _clients_lock:
+        if address not in _clients:
+            _clients[address] = InferenceClient(address, authkey=inferenceServerAuthkey(address))
+        return _clients[address]
@@ -0,0 +1,212 @@
+"""
+Local inference service owning the embedding model, the entailment model and the MeSH entity linker.
+
+Web workers started with INFERENCE_SERVER_SOCKET set hold no model weights; their default model instances are
+thin clients (see InferenceClient.py) calling this server over a Unix socket. The server pre-forks 'workers'
+processes that accept connections from one shared listener; each loads the models once after the fork and
+serves every connection on its own thread. Memory use is therefore (workers x models) regardless of the number
+of web workers.
+
+Start it with 'python manage.py inference_server'. Connections are authenticated with INFERENCE_SERVER_AUTHKEY, or
+else with a key the server generates into the socket's directory; that directory must be closed to other users.
+"""
+import os
+import secrets
+import signal
+import threading
+import time
+from contextlib import nullcontext
+from multiprocessing import get_context
+from multiprocessing.connection import Connection, Listener
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .InferenceClient import authkeyPath, markServing
+
+# Mode of a socket directory created by the server: web workers in the server's group may connect and read a
+# generated authkey, other users cannot reach the socket at all
+SOCKET_DIRECTORY_MODE = 0o750
+
+
+class InferenceHandler:
+    """
+    Dispatches calls to the models of one worker process. Every model is guarded by its own lock, so
+    concurrent connections use different models in parallel but never share one model concurrently.
+    Micro-batched models (see BatchingScheduler.py) already serialize their calls and take no lock, so
+    calls from concurrent connections are gathered into shared batches.
+    """
+
+    def __init__(self, embedding_model, entailment_model, entity_linker):
+        self.embedding_model = embedding_model
+        self.entailment_model = entailment_model
+        self.entity_linker = entity_linker
+        self._embedding_lock = self._lockFor(embedding_model)
+        self._entailment_lock = self._lockFor(entailment_model)
+        self._linker_lock = threading.Lock()
+        self.methods: Dict[str, Callable] = {
+            "embedding_info": self.embedding_info,
+            "embed_texts": self.embed_texts,
+            "entailment_info": self.entailment_info,
+            "predict_batch": self.predict_batch,
+            "link_entities": self.link_entities,
+        }
+
+    @staticmethod
+    def _lockFor(model):
+        return nullcontext() if getattr(model, "batcher", None) is not None else threading.Lock()
+
+    def embedding_info(self) -> dict:
+        return {"identifier": self.embedding_model.identifier, "dimension": self.embedding_model.embeddingDimension()}
+
+    def embed_texts(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        with self._embedding_lock:
+            return self.embedding_model._encode(texts, batch_size)
+
+    def entailment_info(self) -> dict:
+        return {"identifier": self.entailment_model.identifier}
+
+    def predict_batch(self, pairs: List[tuple], batch_size: int = 16) -> List[tuple]:
+        with self._entailment_lock:
+            predictions = self.entailment_model.predict_batch([tuple(pair) for pair in pairs], batch_size=batch_size)
+        return [(p.contradiction, p.entailment, p.neutral) for p in predictions]
+
+    def link_entities(self, text: str) -> list:
+        with self._linker_lock:
+            return self.entity_linker.link(text)
+
+    def serve(self, connection: Connection) -> None:
+        """Answers calls on 'connection' until the client disconnects."""
+        with connection:
+            while True:
+                try:
+                    method, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                handler = self.methods.get(method)
+                if handler is None:
+                    response = ("error", f"Unknown inference method '{method}'.")
+                else:
+                    try:
+                        response = ("ok", handler(**kwargs))
+                    except Exception as e:
+                        print(f"Error in inference method {method}: {str(e)}")
+                        response = ("error", f"{type(e).__name__}: {str(e)}")
+                try:
+                    connection.send(response)
+                except (EOFError, OSError):
+                    return
+
+
+def loadHandler() -> InferenceHandler:
+    """
+    Loads the models in-process; the module-level default instances become local models in the server.
+    """
+    markServing()
+    from .ModelRegistry import default_model_registry, registerDefaultModels
+    registerDefaultModels()
+    names = ["embedding", "entailment", "entity_linker"]
+    # Models constructed before the fork (e.g. remote clients from a startup warmup) must not be reused
+    for name in names:
+        default_model_registry.get(name).unload()
+    default_model_registry.warmup(names)
+    return InferenceHandler(
+        default_model_registry.get("embedding"),
+        default_model_registry.get("entailment"),
+        default_model_registry.get("entity_linker"),
+    )
+
+
+def _workerMain(listener: Listener) -> None:
+    # Ctrl-C goes to the whole process group; let the supervisor decide when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    handler = loadHandler()
+    print(f"Inference worker {os.getpid()} ready")
+    while True:
+        try:
+            connection = listener.accept()
+        except Exception as e:
+            # Includes failed authentication of a single client
+            print(f"Error accepting inference connection: {str(e)}")
+            continue
+        threading.Thread(target=handler.serve, args=(connection,), daemon=True).start()
+
+
+class InferenceServer:
+    """
+    Binds the socket and supervises the pre-forked workers, replacing any that exit.
+    """
+
+    def __init__(self, address: str, workers: int = 1, authkey: Optional[bytes] = None):
+        self.address = address
+        self.workers = workers
+        # Without a configured key, one is generated (or the previously generated one reused) when binding
+        self.authkey = authkey
+        self._stopping = False
+
+    def _prepareDirectory(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.address))
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+            os.chmod(directory, SOCKET_DIRECTORY_MODE)
+        info = os.stat(directory)
+        if info.st_uid != os.getuid() or info.st_mode & 0o027:
+            raise PermissionError(
+                f"The inference socket's directory {directory} must be owned by this user and closed to other "
+                f"users (mode {SOCKET_DIRECTORY_MODE:o}); use a dedicated directory."
+            )
+
+    def _generatedAuthkey(self) -> bytes:
+        path = authkeyPath(self.address)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                authkey = f.read().strip()
+            if authkey:
+                return authkey
+        authkey = secrets.token_hex(32).encode("ascii")
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o640)
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(authkey)
+        return authkey
+
+    def bind(self) -> Listener:
+        """Listens on the socket, which is never accessible to other users, and never without an authkey."""
+        self._prepareDirectory()
+        if self.authkey is None:
+            self.authkey = self._generatedAuthkey()
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        # The socket is created with mode 660 instead of being restricted after it was bound
+        umask = os.umask(0o117)
+        try:
+            return Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(umask)
+
+    def serve_forever(self) -> None:
+        listener = self.bind()
+        # Workers are forked before any model is loaded, so no framework thread pools exist yet
+        context = get_context("fork")
+        processes = []
+        signal.signal(signal.SIGTERM, self._stop)
+        try:
+            while not self._stopping:
+                processes = [process for process in processes if process.is_alive()]
+                while len(processes) < self.workers:
+                    process = context.Process(target=_workerMain, args=(listener,), daemon=True)
+                    process.start()
+                    processes.append(process)
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join(timeout=10)
+            listener.close()
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
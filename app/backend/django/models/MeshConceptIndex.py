@@ -0,0 +1,111 @@
+"""
+Embedding-based MeSH lookup: every canonical name and alias of the MeSH concepts, embedded once with the default
+embedding model and stored as a memory-mapped, L2-normalized float16 matrix. A query is linked by a nearest
+neighbour search of its embedding, which the query pipeline computes anyway.
+
+Built with 'python manage.py build_mesh_index'. Layout:
+  vectors.npy                       (names, dimension) float16 unit vectors
+  entry_concepts.npy                concept of every row
+  names.bin / name_offsets.npy      lowercased canonical concept names (see MeshDictionary.writeConceptNames)
+  meta.json                         embedding model identifier, counts
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .MeshDictionary import ConceptNames, writeConceptNames
+
+MESH_INDEX_DIR = Path(os.getenv("MESH_INDEX_DIR", Path(__file__).resolve().parent.parent / ".cache" / "mesh_index"))
+
+# Rows scored per matrix product; bounds the float32 working copy of the mapped matrix
+SEARCH_CHUNK_ROWS = 8192
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.clip(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12, None)
+
+
+def buildMeshConceptIndex(
+    concepts: Iterable[Tuple[str, Iterable[str]]],
+    model,
+    directory: Path = MESH_INDEX_DIR,
+    batch_size: int = 256,
+    min_length: int = 3,
+) -> Dict[str, int]:
+    """
+    Embeds the canonical name and aliases of every concept with 'model' (an AbstractEmbeddingModel) and writes
+    the index to 'directory'. Names shorter than 'min_length' characters and purely numeric names are skipped.
+    """
+    names: List[str] = []
+    entries: List[str] = []
+    entry_concepts: List[int] = []
+    for canonical_name, aliases in concepts:
+        concept = len(names)
+        names.append(canonical_name.lower())
+        for alias in sorted({name.strip().lower() for name in (canonical_name, *aliases)}):
+            if len(alias) >= min_length and not alias.isdigit():
+                entries.append(alias)
+                entry_concepts.append(concept)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    vectors = np.lib.format.open_memmap(
+        directory / "vectors.npy", mode="w+", dtype=np.float16, shape=(len(entries), model.embeddingDimension())
+    )
+    for start in range(0, len(entries), batch_size):
+        batch = entries[start:start + batch_size]
+        vectors[start:start + len(batch)] = _unit(model.embedTexts(batch, batch_size=batch_size))
+    vectors.flush()
+    del vectors
+    np.save(directory / "entry_concepts.npy", np.array(entry_concepts, dtype=np.int32))
+    writeConceptNames(directory, names)
+    stats = {"model": model.identifier, "concepts": len(names), "names": len(entries)}
+    # Written last, so a partially written index is never loaded
+    with open(directory / "meta.json", "w") as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+
+class MeshConceptIndex:
+    """
+    A memory-mapped index written by 'buildMeshConceptIndex'.
+    """
+
+    def __init__(self, directory: Path = MESH_INDEX_DIR):
+        if not (directory / "meta.json").exists():
+            raise FileNotFoundError(f"No MeSH concept index at {directory}; run 'python manage.py build_mesh_index' first.")
+        with open(directory / "meta.json") as f:
+            self.meta = json.load(f)
+        self.model_identifier: str = self.meta["model"]
+        self.vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+        self.entry_concepts = np.load(directory / "entry_concepts.npy", mmap_mode="r")
+        self.names = ConceptNames(directory)
+
+    def nearest(self, embedding: Sequence[float], k: int = 5, min_similarity: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        The names of the (at most) 'k' concepts closest to 'embedding' by cosine similarity of their best
+        matching name, best first; concepts below 'min_similarity' are left out.
+        """
+        query = _unit(np.asarray(embedding, dtype=np.float32).reshape(-1))
+        # Keep a few more rows than k, since several names of one concept may rank next to each other
+        keep = 4 * k
+        rows: List[np.ndarray] = []
+        scores: List[np.ndarray] = []
+        for start in range(0, len(self.vectors), SEARCH_CHUNK_ROWS):
+            chunk_scores = np.asarray(self.vectors[start:start + SEARCH_CHUNK_ROWS], dtype=np.float32) @ query
+            top = np.argpartition(-chunk_scores, keep - 1)[:keep] if len(chunk_scores) > keep else np.arange(len(chunk_scores))
+            rows.append(top + start)
+            scores.append(chunk_scores[top])
+        if not rows:
+            return []
+        candidate_rows, candidate_scores = np.concatenate(rows), np.concatenate(scores)
+
+        nearest: Dict[int, float] = {}
+        for i in np.argsort(-candidate_scores):
+            if candidate_scores[i] < min_similarity or len(nearest) == k:
+                break
+            concept = int(self.entry_concepts[candidate_rows[i]])
+            nearest.setdefault(concept, float(candidate_scores[i]))
+        return [(self.names[concept], score) for concept, score in nearest.items()]
@@ -0,0 +1,204 @@
+"""
+Dictionary-based MeSH matching: canonical names and aliases of all MeSH concepts compiled into an Aho-Corasick
+automaton, so a query is matched against every name in one pass over its characters.
+
+The automaton is built once with 'python manage.py build_mesh_dictionary' and stored as flat numpy arrays that
+are memory-mapped when loaded; all worker processes on a host therefore share one copy through the page cache.
+
+Layout (one '.npy' file each, nodes are numbered breadth-first with the root as 0):
+  edge_offsets[n]:edge_offsets[n + 1]          sorted outgoing characters ('edge_chars') and targets of node n
+  fail[n], output[n], depth[n]                 failure link, nearest terminal node on the failure chain (-1 for
+                                               none) and length of the string spelled by node n
+  terminal_offsets[n]:terminal_offsets[n + 1]  concepts ('terminal_concepts') whose name ends at node n, and
+                                               whether that name only matches in capitals ('terminal_exact')
+  name_offsets[c]:name_offsets[c + 1]          bytes of the lowercased canonical name of concept c in 'names.bin'
+"""
+import json
+import os
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+MESH_DICTIONARY_DIR = Path(
+    os.getenv("MESH_DICTIONARY_DIR", Path(__file__).resolve().parent.parent / ".cache" / "mesh_dictionary")
+)
+
+ARRAYS = (
+    "edge_offsets", "edge_chars", "edge_targets", "fail", "output", "depth",
+    "terminal_offsets", "terminal_concepts", "terminal_exact",
+)
+
+
+def normalize(text: str) -> str:
+    """Lowercases 'text' character by character, so positions in the result are positions in 'text'."""
+    return "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+
+def isAcronym(name: str) -> bool:
+    """All-caps names ('AIDS', 'T2DM') are acronyms, matched only in capitals so they do not match words like 'aids'."""
+    return name.upper() == name and name.lower() != name
+
+
+def writeConceptNames(directory: Path, names: List[str]) -> None:
+    """Stores concept names as one UTF-8 blob ('names.bin') with offsets ('name_offsets.npy')."""
+    encoded = [name.encode("utf-8") for name in names]
+    np.save(directory / "name_offsets.npy", np.cumsum([0] + [len(name) for name in encoded], dtype=np.int64))
+    with open(directory / "names.bin", "wb") as f:
+        f.write(b"".join(encoded))
+
+
+class ConceptNames:
+    """Memory-mapped concept names written by 'writeConceptNames'."""
+
+    def __init__(self, directory: Path):
+        self.offsets = np.load(directory / "name_offsets.npy", mmap_mode="r")
+        # Mapping an empty file fails
+        self.blob = np.memmap(directory / "names.bin", dtype=np.uint8, mode="r") if int(self.offsets[-1]) else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, concept: int) -> str:
+        start, end = int(self.offsets[concept]), int(self.offsets[concept + 1])
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+
+def _isBoundary(text: str, start: int, end: int) -> bool:
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+def buildMeshDictionary(concepts: Iterable[Tuple[str, Iterable[str]]], directory: Path = MESH_DICTIONARY_DIR, min_length: int = 3) -> Dict[str, int]:
+    """
+    Compiles (canonical name, aliases) of every concept into the automaton and writes it to 'directory'.
+    Names shorter than 'min_length' characters and purely numeric names are skipped, since they mostly match noise.
+    """
+    names: List[str] = []
+    goto: List[Dict[str, int]] = [{}]
+    # Per node, concept -> whether all of its names ending there are acronyms
+    terminals: List[Dict[int, bool]] = [{}]
+    for canonical_name, aliases in concepts:
+        concept = len(names)
+        names.append(canonical_name.lower())
+        for alias in {canonical_name, *aliases}:
+            key = normalize(alias.strip())
+            if len(key) < min_length or key.isdigit():
+                continue
+            node = 0
+            for ch in key:
+                child = goto[node].get(ch)
+                if child is None:
+                    child = len(goto)
+                    goto[node][ch] = child
+                    goto.append({})
+                    terminals.append({})
+                node = child
+            terminals[node][concept] = terminals[node].get(concept, True) and isAcronym(alias.strip())
+
+    # Renumber breadth-first and compute failure and output links
+    order = [0]
+    fail = {0: 0}
+    output = {0: -1}
+    depth = {0: 0}
+    queue = deque([0])
+    while queue:
+        node = queue.popleft()
+        for ch, child in goto[node].items():
+            depth[child] = depth[node] + 1
+            target = fail[node]
+            while target and ch not in goto[target]:
+                target = fail[target]
+            fail[child] = goto[target][ch] if node and ch in goto[target] else 0
+            output[child] = fail[child] if terminals[fail[child]] else output[fail[child]]
+            order.append(child)
+            queue.append(child)
+    number = {node: i for i, node in enumerate(order)}
+
+    def renumbered(node: int) -> int:
+        return -1 if node == -1 else number[node]
+
+    edges = [sorted(goto[node].items()) for node in order]
+    arrays = {
+        "edge_offsets": np.cumsum([0] + [len(e) for e in edges], dtype=np.int64),
+        "edge_chars": np.array([ord(ch) for e in edges for ch, _ in e], dtype=np.uint32),
+        "edge_targets": np.array([number[child] for e in edges for _, child in e], dtype=np.int32),
+        "fail": np.array([number[fail[node]] for node in order], dtype=np.int32),
+        "output": np.array([renumbered(output[node]) for node in order], dtype=np.int32),
+        "depth": np.array([depth[node] for node in order], dtype=np.int32),
+        "terminal_offsets": np.cumsum([0] + [len(terminals[node]) for node in order], dtype=np.int64),
+        "terminal_concepts": np.array([c for node in order for c in terminals[node]], dtype=np.int32),
+        "terminal_exact": np.array([exact for node in order for exact in terminals[node].values()], dtype=np.bool_),
+    }
+
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(directory / f"{name}.npy", array)
+    writeConceptNames(directory, names)
+    stats = {"concepts": len(names), "nodes": len(order), "names": int(arrays["terminal_offsets"][-1]), "min_length": min_length}
+    # Written last, so a partially written dictionary is never loaded
+    with open(directory / "meta.json", "w") as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+
+class MeshDictionary:
+    """
+    A memory-mapped automaton written by 'buildMeshDictionary'.
+    """
+
+    def __init__(self, directory: Path = MESH_DICTIONARY_DIR):
+        # Dictionaries of older versions lack some arrays and must be rebuilt
+        if not all((directory / path).exists() for path in ["meta.json", *(f"{name}.npy" for name in ARRAYS)]):
+            raise FileNotFoundError(f"No MeSH dictionary at {directory}; run 'python manage.py build_mesh_dictionary' first.")
+        for name in ARRAYS:
+            setattr(self, name, np.load(directory / f"{name}.npy", mmap_mode="r"))
+        self.names = ConceptNames(directory)
+
+    def _next(self, node: int, code: int) -> int:
+        while True:
+            start, end = int(self.edge_offsets[node]), int(self.edge_offsets[node + 1])
+            if end > start:
+                i = start + int(np.searchsorted(self.edge_chars[start:end], code))
+                if i < end and int(self.edge_chars[i]) == code:
+                    return int(self.edge_targets[i])
+            if node == 0:
+                return 0
+            node = int(self.fail[node])
+
+    def _isTerminal(self, node: int) -> bool:
+        return int(self.terminal_offsets[node + 1]) > int(self.terminal_offsets[node])
+
+    def conceptName(self, concept: int) -> str:
+        return self.names[concept]
+
+    def matches(self, text: str) -> List[Tuple[int, int, List[int]]]:
+        """
+        The (start, end, concepts) of names occurring in 'text' as whole words; overlapping matches are resolved
+        in favour of the longest (then leftmost) one. Sorted by start.
+        """
+        normalized = normalize(text)
+        node = 0
+        found = []
+        for position, ch in enumerate(normalized):
+            node = self._next(node, ord(ch))
+            candidate = node if self._isTerminal(node) else int(self.output[node])
+            while candidate != -1:
+                end = position + 1
+                start = end - int(self.depth[candidate])
+                if _isBoundary(normalized, start, end):
+                    entries = slice(int(self.terminal_offsets[candidate]), int(self.terminal_offsets[candidate + 1]))
+                    capitals = isAcronym(text[start:end])
+                    concepts = [
+                        int(c) for c, exact in zip(self.terminal_concepts[entries], self.terminal_exact[entries])
+                        if capitals or not exact
+                    ]
+                    if concepts:
+                        found.append((start, end, concepts))
+                candidate = int(self.output[candidate])
+
+        selected: List[Tuple[int, int, List[int]]] = []
+        for start, end, concepts in sorted(found, key=lambda match: (match[0] - match[1], match[0])):
+            if all(end <= other_start or start >= other_end for other_start, other_end, _ in selected):
+                selected.append((start, end, concepts))
+        return sorted(selected)
@@ -0,0 +1,129 @@
+# Registry of lazily loaded models, so importing a model module never loads weights
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class LazyModel:
+    """
+    Stands in for a model until it is first used: any attribute access constructs the model (once, thread-safe)
+    and is then forwarded to it. Module-level singletons can therefore keep their names and call sites.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], identifier: Optional[str] = None):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_configuredIdentifier", identifier)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    @property
+    def configuredIdentifier(self) -> str:
+        """
+        The identifier of the model as configured, known without loading it (e.g. for cache keys). Falls back to
+        the loaded model's identifier if none was registered.
+        """
+        if self._configuredIdentifier is not None:
+            return self._configuredIdentifier
+        return self.load().identifier
+
+    def load(self) -> Any:
+        """Returns the model, constructing it on the first call."""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    start = time.perf_counter()
+                    instance = self._factory()
+                    print(f"Loaded model '{self._name}' in {time.perf_counter() - start:.1f}s")
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+
+    def unload(self) -> None:
+        """Drops the constructed model; the next use constructs it again."""
+        with self._lock:
+            object.__setattr__(self, "_instance", None)
+
+    def __getattr__(self, attribute: str) -> Any:
+        # Protocol probes (e.g. by 'copy', 'pickle' or 'unittest.mock') must not load the model
+        if attribute.startswith("__") and attribute.endswith("__"):
+            raise AttributeError(attribute)
+        return getattr(self.load(), attribute)
+
+    def __setattr__(self, attribute: str, value: Any) -> None:
+        setattr(self.load(), attribute, value)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModel '{self._name}' ({state})>"
+
+
+class ModelRegistry:
+    """
+    Named lazy models of this process, with an explicit warmup for serving processes.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, LazyModel] = {}
+
+    def register(self, name: str, factory: Callable[[], Any], identifier: Optional[str] = None) -> LazyModel:
+        model = LazyModel(name, factory, identifier)
+        self._models[name] = model
+        return model
+
+    def get(self, name: str) -> LazyModel:
+        return self._models[name]
+
+    def names(self) -> List[str]:
+        return list(self._models)
+
+    def loaded(self) -> Dict[str, bool]:
+        return {name: model.loaded for name, model in self._models.items()}
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """
+        Loads the given models (all registered ones by default) and returns the seconds each load took.
+        Models that are already loaded take no time.
+        """
+        timings = {}
+        for name in (self.names() if names is None else names):
+            start = time.perf_counter()
+            self.get(name).load()
+            timings[name] = time.perf_counter() - start
+        return timings
+
+
+def warmupNamesFromEnvironment() -> Optional[List[str]]:
+    """
+    The models to load at startup according to MODEL_WARMUP: unset or empty for none, 'all', or a
+    comma-separated list of registered names (e.g. 'embedding,entailment').
+    """
+    value = os.getenv("MODEL_WARMUP", "").strip()
+    if not value:
+        return None
+    if value == "all":
+        return default_model_registry.names()
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def registerDefaultModels() -> None:
+    """Imports the model modules, which register their default models."""
+    from . import EmbeddingModels, EntailmentModels, EntityLinking  # noqa: F401
+
+
+def warmupFromEnvironment() -> Dict[str, float]:
+    """Loads the models named by MODEL_WARMUP, if any."""
+    if not os.getenv("MODEL_WARMUP", "").strip():
+        return {}
+    registerDefaultModels()
+    return default_model_registry.warmup(warmupNamesFromEnvironment())
+
+
+# A singleton holding the default models of all model modules
+default_model_registry = ModelRegistry()
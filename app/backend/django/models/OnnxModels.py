@@ -0,0 +1,261 @@
+"""
+ONNX Runtime backends for the embedding and entailment models, optionally with dynamically int8-quantized weights.
+
+'python manage.py onnx_export' exports the PyTorch models once (see 'exportEmbeddingModel' / 'exportEntailmentModel'),
+quantizes them with '--quantize' and reports the drift against the PyTorch path. Each export lives in its own
+directory under ONNX_MODEL_DIR together with its tokenizer, so serving an exported model never loads PyTorch weights.
+Select the backend per model with EMBEDDING_BACKEND / ENTAILMENT_BACKEND ('torch', 'onnx' or 'onnx-int8').
+
+Requires the optional 'onnxruntime' package (and 'onnx' for exporting and quantizing).
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from .EmbeddingModels import sPubMedBERT
+from .EntailmentModels import AbstractEntailmentModel, DeBERTaFinetunedHealth
+
+ONNX_MODEL_DIR = Path(os.getenv("ONNX_MODEL_DIR", Path(__file__).resolve().parent.parent / ".cache" / "onnx"))
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+CONFIG_FILE = "onnx.json"
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+# Used to trace the export and, unless a sample file is given, for the parity check
+SAMPLE_TEXTS = [
+    "Aspirin reduces the risk of recurrent stroke in patients with atrial fibrillation.",
+    "Metformin is the first-line treatment for type 2 diabetes mellitus.",
+    "Vitamin D supplementation did not reduce the incidence of cancer or cardiovascular disease.",
+    "Statin therapy lowers LDL cholesterol and the risk of major vascular events.",
+    "Randomized trials found no benefit of hydroxychloroquine for hospitalized patients with COVID-19.",
+    "Regular physical activity is associated with a lower risk of depression.",
+]
+
+
+def backend(variable: str) -> str:
+    """The backend selected by the environment 'variable' (default 'torch')."""
+    value = os.getenv(variable, "torch").strip() or "torch"
+    if value not in BACKENDS:
+        raise ValueError(f"{variable} must be one of {', '.join(BACKENDS)}, not '{value}'.")
+    return value
+
+
+def onnxDirectory(identifier: str) -> Path:
+    return ONNX_MODEL_DIR / re.sub(r"[^A-Za-z0-9_.-]+", "_", identifier)
+
+
+def samplePairs(texts: Sequence[str]) -> List[Tuple[str, str]]:
+    """Pairs every text with the next one and with itself, to cover both contradiction-ish and entailing pairs."""
+    return [(a, b) for a, b in zip(texts, list(texts[1:]) + list(texts[:1]))] + [(text, text) for text in texts]
+
+
+def _onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("The ONNX backends require the 'onnxruntime' package ('pip install onnxruntime onnx').") from e
+    return onnxruntime
+
+
+def _session(path: Path):
+    onnxruntime = _onnxruntime()
+    if not path.exists():
+        raise FileNotFoundError(f"No ONNX export at {path}; run 'python manage.py onnx_export' first.")
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if ONNX_THREADS:
+        options.intra_op_num_threads = ONNX_THREADS
+    return onnxruntime.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+
+
+def _readConfig(directory: Path) -> dict:
+    with open(directory / CONFIG_FILE) as f:
+        return json.load(f)
+
+
+def _exportTransformer(model: torch.nn.Module, inputs: Dict[str, torch.Tensor], path: Path, output_name: str) -> List[str]:
+    """Exports 'model' with dynamic batch and sequence axes; returns the names of its inputs."""
+    input_names = [name for name in INPUT_NAMES if name in inputs]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = {0: "batch", 1: "sequence"} if output_name == "last_hidden_state" else {0: "batch"}
+    model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(inputs[name] for name in input_names),
+            str(path),
+            input_names=input_names,
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            do_constant_folding=True,
+        )
+    return input_names
+
+
+def quantize(directory: Path) -> Path:
+    """Writes a copy of the export in 'directory' with dynamically int8-quantized weights."""
+    _onnxruntime()
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(str(directory / MODEL_FILE), str(directory / QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+    return directory / QUANTIZED_MODEL_FILE
+
+
+def exportEmbeddingModel(model: sPubMedBERT, directory: Optional[Path] = None) -> Path:
+    """Exports the transformer of a sentence-transformers model; pooling and normalization run in numpy."""
+    directory = directory or onnxDirectory(model.identifier)
+    directory.mkdir(parents=True, exist_ok=True)
+    transformer, pooling = model.model[0], model.model[1]
+    mode = pooling.get_pooling_mode_str()
+    if mode not in ("mean", "cls"):
+        raise ValueError(f"Unsupported pooling mode '{mode}' for the ONNX export.")
+    inputs = model.model.tokenizer(SAMPLE_TEXTS[:2], padding=True, truncation=True, return_tensors="pt")
+    _exportTransformer(transformer.auto_model, inputs, directory / MODEL_FILE, "last_hidden_state")
+    model.model.tokenizer.save_pretrained(directory)
+    with open(directory / CONFIG_FILE, "w") as f:
+        json.dump({
+            "identifier": model.identifier,
+            "dimension": model.embeddingDimension(),
+            "max_seq_length": model.model.max_seq_length,
+            "pooling": mode,
+            "normalize": any(type(module).__name__ == "Normalize" for module in model.model),
+        }, f, indent=2)
+    return directory
+
+
+def exportEntailmentModel(model: DeBERTaFinetunedHealth, directory: Optional[Path] = None) -> Path:
+    """Exports a sequence classification model up to its logits; the softmax runs in PyTorch as before."""
+    directory = directory or onnxDirectory(model.identifier)
+    directory.mkdir(parents=True, exist_ok=True)
+    inputs = model._tokenizeBatch(samplePairs(SAMPLE_TEXTS[:2]))
+    _exportTransformer(model.model, inputs, directory / MODEL_FILE, "logits")
+    model.tokenizer.save_pretrained(directory)
+    with open(directory / CONFIG_FILE, "w") as f:
+        json.dump({"identifier": model.identifier}, f, indent=2)
+    return directory
+
+
+class OnnxEmbeddingModel(sPubMedBERT):
+    """
+    An exported sentence-transformers model run with ONNX Runtime. Its identifier names the backend, so
+    embedding and query caches never mix its vectors with those of the PyTorch model.
+    """
+    def __init__(self, directory: Path, quantized: bool = False):
+        from transformers import AutoTokenizer
+        config = _readConfig(directory)
+        self.model = None
+        self.session = _session(directory / (QUANTIZED_MODEL_FILE if quantized else MODEL_FILE))
+        self.inputNames = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(directory))
+        self.maxLength: int = config["max_seq_length"]
+        self.pooling: str = config["pooling"]
+        self.normalize: bool = config["normalize"]
+        self.dimension: int = config["dimension"]
+        self.identifier: str = config["identifier"] + ("+onnx-int8" if quantized else "+onnx")
+
+    @classmethod
+    def fromExport(cls, identifier: str, quantized: bool = False) -> 'OnnxEmbeddingModel':
+        return cls(onnxDirectory(identifier), quantized=quantized)
+
+    def embeddingDimension(self) -> int:
+        return self.dimension
+
+    def embedText(self, text: str, asTensor: bool = False):
+        embedding = self._encode([text], 1)[0]
+        if asTensor:
+            return torch.from_numpy(embedding).unsqueeze(0)
+        return embedding.tolist()
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        # Longest texts first, so every batch is padded only to similar lengths
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            bucket = order[start:start + batch_size]
+            inputs = self.tokenizer(
+                [texts[i] for i in bucket], padding=True, truncation=True, max_length=self.maxLength, return_tensors="np"
+            )
+            hidden = self.session.run(
+                ["last_hidden_state"], {name: inputs[name].astype(np.int64) for name in self.inputNames}
+            )[0]
+            embeddings[bucket] = self._pool(hidden, inputs["attention_mask"])
+        return embeddings
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+
+class _OnnxSequenceClassifier:
+    """Callable like a Huggingface sequence classification model, returning an object with PyTorch 'logits'."""
+    class Output:
+        def __init__(self, logits: torch.Tensor):
+            self.logits = logits
+
+    def __init__(self, session):
+        self.session = session
+        self.inputNames = [i.name for i in session.get_inputs()]
+
+    def __call__(self, **inputs: torch.Tensor) -> 'Output':
+        feed = {name: inputs[name].numpy().astype(np.int64) for name in self.inputNames}
+        return self.Output(torch.from_numpy(self.session.run(["logits"], feed)[0]))
+
+
+class OnnxEntailmentModel(DeBERTaFinetunedHealth):
+    """
+    The exported entailment model run with ONNX Runtime; tokenization, length bucketing and label mapping are
+    those of the PyTorch model.
+    """
+    def __init__(self, directory: Path, quantized: bool = False):
+        from transformers import AutoTokenizer
+        config = _readConfig(directory)
+        self.model = _OnnxSequenceClassifier(_session(directory / (QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)))
+        self.tokenizer = AutoTokenizer.from_pretrained(str(directory))
+        self.identifier = config["identifier"] + ("+onnx-int8" if quantized else "+onnx")
+
+    @classmethod
+    def fromExport(cls, identifier: str, quantized: bool = False) -> 'OnnxEntailmentModel':
+        return cls(onnxDirectory(identifier), quantized=quantized)
+
+
+def embeddingParity(reference, candidate, texts: Sequence[str], batch_size: int = 16) -> Dict[str, float]:
+    """Cosine similarity and largest absolute difference between the embeddings of two models."""
+    a = reference._encode(list(texts), batch_size).astype(np.float64)
+    b = candidate._encode(list(texts), batch_size).astype(np.float64)
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {
+        "samples": len(texts),
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "max_abs_diff": float(np.abs(a - b).max()),
+    }
+
+
+def entailmentParity(reference, candidate, pairs: Sequence[Tuple[str, str]], batch_size: int = 16) -> Dict[str, float]:
+    """Largest and mean probability drift and the share of equal top labels between two entailment models."""
+    def probabilities(model) -> np.ndarray:
+        predictions: List[AbstractEntailmentModel.Prediction] = model.predict_batch(list(pairs), batch_size=batch_size)
+        return np.array([[p.contradiction, p.entailment, p.neutral or 0.0] for p in predictions])
+
+    a, b = probabilities(reference), probabilities(candidate)
+    drift = np.abs(a - b).max(axis=1)
+    return {
+        "samples": len(pairs),
+        "max_probability_drift": float(drift.max()),
+        "mean_probability_drift": float(drift.mean()),
+        "label_agreement": float((a.argmax(axis=1) == b.argmax(axis=1)).mean()),
+    }
@@ -0,0 +1,60 @@
+# Batched search for the sentence of an abstract that is most relevant to a query
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .EmbeddingModels import AbstractEmbeddingModel, default_embeddingModel_instance
+
+
+def splitSentences(abstract: str) -> List[str]:
+    """
+    Separates an abstract into sentences.
+    """
+    return re.split(r'(?<=[.!?]) +', abstract)
+
+
+def findRelevantSentences(
+    query: str,
+    abstracts: Sequence[str],
+    model: Optional[AbstractEmbeddingModel] = None,
+    query_embedding: Optional[Sequence[float]] = None,
+    batch_size: int = 64,
+) -> List[Tuple[str, float]]:
+    """
+    Returns the most relevant sentence of every abstract together with its similarity to the query.
+
+    The query is encoded once (or 'query_embedding' is reused), the sentences of all abstracts are encoded
+    together in padded batches, and the per-abstract argmax is computed in one vectorized pass.
+    Similarities are scaled from [-1, 1] to [0, 1], as in 'unitCosineSimilarity(..., prune=False)'.
+    """
+    if not abstracts:
+        return []
+    if model is None:
+        model = default_embeddingModel_instance
+
+    sentences: List[str] = []
+    owners: List[int] = []
+    for idx, abstract in enumerate(abstracts):
+        abstract_sentences = splitSentences(abstract or "")
+        sentences.extend(abstract_sentences)
+        owners.extend([idx] * len(abstract_sentences))
+    owners = np.asarray(owners)
+
+    if query_embedding is None:
+        query_embedding = model.embedText(query)
+    query_vector = np.asarray(query_embedding, dtype=np.float32)
+    query_vector = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+
+    sentence_embeddings = model.embedTexts(sentences, batch_size=batch_size)
+    norms = np.linalg.norm(sentence_embeddings, axis=1, keepdims=True)
+    similarities = (sentence_embeddings / np.maximum(norms, 1e-12)) @ query_vector
+    similarities = (similarities + 1) / 2
+
+    # Sort by (abstract, -similarity); the first sentence of each abstract is then its best one
+    order = np.lexsort((-similarities, owners))
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = owners[order][1:] != owners[order][:-1]
+    best = order[is_first]
+
+    return [(sentences[i], float(similarities[i])) for i in best]
@@ -2,15 +2,13 @@ from datetime import datetime
 from typing import List, Optional, Tuple, Dict
 import json
 import re
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
-import torch
 import requests
-import xml.etree.ElementTree as ET
 import os
 
+from services.pubmed_parser import iterparse_articles
+from .ModelRegistry import LazyModel
+
 # ========================== Document and Models ==========================
 
 class Document:
@@ -72,6 +70,7 @@ class AbstractEmbeddingModel:
     """Wraps an embedding model for consistent interface usage."""
 
     def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
         self.model = SentenceTransformer(model_name)
         self.identifier = model_name
 
@@ -83,6 +82,7 @@ class AbstractEmbeddingModel:
         embedding2 = self.embedText(text2)
         if embedding1.size == 0 or embedding2.size == 0:
             return 0.0
+        from sklearn.metrics.pairwise import cosine_similarity
         similarity = cosine_similarity([embedding1], [embedding2])[0][0]
         if prune:
             similarity = max(0, similarity)
@@ -94,11 +94,13 @@ class AbstractEntailmentModel:
     """Base class for entailment models."""
 
     def __init__(self, model_name: str):
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
         self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.identifier = model_name
 
     def predict(self, sentence_a: str, sentence_b: str):
+        import torch
         inputs = self.tokenizer(sentence_a, sentence_b, return_tensors="pt")
         outputs = self.model(**inputs)
         probs = torch.nn.functional.softmax(outputs.logits, dim=-1)[0]
@@ -108,9 +110,13 @@ class AbstractEntailmentModel:
             "contradiction": probs[2].item()
         }
 
-# Default models
-default_embeddingModel_instance = AbstractEmbeddingModel('pritamdeka/S-PubMedBert-MS-MARCO-SCIFACT')
-default_entailmentModel_instance = AbstractEntailmentModel('MoritzLaurer/DeBERTa-v3-large-mnli-fever-anli-ling-wanli')
+# Default models, loaded on first use
+default_embeddingModel_instance = LazyModel(
+    "pubmed.embedding", lambda: AbstractEmbeddingModel('pritamdeka/S-PubMedBert-MS-MARCO-SCIFACT')
+)
+default_entailmentModel_instance = LazyModel(
+    "pubmed.entailment", lambda: AbstractEntailmentModel('MoritzLaurer/DeBERTa-v3-large-mnli-fever-anli-ling-wanli')
+)
 
 # ========================== Workflow Functions ==========================
 
@@ -160,25 +166,17 @@ def search_and_fetch_pubmed(query, retmax=500, fetch_limit=250):
         print("Error fetching metadata:", fetch_response.text)
         return []
 
-    metadata = fetch_response.text  # XML response as text
-
     # Parse the XML response
-    root = ET.fromstring(metadata)
     articles = []
-    for article in root.findall(".//PubmedArticle"):
-        pmid = article.findtext(".//PMID")
-        title = article.findtext(".//ArticleTitle")
-        abstract = article.findtext(".//Abstract/AbstractText")
+    for record in iterparse_articles(fetch_response.content):
+        abstract = record.firstAbstractText
         if abstract is None:
             continue
-        pub_date = article.findtext(".//PubDate/Year")
-        if not pub_date:
-            pub_date = article.findtext(".//PubDate/MedlineDate")
         articles.append({
-            "pmid": pmid,
-            "title": title,
+            "pmid": record.pmid,
+            "title": record.title,
             "abstract": abstract,
-            "publicationDate": pub_date
+            "publicationDate": record.year or record.medlineDate
         })
     return articles
 
@@ -186,11 +184,13 @@ def search_and_fetch_pubmed(query, retmax=500, fetch_limit=250):
 def embed_and_rank_documents(query: str, documents: List[Dict]) -> List[Dict]:
     query_embedding = default_embeddingModel_instance.embedText(query)
     document_embeddings = [default_embeddingModel_instance.embedText(doc["abstract"]) for doc in documents]
+    from sklearn.metrics.pairwise import cosine_similarity
     similarities = cosine_similarity([query_embedding], document_embeddings)[0]
     ranked_indices = similarities.argsort()[::-1][:10]  # Get top 10 most similar documents
     return [documents[i] for i in ranked_indices]
 
 def rank_sentences_in_documents(query: str, top_documents: List[Dict]):
+    from sklearn.metrics.pairwise import cosine_similarity
     query_embedding = default_embeddingModel_instance.embedText(query)
     ranked_results = []
     for doc in top_documents:
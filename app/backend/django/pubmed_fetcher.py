@@ -1,8 +1,9 @@
 import requests
 from typing import List, Dict
-import xml.etree.ElementTree as ET
 from datetime import datetime
 
+from services.pubmed_parser import PubmedArticleParser
+
 class PubMedFetcher:
     def __init__(self, api_key: str):
         self.api_key = api_key
@@ -27,31 +28,19 @@ class PubMedFetcher:
             "retmode": "xml",
             "api_key": self.api_key
         }
-        response = requests.get(self.base_fetch_url, params=params)
-        root = ET.fromstring(response.text)
-        
-        articles = []
-        for article in root.findall(".//PubmedArticle"):
-            try:
-                abstract = article.find(".//Abstract/AbstractText")
-                abstract_text = abstract.text if abstract is not None else ""
-                
-                title = article.find(".//ArticleTitle")
-                title_text = title.text if title is not None else ""
-                
-                pmid = article.find(".//PMID").text
-                
-                date_elem = article.find(".//PubDate")
-                year = date_elem.find("Year").text if date_elem.find("Year") is not None else "1900"
-                
-                articles.append({
-                    "identifier": pmid,
-                    "title": title_text,
-                    "abstract": abstract_text,
-                    "publicationDate": f"{year}-01-01T00:00:00Z"
-                })
-            except Exception as e:
-                print(f"Error processing article {pmid}: {e}")
-                continue
-                
-        return articles
\ No newline at end of file
+        response = requests.get(self.base_fetch_url, params=params, stream=True)
+        response.raise_for_status()
+
+        # Articles are parsed while the response is still downloading
+        parser = PubmedArticleParser()
+        records = []
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            records.extend(parser.feed(chunk))
+        records.extend(parser.close())
+
+        return [{
+            "identifier": record.pmid,
+            "title": record.title or "",
+            "abstract": record.firstAbstractText or "",
+            "publicationDate": f"{record.year or '1900'}-01-01T00:00:00Z"
+        } for record in records]
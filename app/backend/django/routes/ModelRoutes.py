@@ -0,0 +1,7 @@
+from django.urls import path
+from controller import ModelController
+
+urlpatterns = [
+    path('status/', ModelController.get_model_status, name='model-status'),
+    path('warmup/', ModelController.warmup_models, name='model-warmup'),
+]
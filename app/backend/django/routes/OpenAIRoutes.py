@@ -8,10 +8,12 @@ urlpatterns = [
     path('document-summary', 
          csrf_exempt(OpenAIController.get_summary), 
          name='document_summary'),
+    path('document-summary/stream', OpenAIController.stream_summary, name='document_summary_stream'),
    path('document-summaries', 
         csrf_exempt(OpenAIController.get_document_summaries), 
         name='document_summaries'),
      path('agreeableness', csrf_exempt(OpenAIController.get_agreeableness), name='agreeableness'),
+    path('analysis', OpenAIController.analyze, name='analysis'),
 path('query-keywords', csrf_exempt(OpenAIController.extract_query_keywords), name='query_keywords'),
         path('query-keywords', csrf_exempt(OpenAIController.extract_query_keywords), name='query_keywords'),
     path('medical-keywords', csrf_exempt(OpenAIController.extract_medical_keywords), name='medical_keywords'),
@@ -70,6 +70,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be at the top
+    'services.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     #'corsheaders.middleware.CorsMiddleware',
@@ -136,6 +137,34 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# 'query_results' holds ranked /query/ results shared by all users and worker processes on a host
+# 'mesh_terms' holds the MeSH terms linked to query texts
+# 'llm_completions' holds OpenAI completions by prompt and parameters
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'query_results': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('QUERY_CACHE_DIR', str(BASE_DIR / '.cache' / 'query_results')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '10000'))},
+    },
+    'mesh_terms': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('MESH_CACHE_DIR', str(BASE_DIR / '.cache' / 'mesh_terms')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('MESH_CACHE_PERSISTENT_MAX_ENTRIES', '100000'))},
+    },
+    'llm_completions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('LLM_CACHE_DIR', str(BASE_DIR / '.cache' / 'llm_completions')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('LLM_CACHE_PERSISTENT_MAX_ENTRIES', '20000'))},
+    },
+}
+
+
 #PGPASSWORD=ewRMVbAvzsujSCKovRDqKRxJPkkGlBxQ psql -h tramway.proxy.rlwy.net -U postgres -p 44453 -d railway
 
 # Password validation
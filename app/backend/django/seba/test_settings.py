@@ -7,6 +7,24 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'query_results': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'query_results',
+    },
+    'mesh_terms': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mesh_terms',
+    },
+    'llm_completions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'llm_completions',
+    },
+}
+
 # Disable any unnecessary apps during testing
 INSTALLED_APPS = [
     'django.contrib.auth',
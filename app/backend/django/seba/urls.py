@@ -20,6 +20,7 @@ from django.contrib import admin
 from django.urls import path, include
 from controller.QueryController import queryDocuments, get_base_query_results, get_further_reads_results
 from controller.OpenAIController import extract_medical_keywords
+from controller.MetricsController import metrics
 from api.views import CreateUserView, UserDetailView, SearchHistoryView, SearchHistoryUpdateView, DailyQuestionCountView
 from controller.QueryController import get_relevant_sections
 from api.views import CreateUserView, UserDetailView, SearchHistoryView, SearchHistoryUpdateView, SearchHistoryDeleteView, DailyQuestionCountView, SearchResultsView
@@ -45,6 +46,8 @@ from api.views import (
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
+    path('models/', include('routes.ModelRoutes')),
     path('query/<str:queryText>/', queryDocuments, name='query_documents'),  # Pass the function, not a string
     path('query/info/<str:queryText>', get_further_reads_results, name='query.get_further_reads_results'),
     path('document/', include('routes.DocumentRoutes')),
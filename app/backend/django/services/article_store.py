@@ -0,0 +1,209 @@
+"""
+Local store of PubMed articles keyed by PMID.
+
+Each record keeps the parsed title, abstract sections and publication year next to the raw PubmedArticle XML,
+which is stored content-addressed (by SHA-256) so unchanged articles are never rewritten. Records older than
+ARTICLE_STORE_TTL seconds are refreshed from efetch; only PMIDs that are missing or stale are fetched, in one
+batched call per request. Records not refreshed within ARTICLE_STORE_RETENTION seconds, and XML no record points
+to, are pruned by a maintenance step that runs at most every ARTICLE_STORE_MAINTENANCE_INTERVAL seconds per
+process (or on demand with 'python manage.py prune_article_store').
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from services.ncbi_client import PubMedClient, default_pubmed_client
+from services.pubmed_parser import PubmedArticleRecord, aiterparse_articles
+
+DEFAULT_STORE_PATH = Path(__file__).resolve().parent.parent / ".cache" / "articles.sqlite3"
+
+
+class ArticleStore:
+    """
+    SQLite-backed article records shared by all worker processes on a host.
+    """
+
+    def __init__(self, path: Path, ttl_seconds: float, retention_seconds: float = 30 * 24 * 3600, maintenance_interval: float = 3600):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        # Stale records are still served when efetch fails, so they are kept well beyond the TTL
+        self.retention_seconds = retention_seconds
+        self.maintenance_interval = maintenance_interval
+        self._local = threading.local()
+        self._maintenance_lock = threading.Lock()
+        self._last_maintenance = time.monotonic()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared across threads.
+        # The database is created on first use, so importing this module has no side effects.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS blobs (xml_hash TEXT PRIMARY KEY, xml BLOB NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS articles ("
+                " pmid TEXT PRIMARY KEY,"
+                " title TEXT,"
+                " sections TEXT NOT NULL,"
+                " year TEXT,"
+                " medline_date TEXT,"
+                " xml_hash TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS articles_xml_hash ON articles (xml_hash)")
+            connection.execute("CREATE INDEX IF NOT EXISTS articles_fetched_at ON articles (fetched_at)")
+            self._local.connection = connection
+        return connection
+
+    def get_many(self, pmids: Sequence[str]) -> Tuple[Dict[str, PubmedArticleRecord], Dict[str, PubmedArticleRecord]]:
+        """
+        Returns two maps of PMID to record: fresh records, and records older than the TTL.
+        The raw XML is not loaded; use 'get_xml' for that.
+        """
+        fresh, stale = {}, {}
+        now = time.time()
+        pmids = list(dict.fromkeys(pmids))
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(pmids), 500):
+            chunk = pmids[start:start + 500]
+            rows = self._connection().execute(
+                f"SELECT pmid, title, sections, year, medline_date, fetched_at FROM articles"
+                f" WHERE pmid IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for pmid, title, sections, year, medline_date, fetched_at in rows:
+                record = PubmedArticleRecord(
+                    pmid=pmid,
+                    title=title,
+                    sections=[tuple(section) for section in json.loads(sections)],
+                    year=year,
+                    medlineDate=medline_date,
+                )
+                (fresh if now - fetched_at <= self.ttl_seconds else stale)[pmid] = record
+        return fresh, stale
+
+    def get_xml(self, pmid: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT blobs.xml FROM articles JOIN blobs USING (xml_hash) WHERE articles.pmid = ?", (pmid,)
+        ).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def put_many(self, records: Sequence[PubmedArticleRecord]) -> None:
+        """
+        Stores freshly fetched records; each record must carry its raw PubmedArticle XML.
+        """
+        if not records:
+            return
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for record in records:
+                xml_hash = hashlib.sha256(record.xml).hexdigest()
+                connection.execute(
+                    "INSERT OR IGNORE INTO blobs VALUES (?, ?)", (xml_hash, zlib.compress(record.xml))
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (record.pmid, record.title, json.dumps(record.sections), record.year,
+                     record.medlineDate, xml_hash, now)
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._maintain()
+
+    def _maintain(self) -> None:
+        """Prunes the store if the maintenance interval has passed since this process last did."""
+        with self._maintenance_lock:
+            if time.monotonic() - self._last_maintenance < self.maintenance_interval:
+                return
+            self._last_maintenance = time.monotonic()
+        try:
+            self.prune()
+        except sqlite3.Error as e:
+            print(f"Error pruning the article store: {str(e)}")
+
+    def prune(self) -> Tuple[int, int]:
+        """
+        Deletes records not refreshed within the retention period, then XML versions no record points to
+        anymore. Returns the numbers of deleted records and XML versions.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            articles = connection.execute(
+                "DELETE FROM articles WHERE fetched_at < ?", (time.time() - self.retention_seconds,)
+            ).rowcount
+            blobs = connection.execute(
+                "DELETE FROM blobs WHERE NOT EXISTS (SELECT 1 FROM articles WHERE articles.xml_hash = blobs.xml_hash)"
+            ).rowcount
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return articles, blobs
+
+
+async def iter_efetch_articles(pmids: List[str], client: Optional[PubMedClient] = None, store: Optional[ArticleStore] = None) -> AsyncIterator[PubmedArticleRecord]:
+    """
+    Streams 'pmids' from efetch in one call, yielding each record as soon as it has been parsed.
+    The records are stored once the response is complete. SQLite calls (and any pruning they trigger) run in a
+    worker thread, never on the event loop.
+    """
+    records = []
+    async for record in aiterparse_articles((client or default_pubmed_client).efetch_stream(pmids), keep_xml=True):
+        records.append(record)
+        yield record
+    await asyncio.to_thread((store or default_article_store).put_many, records)
+
+
+async def efetch_articles(pmids: List[str], client: Optional[PubMedClient] = None, store: Optional[ArticleStore] = None) -> List[PubmedArticleRecord]:
+    """
+    Fetches 'pmids' from efetch in one call and stores the parsed records.
+    """
+    return [record async for record in iter_efetch_articles(pmids, client=client, store=store)]
+
+
+async def fetch_articles(pmids: List[str], client: Optional[PubMedClient] = None, store: Optional[ArticleStore] = None) -> List[PubmedArticleRecord]:
+    """
+    Returns the records of 'pmids' in the given order, omitting PMIDs that PubMed does not know.
+    Fresh records come from the store; missing and stale ones are fetched in one efetch call. If that call
+    fails, stale records are served rather than failing the request.
+    """
+    store = store or default_article_store
+    fresh, stale = await asyncio.to_thread(store.get_many, pmids)
+    missing = [pmid for pmid in dict.fromkeys(pmids) if pmid not in fresh]
+    if missing:
+        try:
+            for record in await efetch_articles(missing, client=client, store=store):
+                fresh[record.pmid] = record
+        except httpx.HTTPError as e:
+            if not stale:
+                raise
+            print(f"Error refreshing articles, serving stored records: {str(e)}")
+            fresh.update(stale)
+    return [fresh[pmid] for pmid in pmids if pmid in fresh]
+
+
+# A singleton shared by all controllers
+default_article_store = ArticleStore(
+    path=Path(os.getenv("ARTICLE_STORE_PATH", str(DEFAULT_STORE_PATH))),
+    ttl_seconds=float(os.getenv("ARTICLE_STORE_TTL", str(7 * 24 * 3600))),
+    retention_seconds=float(os.getenv("ARTICLE_STORE_RETENTION", str(30 * 24 * 3600))),
+    maintenance_interval=float(os.getenv("ARTICLE_STORE_MAINTENANCE_INTERVAL", "3600")),
+)
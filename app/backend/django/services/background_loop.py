@@ -0,0 +1,43 @@
+"""
+One long-lived event loop in a daemon thread, for synchronous code that calls the async clients.
+
+'async_to_sync' runs every call on a new event loop, so the per-loop connection pools of the NCBI and OpenAI
+clients would be rebuilt, and their keep-alive connections lost, on every call. Sync views run their
+coroutines on this loop instead and share one set of pooled clients.
+"""
+import asyncio
+import functools
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """The shared loop, started on first use."""
+    global _loop
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="background-loop", daemon=True).start()
+        return _loop
+
+
+def run_sync(function: Callable[..., Awaitable[Any]]) -> Callable[..., Any]:
+    """
+    Like 'async_to_sync', but runs 'function' on the shared background loop. The coroutine sees a copy of the
+    caller's context variables, so stages it times are recorded for the caller's request.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("run_sync cannot be called from a running event loop, await the function instead")
+        # 'run_coroutine_threadsafe' schedules the task in a copy of the current context
+        return asyncio.run_coroutine_threadsafe(function(*args, **kwargs), background_loop()).result()
+
+    return wrapper
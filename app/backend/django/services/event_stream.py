@@ -0,0 +1,27 @@
+"""
+Serialization of streamed pipeline events as NDJSON lines or Server-Sent Events.
+"""
+import json
+from typing import AsyncIterator
+
+from django.http import StreamingHttpResponse
+
+
+def format_stream_event(event: dict, mode: str) -> bytes:
+    """Serialize a pipeline event as one NDJSON line or one Server-Sent Event."""
+    if mode == "sse":
+        data = json.dumps({key: value for key, value in event.items() if key != "event"})
+        return f"event: {event['event']}\ndata: {data}\n\n".encode("utf-8")
+    return (json.dumps(event) + "\n").encode("utf-8")
+
+
+def streaming_response(events: AsyncIterator[dict], mode: str) -> StreamingHttpResponse:
+    async def body():
+        async for event in events:
+            yield format_stream_event(event, mode)
+
+    content_type = "text/event-stream" if mode == "sse" else "application/x-ndjson"
+    response = StreamingHttpResponse(body(), content_type=content_type)
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Keep reverse proxies from buffering the stream
+    return response
@@ -0,0 +1,158 @@
+"""
+Load tests of the LLM endpoints: drives '/openai/...' of a running backend at a fixed concurrency and reports
+throughput and latency percentiles. Pair it with the mock server (services/mock_openai.py) to measure the
+backend itself without API spend or rate limits.
+
+Run with 'python manage.py loadtest'.
+"""
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+# name -> (path, streamed as Server-Sent Events)
+ENDPOINTS = {
+    "summary": ("/openai/document-summary", False),
+    "document-summaries": ("/openai/document-summaries", False),
+    "agreeableness": ("/openai/agreeableness", False),
+    "summary-stream": ("/openai/document-summary/stream", True),
+    "analysis": ("/openai/analysis", True),
+}
+
+TOPICS = ["coffee", "sitting", "sleep", "statins", "running", "vitamin D", "fasting", "aspirin", "red wine", "screen time"]
+OUTCOMES = ["mortality", "blood pressure", "cognitive decline", "insulin resistance", "depressive symptoms", "weight gain"]
+
+
+def sample_documents(count: int, seed: int = 0) -> List[dict]:
+    """'count' synthetic documents with abstracts of realistic length."""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        topic, outcome = rng.choice(TOPICS), rng.choice(OUTCOMES)
+        sentences = [
+            f"BACKGROUND: The association between {topic} and {outcome} remains debated.",
+            f"METHODS: We followed {rng.randint(200, 90000)} adults for {rng.randint(1, 20)} years.",
+            f"RESULTS: Higher {topic} was associated with a hazard ratio of {rng.uniform(0.6, 1.6):.2f} for {outcome}.",
+            f"CONCLUSIONS: {topic.capitalize()} may {'lower' if rng.random() < 0.5 else 'raise'} the risk of {outcome}.",
+        ]
+        documents.append({"pmid": str(30000000 + seed * 1000 + i), "abstract": " ".join(sentences * 3)})
+    return documents
+
+
+def percentile(values: List[float], q: float) -> float:
+    """The 'q'-th percentile (0-100) of 'values', linearly interpolated."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies, default=0.0),
+    }
+
+
+def report(endpoint: str, concurrency: int, elapsed: float, latencies: List[float], first_events: List[float], errors: int) -> dict:
+    result = {
+        "endpoint": endpoint,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": latency_summary(latencies),
+    }
+    if first_events:
+        result["first_event"] = latency_summary(first_events)
+    return result
+
+
+def format_report(result: dict) -> str:
+    def row(name, summary):
+        return (
+            f"  {name:<12} mean {summary['mean'] * 1000:8.1f} ms   p50 {summary['p50'] * 1000:8.1f} ms   "
+            f"p95 {summary['p95'] * 1000:8.1f} ms   p99 {summary['p99'] * 1000:8.1f} ms   max {summary['max'] * 1000:8.1f} ms"
+        )
+
+    lines = [
+        f"{result['endpoint']}: {result['requests']} requests ({result['errors']} failed) at concurrency "
+        f"{result['concurrency']} in {result['seconds']:.1f}s, {result['throughput']:.1f} requests/s",
+        row("latency", result["latency"]),
+    ]
+    if "first_event" in result:
+        lines.append(row("first event", result["first_event"]))
+    return "\n".join(lines)
+
+
+async def run_load_test(
+    base_url: str,
+    endpoint: str,
+    requests: int,
+    concurrency: int,
+    documents: int = 10,
+    distinct_queries: bool = True,
+    timeout: float = 300,
+) -> dict:
+    """
+    Sends 'requests' POSTs to 'endpoint' (a name in ENDPOINTS) with at most 'concurrency' in flight. With
+    'distinct_queries', every request asks a different query, so completion caches are not hit.
+    """
+    import aiohttp
+
+    path, streamed = ENDPOINTS[endpoint]
+    latencies: List[float] = []
+    first_events: List[float] = []
+    errors = 0
+    next_request = 0
+
+    def body(i: int) -> dict:
+        number = i if distinct_queries else 0
+        return {"query": f"Is {TOPICS[number % len(TOPICS)]} healthy? (#{number})", "documents": sample_documents(documents, seed=number)}
+
+    async def send(session, i: int) -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        first_event = None
+        try:
+            async with session.post(base_url.rstrip("/") + path, json=body(i)) as response:
+                if not streamed:
+                    payload = await response.json(content_type=None)
+                    failed = response.status != 200 or "error" in payload
+                else:
+                    failed = response.status != 200
+                    async for line in response.content:
+                        if first_event is None and line.startswith(b"event: "):
+                            first_event = time.perf_counter() - start
+                        failed = failed or line.startswith(b"event: error")
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+            print(f"Request {i} failed: {str(e)}")
+            failed = True
+        if failed:
+            errors += 1
+            return
+        latencies.append(time.perf_counter() - start)
+        if first_event is not None:
+            first_events.append(first_event)
+
+    async def worker(session) -> None:
+        nonlocal next_request
+        while next_request < requests:
+            i = next_request
+            next_request += 1
+            await send(session, i)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return report(endpoint, concurrency, elapsed, latencies, first_events, errors)
@@ -0,0 +1,72 @@
+"""
+Two-tier memoization of deterministic, comparatively expensive computations (e.g. MeSH linking of a query).
+
+The first tier is a bounded LRU in this process. The optional second tier is a Django cache alias, so a result
+computed by one worker process is reused by all others using the same backend, and survives restarts if the
+backend is persistent.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from django.core.cache import caches
+
+
+class MemoCache:
+    """
+    Returns memoized results for keys, computing and storing them on a miss. Errors of the shared tier are
+    logged and treated as misses, so a broken cache never fails a request.
+    """
+
+    def __init__(self, max_entries: int, alias: Optional[str] = None, timeout: Optional[float] = None):
+        self.max_entries = max_entries
+        self.alias = alias
+        self.timeout = timeout
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.alias is None:
+            return None
+        try:
+            value = caches[self.alias].get(key)
+        except Exception as e:
+            print(f"Error reading memo cache {self.alias}: {str(e)}")
+            return None
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._remember(key, value)
+        if self.alias is None:
+            return
+        try:
+            caches[self.alias].set(key, value, timeout=self.timeout)
+        except Exception as e:
+            print(f"Error writing memo cache {self.alias}: {str(e)}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Forgets the in-process tier only."""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,184 @@
+"""
+Stand-in for the OpenAI chat completions API, for load tests and local development without API spend.
+
+Answers are deterministic for a given prompt and follow the formats the OpenAIController prompts ask for
+('Document N: Yes: x%, No: y%', one summary line per document, categorized summaries citing [n], keyword lists).
+Latency, generation speed and errors (429 with Retry-After, 500) are configurable; streaming is supported.
+
+Run with 'python manage.py mock_openai' and point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8090/v1.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Iterator, List, Optional
+
+# Characters per streamed chunk, about one token
+STREAM_CHUNK_CHARS = 4
+
+
+class MockBehaviour:
+    """
+    How the mock server responds: after 'latency' plus up to 'jitter' seconds, at 'tokens_per_second' (0 for all
+    at once); a share 'error_rate' of requests fails with 'error_status' instead.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.2,
+        tokens_per_second: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 429,
+        retry_after: float = 1.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.seed = seed
+
+
+def _digest(*parts: str) -> int:
+    return int(hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _documents(text: str) -> List[str]:
+    """The numbered documents ('Document N:' blocks) of a prompt, in order."""
+    return [body.strip() for _, body in re.findall(r"Document (\d+):\n(.*?)(?=\nDocument \d+:\n|\Z)", text, re.S)]
+
+
+def _firstSentence(document: str, length: int) -> str:
+    return " ".join(document.split(".")[0].split())[:length]
+
+
+def _numbers(text: str) -> List[int]:
+    return [int(number) for number in re.findall(r"Document (\d+):\n", text)]
+
+
+def mock_completion(messages: List[dict]) -> str:
+    """A deterministic answer to 'messages' in the format their system prompt asks for."""
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    user = str(messages[-1].get("content", "")) if messages else ""
+    query = user.split("\n", 1)[0].replace("Query: ", "", 1)
+    numbers, documents = _numbers(user), _documents(user)
+
+    if "Yes: X%, No: Y%" in system:
+        lines = []
+        for number, document in zip(numbers, documents):
+            agree = _digest(query, document) % 101
+            lines.append(f"Document {number}: Yes: {agree}%, No: {100 - agree}%")
+        return "\n".join(lines)
+    if "one-sentence summary for each document" in system:
+        return "\n".join(
+            f"Document {number}: {_firstSentence(document, 160)} relates to {query}."
+            for number, document in zip(numbers, documents)
+        )
+    if "Merge the findings" in system:
+        cited = sorted({int(number) for number in re.findall(r"\[(\d+)\]", user)})
+        return f"- Merged findings on {query} ({', '.join(f'[{number}]' for number in cited)})"
+    if "List the findings" in system:
+        return "\n".join(f"- {_firstSentence(document, 120)} ([{number}])" for number, document in zip(numbers, documents))
+    if "keyword extractor" in system and "Queries:" in user:
+        words = sorted(set(re.findall(r"[a-z]{4,}", user.lower())), key=lambda word: _digest(word))
+        return "\n".join(f"- {word}" for word in words[:12])
+    if "keyword extractor" in system:
+        requested = re.search(r"exactly (\d+) results", system)
+        top_n = int(requested.group(1)) if requested else 3
+        categories = ["Cardiology", "Neurology", "Oncology", "Endocrinology", "Immunology", "Nutrition", "Psychiatry"]
+        start = _digest(user) % len(categories)
+        return json.dumps([categories[(start + i) % len(categories)] for i in range(top_n)])
+
+    # Categorized summary; the findings of a map-reduced summary cite documents as ([n])
+    cited = numbers or [int(n) for n in re.findall(r"\[(\d+)\]", user)] or [1]
+    groups = [cited[i:i + 3] for i in range(0, len(cited), 3)]
+    lines = [f"The documents give a mixed answer to '{query}', with most evidence pointing one way.", ""]
+    for i, group in enumerate(groups, 1):
+        references = ", ".join(f"[{n}]" for n in group)
+        lines.append(f"### Findings {i}")
+        lines.append(f"- **Group {i}**: These studies report related outcomes ({references}).")
+        lines.append("")
+    return "\n".join(lines).strip()
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // STREAM_CHUNK_CHARS)
+
+
+def completion_body(content: str, model: str, prompt_tokens: int) -> dict:
+    completion_tokens = count_tokens(content)
+    return {
+        "id": f"chatcmpl-mock-{_digest(content):08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def stream_chunks(content: str, model: str, prompt_tokens: int, include_usage: bool) -> Iterator[dict]:
+    """The 'chat.completion.chunk' objects of a streamed answer, ending with a usage chunk if requested."""
+    base = {"id": f"chatcmpl-mock-{_digest(content):08x}", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+    yield {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+    for start in range(0, len(content), STREAM_CHUNK_CHARS):
+        yield {**base, "choices": [{"index": 0, "delta": {"content": content[start:start + STREAM_CHUNK_CHARS]}, "finish_reason": None}]}
+    yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    if include_usage:
+        completion_tokens = count_tokens(content)
+        yield {**base, "choices": [], "usage": {
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens
+        }}
+
+
+def create_app(behaviour: MockBehaviour):
+    """The aiohttp application serving POST /v1/chat/completions."""
+    from aiohttp import web
+
+    rng = random.Random(behaviour.seed)
+    stats = {"requests": 0, "errors": 0}
+
+    async def chat_completions(request):
+        stats["requests"] += 1
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "mock")
+        await asyncio.sleep(behaviour.latency + rng.uniform(0, behaviour.jitter))
+        if rng.random() < behaviour.error_rate:
+            stats["errors"] += 1
+            headers = {"Retry-After": str(behaviour.retry_after)} if behaviour.error_status == 429 else {}
+            return web.json_response(
+                {"error": {"message": "Injected error", "type": "mock_error", "code": behaviour.error_status}},
+                status=behaviour.error_status,
+                headers=headers,
+            )
+
+        content = mock_completion(messages)
+        prompt_tokens = count_tokens("".join(str(m.get("content", "")) for m in messages))
+        if not body.get("stream"):
+            await asyncio.sleep(count_tokens(content) / behaviour.tokens_per_second if behaviour.tokens_per_second else 0)
+            return web.json_response(completion_body(content, model, prompt_tokens))
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        for chunk in stream_chunks(content, model, prompt_tokens, include_usage):
+            if behaviour.tokens_per_second:
+                await asyncio.sleep(1 / behaviour.tokens_per_second)
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/stats", get_stats)
+    return app
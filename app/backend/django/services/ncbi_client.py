@@ -0,0 +1,152 @@
+"""
+Async client for the NCBI E-utilities (esearch/efetch) and the NIH iCite API.
+
+All calls go through pooled keep-alive connections, so concurrent searches served by one
+ASGI worker share a handful of upstream connections instead of blocking the event loop.
+"""
+import asyncio
+import os
+import weakref
+from typing import AsyncIterator, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+load_dotenv()
+
+ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+ICITE_URL = "https://icite.od.nih.gov/api/pubs"
+
+# Per-call timeouts (seconds); efetch returns full article XML and gets the longest budget
+ESEARCH_TIMEOUT = float(os.getenv("NCBI_ESEARCH_TIMEOUT", "10"))
+EFETCH_TIMEOUT = float(os.getenv("NCBI_EFETCH_TIMEOUT", "30"))
+ICITE_TIMEOUT = float(os.getenv("ICITE_TIMEOUT", "10"))
+CONNECT_TIMEOUT = float(os.getenv("NCBI_CONNECT_TIMEOUT", "5"))
+
+# Connection pool shared by all requests handled on the same event loop
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("NCBI_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("NCBI_MAX_KEEPALIVE_CONNECTIONS", "10")),
+    keepalive_expiry=30.0,
+)
+
+EMPTY_ARTICLE_SET = b"<PubmedArticleSet></PubmedArticleSet>"
+
+
+class PubMedClient:
+    """
+    Non-blocking access to esearch, efetch and iCite.
+
+    httpx clients are bound to the event loop they were created on, so one pooled client is kept per
+    running loop (there is exactly one under ASGI, sync views share the one of 'services.background_loop').
+    Clients of short-lived loops, such as those of async views under WSGI, are closed when their loop ends.
+    """
+
+    def __init__(self, api_key: Optional[str]):
+        self.api_key = api_key
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+        self._closers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = weakref.WeakKeyDictionary()
+
+    def _client(self, name: str, verify: bool = True) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        clients = self._clients.get(loop)
+        if clients is None:
+            clients = self._clients[loop] = {}
+            self._closers[loop] = loop.create_task(self._close_when_loop_ends(loop))
+        client = clients.get(name)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=POOL_LIMITS,
+                timeout=httpx.Timeout(EFETCH_TIMEOUT, connect=CONNECT_TIMEOUT),
+                verify=verify,
+            )
+            clients[name] = client
+        return client
+
+    def _timeout(self, seconds: float) -> httpx.Timeout:
+        return httpx.Timeout(seconds, connect=CONNECT_TIMEOUT)
+
+    async def esearch(self, term: str, retmax: int, sort: str = "relevance", timeout: float = ESEARCH_TIMEOUT) -> List[str]:
+        """Return the PMIDs matching 'term', as ordered by PubMed."""
+        params = {
+            "db": "pubmed",
+            "term": term,
+            "retmax": retmax,
+            "sort": sort,
+            "retmode": "json",
+            "api_key": self.api_key,
+            "field": "citation_count"
+        }
+        response = await self._client("ncbi").get(ESEARCH_URL, params=params, timeout=self._timeout(timeout))
+        response.raise_for_status()
+        return response.json().get("esearchresult", {}).get("idlist", [])
+
+    async def efetch(self, pmids: List[str], timeout: float = EFETCH_TIMEOUT) -> bytes:
+        """Return the raw PubmedArticleSet XML for 'pmids'."""
+        if not pmids:
+            return EMPTY_ARTICLE_SET
+        params = {
+            "db": "pubmed",
+            "id": ",".join(pmids),
+            "retmode": "xml",
+            "api_key": self.api_key
+        }
+        response = await self._client("ncbi").get(EFETCH_URL, params=params, timeout=self._timeout(timeout))
+        response.raise_for_status()
+        return response.content
+
+    async def efetch_stream(self, pmids: List[str], timeout: float = EFETCH_TIMEOUT) -> AsyncIterator[bytes]:
+        """Yield the PubmedArticleSet XML for 'pmids' in chunks, as they arrive."""
+        if not pmids:
+            yield EMPTY_ARTICLE_SET
+            return
+        params = {
+            "db": "pubmed",
+            "id": ",".join(pmids),
+            "retmode": "xml",
+            "api_key": self.api_key
+        }
+        async with self._client("ncbi").stream("GET", EFETCH_URL, params=params, timeout=self._timeout(timeout)) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                yield chunk
+
+    async def fetch_icite(self, pmids: List[str], timeout: float = ICITE_TIMEOUT) -> Optional[dict]:
+        """Return the iCite record set for 'pmids', or None if iCite is unavailable."""
+        if not pmids:
+            return None
+        try:
+            # iCite's certificate chain fails verification on some hosts, hence verify=False
+            response = await self._client("icite", verify=False).get(
+                ICITE_URL, params={"pmids": ",".join(pmids)}, timeout=self._timeout(timeout)
+            )
+        except httpx.HTTPError as e:
+            print(f"Error fetching citation data: {str(e)}")
+            return None
+        if response.status_code == 200:
+            return response.json()
+        print(f"Error fetching citation data: {response.status_code}")
+        return None
+
+    async def _close_when_loop_ends(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Waits until cancelled, then closes the clients of 'loop'. 'asyncio.run' (and so 'async_to_sync')
+        cancels the tasks still pending when its coroutine returns.
+        """
+        try:
+            await loop.create_future()
+        finally:
+            self._closers.pop(loop, None)
+            for client in self._clients.pop(loop, {}).values():
+                await client.aclose()
+
+    async def aclose(self) -> None:
+        """Close the pooled connections of the current event loop."""
+        closer = self._closers.get(asyncio.get_running_loop())
+        if closer is not None:
+            closer.cancel()
+            await asyncio.gather(closer, return_exceptions=True)
+
+
+# A singleton shared by all controllers
+default_pubmed_client = PubMedClient(api_key=os.getenv("PUBMED_API_KEY"))
@@ -0,0 +1,292 @@
+"""
+Shared client for the OpenAI chat completions API.
+
+One pooled AsyncOpenAI client (keep-alive connections) is kept per running event loop and closed when the loop
+ends; calls on that loop are bounded by a semaphore. Requests and tokens per minute are paced process-wide by
+token buckets, so bursts queue locally instead of running into the account's rate limits. Rate-limited (429), failed (5xx) and
+connection-level calls are retried with jittered exponential backoff.
+"""
+import asyncio
+import functools
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-5-chat-latest")
+# Concurrent completions per event loop (there is exactly one loop under ASGI)
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "20"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+
+# Rough size of a token, used to estimate prompt tokens before a call (and to count them without tiktoken)
+CHARS_PER_TOKEN = 4
+
+
+class TokenBucket:
+    """
+    Paces consumption to 'per_minute' units, allowing bursts of up to one minute's worth. Shared by all event
+    loops of the process; waiting happens with 'asyncio.sleep', never blocking a loop.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.clock = clock
+        self._tokens = per_minute
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount: float) -> float:
+        """Takes 'amount' if available and returns 0, otherwise returns the seconds to wait before trying again."""
+        # A single acquisition larger than the bucket is let through once the bucket is full
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def refund(self, amount: float) -> None:
+        """Returns units that were acquired but not used (e.g. an over-estimate of tokens)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+def estimate_tokens(messages: List[dict], max_tokens: int) -> int:
+    """Upper estimate of the tokens a completion consumes: the prompt plus the full completion budget."""
+    return sum(len(str(message.get("content", ""))) for message in messages) // CHARS_PER_TOKEN + max_tokens
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: str):
+    """The tokenizer of 'model' if the optional 'tiktoken' package and its vocabulary are available."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"Error loading tiktoken encoding for {model}: {str(e)}")
+        return None
+
+
+def count_tokens(text: str, model: str = OPENAI_MODEL) -> int:
+    """The number of tokens of 'text' for 'model'; approximated from its length without 'tiktoken'."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """The delay requested by the server's Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _defaultClientFactory():
+    from openai import AsyncOpenAI
+    # Retries are handled here, with pacing, instead of by the SDK
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL") or None,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=0,
+    )
+
+
+class OpenAIClient:
+    """
+    Chat completions through pooled per-loop clients, with bounded concurrency, pacing and retries.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any] = _defaultClientFactory,
+        max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+        requests_per_minute: float = OPENAI_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = OPENAI_TOKENS_PER_MINUTE,
+        max_retries: int = OPENAI_MAX_RETRIES,
+        retry_base_delay: float = OPENAI_RETRY_BASE_DELAY,
+        retry_max_delay: float = OPENAI_RETRY_MAX_DELAY,
+    ):
+        self.client_factory = client_factory
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+    def _state(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = {"client": self.client_factory(), "semaphore": asyncio.Semaphore(self.max_concurrency)}
+            self._loops[loop] = state
+            state["closer"] = loop.create_task(self._close_when_loop_ends(loop))
+        return state
+
+    async def _close_when_loop_ends(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Waits until cancelled, then closes the client of 'loop'. 'asyncio.run' (and so 'async_to_sync') cancels
+        the tasks still pending when its coroutine returns.
+        """
+        try:
+            await loop.create_future()
+        finally:
+            state = self._loops.pop(loop, None)
+            if state is not None:
+                await _close(state["client"])
+
+    def backoff(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Full-jitter exponential backoff, at least as long as a server-requested Retry-After."""
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+        requested = retry_after(error) if error is not None else None
+        return max(delay, min(requested, self.retry_max_delay)) if requested is not None else delay
+
+    async def _retry(self, error: Exception, attempt: int, estimate: int) -> None:
+        """Re-raises 'error' unless it is retryable and retries are left; otherwise waits for the next attempt."""
+        self.tokens.refund(estimate)
+        if attempt >= self.max_retries or not is_retryable(error):
+            raise error
+        delay = self.backoff(attempt, error)
+        print(f"OpenAI call failed ({str(error)}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    def _settle(self, estimate: int, usage: Any) -> None:
+        total_tokens = getattr(usage, "total_tokens", None)
+        if isinstance(total_tokens, int):
+            self.tokens.refund(max(0, estimate - total_tokens))
+
+    async def complete(
+        self,
+        messages: List[dict],
+        model: str = OPENAI_MODEL,
+        temperature: float = 0.5,
+        max_tokens: int = 900,
+    ) -> str:
+        """Returns the content of one chat completion."""
+        state = self._state()
+        estimate = estimate_tokens(messages, max_tokens)
+        attempt = 0
+        async with state["semaphore"]:
+            while True:
+                await self.requests.acquire()
+                await self.tokens.acquire(estimate)
+                try:
+                    response = await state["client"].chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                    )
+                except Exception as e:
+                    await self._retry(e, attempt, estimate)
+                    attempt += 1
+                    continue
+                self._settle(estimate, getattr(response, "usage", None))
+                return response.choices[0].message.content
+
+    async def stream(
+        self,
+        messages: List[dict],
+        model: str = OPENAI_MODEL,
+        temperature: float = 0.5,
+        max_tokens: int = 900,
+    ) -> AsyncIterator[str]:
+        """
+        Yields the content deltas of one chat completion as they are generated. Failures before the first delta
+        are retried like in 'complete'; later ones are raised, since part of the answer was already delivered.
+        """
+        state = self._state()
+        estimate = estimate_tokens(messages, max_tokens)
+        attempt = 0
+        async with state["semaphore"]:
+            while True:
+                await self.requests.acquire()
+                await self.tokens.acquire(estimate)
+                response = None
+                try:
+                    response = await state["client"].chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
+                    chunks = response.__aiter__()
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    return
+                except Exception as e:
+                    await _close(response)
+                    await self._retry(e, attempt, estimate)
+                    attempt += 1
+                    continue
+                break
+
+            usage = None
+            try:
+                while True:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    usage = getattr(chunk, "usage", None) or usage
+                    try:
+                        chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        break
+            finally:
+                await _close(response)
+            self._settle(estimate, usage)
+
+
+async def _close(response: Any) -> None:
+    close = getattr(response, "close", None)
+    if close is not None:
+        await close()
+
+
+default_openai_client = OpenAIClient()
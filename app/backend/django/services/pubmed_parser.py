@@ -0,0 +1,149 @@
+"""
+Incremental parser for efetch PubmedArticleSet XML, shared by all controllers.
+
+Articles are parsed from start/end events in a single pass and each PubmedArticle element is cleared as soon as
+its record has been built, so memory use stays constant regardless of payload size, and records are available
+while the rest of the response is still downloading.
+"""
+from io import BytesIO
+from typing import AsyncIterable, Iterator, List, Optional, Tuple, Union
+from xml.etree import ElementTree
+
+
+class PubmedArticleRecord:
+    """
+    The fields of a PubmedArticle used by the application.
+    'sections' holds (label, text) pairs of the abstract, with an empty label for unstructured abstracts.
+    """
+    __slots__ = ("pmid", "title", "sections", "year", "medlineDate", "xml")
+
+    def __init__(
+        self,
+        pmid: Optional[str],
+        title: Optional[str],
+        sections: List[Tuple[str, str]],
+        year: Optional[str],
+        medlineDate: Optional[str],
+        xml: Optional[bytes] = None,
+    ):
+        self.pmid = pmid
+        self.title = title
+        self.sections = sections
+        self.year = year
+        self.medlineDate = medlineDate
+        self.xml = xml
+
+    @property
+    def completeAbstract(self) -> str:
+        """The abstract sections joined, each prefixed with its label (e.g. 'RESULTS: ...') if it has one."""
+        return ' '.join(f"{label}: {text}" if label else text for label, text in self.sections)
+
+    @property
+    def firstAbstractText(self) -> Optional[str]:
+        """The text of the first abstract section, or None if the article has no abstract."""
+        return self.sections[0][1] if self.sections else None
+
+    def __repr__(self) -> str:
+        return f"PubmedArticleRecord(pmid={self.pmid!r}, title={self.title!r})"
+
+
+class PubmedArticleParser:
+    """
+    Push parser: 'feed' bytes as they arrive and receive every article completed by them.
+    """
+
+    def __init__(self, keep_xml: bool = False):
+        self.keep_xml = keep_xml
+        self._parser = ElementTree.XMLPullParser(events=("start", "end"))
+        self._stack: List[str] = []
+        self._root: Optional[ElementTree.Element] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pmid = None
+        self._title = None
+        self._sections: List[Tuple[str, str]] = []
+        self._year = None
+        self._medlineDate = None
+
+    def feed(self, data: bytes) -> List[PubmedArticleRecord]:
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[PubmedArticleRecord]:
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> List[PubmedArticleRecord]:
+        records = []
+        for event, element in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = element
+                self._stack.append(element.tag)
+                continue
+
+            self._stack.pop()
+            tag = element.tag
+            parent = self._stack[-1] if self._stack else None
+            if tag == "PMID" and self._pmid is None:
+                self._pmid = element.text
+            elif tag == "ArticleTitle" and self._title is None:
+                self._title = "".join(element.itertext())
+            elif tag == "AbstractText" and parent == "Abstract":
+                self._sections.append((element.get('Label', ''), "".join(element.itertext())))
+            elif tag == "Year" and parent == "PubDate" and self._year is None:
+                self._year = element.text
+            elif tag == "MedlineDate" and parent == "PubDate" and self._medlineDate is None:
+                self._medlineDate = element.text
+            elif tag == "PubmedArticle":
+                records.append(PubmedArticleRecord(
+                    pmid=self._pmid,
+                    title=self._title,
+                    sections=self._sections,
+                    year=self._year,
+                    medlineDate=self._medlineDate,
+                    xml=ElementTree.tostring(element) if self.keep_xml else None,
+                ))
+                self._reset()
+                # Drop the finished article (and any already-finished siblings) from the tree
+                element.clear()
+                if self._root is not None and self._root is not element:
+                    self._root.clear()
+        return records
+
+
+def iterparse_articles(source: Union[bytes, str, BytesIO], keep_xml: bool = False) -> Iterator[PubmedArticleRecord]:
+    """
+    Yields the records of a complete efetch response, given as bytes, a path or a binary file object.
+    """
+    if isinstance(source, str):
+        # Files opened here are closed here, also when the caller stops iterating early
+        with open(source, "rb") as f:
+            yield from iterparse_articles(f, keep_xml=keep_xml)
+        return
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    parser = PubmedArticleParser(keep_xml=keep_xml)
+    while True:
+        chunk = source.read(64 * 1024)
+        if not chunk:
+            break
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def parse_articles(content: bytes, keep_xml: bool = False) -> List[PubmedArticleRecord]:
+    return list(iterparse_articles(content, keep_xml=keep_xml))
+
+
+async def aiterparse_articles(chunks: AsyncIterable[bytes], keep_xml: bool = False):
+    """
+    Yields records from an asynchronous byte stream (e.g. a streamed efetch response) as they complete.
+    """
+    parser = PubmedArticleParser(keep_xml=keep_xml)
+    async for chunk in chunks:
+        for record in parser.feed(chunk):
+            yield record
+    for record in parser.close():
+        yield record
@@ -0,0 +1,92 @@
+"""
+Cross-user cache of computed results with stale-while-revalidate.
+
+Entries are fresh for 'ttl' seconds. After that, and for up to 'stale_ttl' more seconds, they are still served
+immediately while one background refresh recomputes them. Misses are computed in the request, coalesced with
+identical concurrent misses. Storage is a Django cache alias, so entries are shared by all worker processes
+using the same backend.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from django.core.cache import caches
+
+from services.background_loop import background_loop
+from services.singleflight import SingleFlight
+
+# How long a refresh claims a key before another process may start one
+REFRESH_CLAIM_SECONDS = 120
+
+
+class StaleWhileRevalidateCache:
+    """
+    Serves results from the cache alias 'alias', computing or refreshing them as described above.
+    Cache backend errors are logged and treated as misses, so a broken cache never fails a request.
+    """
+
+    def __init__(self, alias: str, ttl: float, stale_ttl: float, flight: Optional[SingleFlight] = None, enabled: bool = True):
+        self.alias = alias
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.flight = flight or SingleFlight()
+        self.enabled = enabled
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await self.flight.do(key, compute)
+
+        entry = self._get(key)
+        if entry is not None:
+            age = time.time() - entry["stored_at"]
+            if age > self.ttl:
+                self._revalidate(key, compute)
+            return entry["value"]
+        return await self.flight.do(key, lambda: self._compute_and_store(key, compute))
+
+    async def _compute_and_store(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = await compute()
+        # Empty results are usually transient (e.g. an upstream hiccup) and are not kept
+        if value:
+            self._set(key, value)
+        return value
+
+    def _revalidate(self, key: str, compute: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            # Only one refresh per key at a time, across processes sharing the backend
+            claimed = self.cache.add(f"{key}:refreshing", True, timeout=REFRESH_CLAIM_SECONDS)
+        except Exception as e:
+            print(f"Error claiming refresh of cached results: {str(e)}")
+            return
+        if claimed:
+            # Refreshes outlive the request that triggered them; the shared background loop's pooled clients
+            # (NCBI, OpenAI) are reused across refreshes and sync views
+            asyncio.run_coroutine_threadsafe(self._refresh(key, compute), background_loop())
+
+    async def _refresh(self, key: str, compute: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await self.flight.do(key, lambda: self._compute_and_store(key, compute))
+        except Exception as e:
+            print(f"Error refreshing cached results: {str(e)}")
+        finally:
+            try:
+                self.cache.delete(f"{key}:refreshing")
+            except Exception as e:
+                print(f"Error releasing refresh of cached results: {str(e)}")
+
+    def _get(self, key: str) -> Optional[dict]:
+        try:
+            return self.cache.get(key)
+        except Exception as e:
+            print(f"Error reading cached results: {str(e)}")
+            return None
+
+    def _set(self, key: str, value: Any) -> None:
+        try:
+            self.cache.set(key, {"value": value, "stored_at": time.time()}, timeout=self.ttl + self.stale_ttl)
+        except Exception as e:
+            print(f"Error storing cached results: {str(e)}")
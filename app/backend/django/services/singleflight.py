@@ -0,0 +1,76 @@
+"""
+In-flight deduplication of identical concurrent computations.
+
+The first caller of a key runs the computation; callers arriving while it runs await the same result instead
+of starting their own. Results are shared between callers as-is, so they must not be mutated.
+The shared futures are thread-safe, so callers on different event loops (e.g. several 'async_to_sync' views)
+are coalesced as well. Deduplication is per worker process.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """The caller running a computation was cancelled; waiting callers retry it themselves."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            with self._lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = concurrent.futures.Future()
+                    # A running future cannot be cancelled by a waiting caller that goes away
+                    future.set_running_or_notify_cancel()
+                    self._inflight[key] = future
+
+            if leader:
+                return await self._lead(key, future, compute)
+            try:
+                return await asyncio.wrap_future(future)
+            except _LeaderCancelled:
+                continue
+
+    async def _lead(self, key: str, future: concurrent.futures.Future, compute: Callable[[], Awaitable[T]]) -> T:
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+
+def request_key(*parts: Any) -> str:
+    """
+    A stable digest of JSON-serializable request parts (dict keys are sorted, so their order does not matter).
+    """
+    encoded = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
@@ -0,0 +1,152 @@
+"""
+Per-stage timing of request pipelines.
+
+Code wraps each stage in 'with stage("name"):'. Durations are collected for the current request (and returned
+to the client as a Server-Timing header by ServerTimingMiddleware) and aggregated into per-process latency
+histograms, served in the Prometheus text format by the /metrics view.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+# Upper bounds (seconds) of the histogram buckets; covers sub-millisecond lookups up to slow LLM completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The stages of the request being handled. The list is shared (not copied) with child contexts, so stages
+# timed inside 'async_to_sync', tasks and executor threads are still recorded for the request.
+_request_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_stages", default=None)
+
+
+class Histogram:
+    """
+    A thread-safe Prometheus histogram with one label.
+    """
+
+    def __init__(self, name: str, documentation: str, label: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label value -> per-bucket counts (non-cumulative, the last one is +Inf), sum, count
+        self._series: Dict[str, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, label_value: str, seconds: float) -> None:
+        with self._lock:
+            counts, totals = self._series.setdefault(label_value, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+            counts[bisect_left(self.buckets, seconds)] += 1
+            totals[0] += seconds
+            totals[1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {value: (list(counts), list(totals)) for value, (counts, totals) in self._series.items()}
+        for value in sorted(series):
+            counts, (total, count) = series[value]
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_duration_seconds = Histogram(
+    "seba_stage_duration_seconds", "Duration of individual pipeline stages.", label="stage"
+)
+request_duration_seconds = Histogram(
+    "seba_request_duration_seconds", "Duration of HTTP requests until the response is returned.", label="view"
+)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    stage_duration_seconds.observe(name, seconds)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times the enclosed block as stage 'name'. Works in sync and async code alike.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def server_timing_header(stages: Sequence[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """
+    Formats stages as a Server-Timing header value (durations in milliseconds).
+    Repeated stages (e.g. concurrent efetch batches) are listed individually.
+    """
+    entries = [f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)};dur={seconds * 1000:.1f}" for name, seconds in stages]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Collects the stages timed while handling a request, adds them as a Server-Timing header and records the
+    request duration per view. For streaming responses only the stages completed before the response was
+    returned are included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stages, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stages.reset(token)
+        return self._finish(request, response, stages, start)
+
+    async def __acall__(self, request):
+        stages, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stages.reset(token)
+        return self._finish(request, response, stages, start)
+
+    def _start(self):
+        stages: List[Tuple[str, float]] = []
+        return stages, _request_stages.set(stages), time.perf_counter()
+
+    def _finish(self, request, response, stages, start):
+        total = time.perf_counter() - start
+        match = getattr(request, "resolver_match", None)
+        request_duration_seconds.observe(match.view_name if match else "unresolved", total)
+        response["Server-Timing"] = server_timing_header(stages, total)
+        return response
+
+
+def render_metrics() -> str:
+    lines = stage_duration_seconds.render() + request_duration_seconds.render()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,105 @@
+from django.test import SimpleTestCase
+from unittest.mock import MagicMock
+from asgiref.sync import async_to_sync
+import asyncio
+import tempfile
+import os
+import httpx
+
+from services.article_store import ArticleStore, fetch_articles, efetch_articles
+
+EFETCH_XML = b"""<?xml version="1.0"?>
+<PubmedArticleSet>
+  <PubmedArticle><MedlineCitation><PMID>11</PMID><Article>
+    <ArticleTitle>Structured</ArticleTitle>
+    <Abstract>
+      <AbstractText Label="BACKGROUND">Why.</AbstractText>
+      <AbstractText Label="RESULTS">What.</AbstractText>
+    </Abstract>
+  </Article></MedlineCitation><PubDate><Year>2020</Year></PubDate></PubmedArticle>
+  <PubmedArticle><MedlineCitation><PMID>12</PMID><Article>
+    <ArticleTitle>Plain</ArticleTitle>
+    <Abstract><AbstractText>Just text.</AbstractText></Abstract>
+  </Article></MedlineCitation><PubDate><MedlineDate>1998 Spring</MedlineDate></PubDate></PubmedArticle>
+</PubmedArticleSet>"""
+
+
+async def stream_of(content, chunk_size=64):
+    for start in range(0, len(content), chunk_size):
+        yield content[start:start + chunk_size]
+
+
+class ArticleStoreTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "articles.sqlite3")
+        self.store = ArticleStore(self.path, ttl_seconds=3600)
+        self.client = MagicMock()
+        self.client.efetch_stream = MagicMock(side_effect=lambda pmids: stream_of(EFETCH_XML))
+
+    def test_parses_streamed_records(self):
+        structured, plain = async_to_sync(efetch_articles)(["11", "12"], client=self.client, store=self.store)
+        self.assertEqual(structured.completeAbstract, "BACKGROUND: Why. RESULTS: What.")
+        self.assertEqual(structured.year, "2020")
+        self.assertEqual(plain.medlineDate, "1998 Spring")
+        self.assertIn(b"<PMID>12</PMID>", plain.xml)
+
+    def test_only_missing_pmids_are_fetched(self):
+        async_to_sync(fetch_articles)(["11", "12"], client=self.client, store=self.store)
+        self.client.efetch_stream.reset_mock()
+
+        records = async_to_sync(fetch_articles)(["12", "11", "13"], client=self.client, store=self.store)
+
+        self.client.efetch_stream.assert_called_once_with(["13"])
+        self.assertEqual([record.pmid for record in records], ["12", "11"])
+        self.assertEqual(records[1].sections, [("BACKGROUND", "Why."), ("RESULTS", "What.")])
+        self.assertIn(b"<PMID>11</PMID>", self.store.get_xml("11"))
+
+    def test_stale_records_are_refreshed_or_served_on_failure(self):
+        async_to_sync(fetch_articles)(["11"], client=self.client, store=self.store)
+        expired = ArticleStore(self.path, ttl_seconds=-1)
+
+        fresh, stale = expired.get_many(["11"])
+        self.assertEqual((list(fresh), list(stale)), ([], ["11"]))
+
+        self.client.efetch_stream = MagicMock(side_effect=httpx.ConnectError("offline"))
+        records = async_to_sync(fetch_articles)(["11"], client=self.client, store=expired)
+        self.assertEqual(records[0].title, "Structured")
+
+    def test_store_calls_do_not_run_on_the_event_loop(self):
+        on_loop = []
+
+        def recorded(method):
+            def call(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(method.__name__)
+                except RuntimeError:
+                    pass
+                return method(*args, **kwargs)
+            return call
+
+        self.store.get_many = recorded(self.store.get_many)
+        self.store.put_many = recorded(self.store.put_many)
+        async_to_sync(fetch_articles)(["11"], client=self.client, store=self.store)
+        self.assertEqual(on_loop, [])
+
+    def test_prune_drops_expired_records_and_orphaned_xml(self):
+        async_to_sync(fetch_articles)(["11", "12"], client=self.client, store=self.store)
+        self.assertEqual(self.store.prune(), (0, 0))
+
+        expired = ArticleStore(self.path, ttl_seconds=-1, retention_seconds=-1)
+        self.assertEqual(expired.prune(), (2, 2))
+        self.assertEqual(expired.get_many(["11", "12"]), ({}, {}))
+        self.assertIsNone(expired.get_xml("11"))
+
+    def test_writes_prune_at_most_once_per_interval(self):
+        records = async_to_sync(efetch_articles)(["11"], client=self.client, store=self.store)
+        store = ArticleStore(self.path, ttl_seconds=3600, retention_seconds=-1, maintenance_interval=0)
+        store.put_many(records)
+        self.assertIsNone(store.get_xml("11"))
+
+        store.maintenance_interval = 3600
+        store.put_many(records)
+        self.assertIsNotNone(store.get_xml("11"))
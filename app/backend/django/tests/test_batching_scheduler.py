@@ -0,0 +1,112 @@
+from django.test import SimpleTestCase
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import numpy as np
+
+from models.BatchingScheduler import MicroBatcher, withEmbeddingBatching, withEntailmentBatching
+
+
+class FakeEncoder:
+    identifier = "fake"
+
+    def __init__(self):
+        self.batches = []
+
+    def _encode(self, texts, batch_size):
+        self.batches.append(list(texts))
+        return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+
+    def embedText(self, text, asTensor=False):
+        raise AssertionError("must be routed through the batcher")
+
+
+class FakeEntailmentModel:
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, pairs, batch_size=16):
+        self.batches.append(list(pairs))
+        return [a + b for a, b in pairs]
+
+    def predict(self, sentence_a, sentence_b):
+        raise AssertionError("must be routed through the batcher")
+
+
+class MicroBatcherTest(SimpleTestCase):
+    def test_concurrent_submissions_share_one_batch(self):
+        batches = []
+
+        def run_batch(items):
+            batches.append(list(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher("test", run_batch, max_batch_size=64, max_latency=0.2)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(batcher.submit, [i, i + 100]) for i in range(8)]
+            results = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual(results, [[2 * i, 2 * (i + 100)] for i in range(8)])
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(len(batches[0]), 16)
+
+    def test_full_batch_is_dispatched_without_waiting(self):
+        batches = []
+        batcher = MicroBatcher("test", lambda items: batches.append(list(items)) or items, max_batch_size=4, max_latency=10)
+
+        start = time.monotonic()
+        self.assertEqual(batcher.submit(list(range(8))), list(range(8)))
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(batches, [[0, 1, 2, 3], [4, 5, 6, 7]])
+
+    def test_latency_counts_from_submission(self):
+        release = threading.Event()
+
+        def run_batch(items):
+            if items == ["a", "b"]:
+                release.wait(5)
+            return items
+
+        batcher = MicroBatcher("test", run_batch, max_batch_size=2, max_latency=1.0)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            pool.submit(batcher.submit, ["a", "b"])
+            late = pool.submit(batcher.submit, ["c"])
+            # 'c' waits out its whole latency budget while the first batch is still running
+            time.sleep(1.1)
+            release.set()
+            start = time.monotonic()
+            self.assertEqual(late.result(timeout=5), ["c"])
+            self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_errors_reach_every_caller_of_the_batch(self):
+        def run_batch(items):
+            raise ValueError("model failed")
+
+        batcher = MicroBatcher("test", run_batch, max_batch_size=8, max_latency=0.01)
+        with self.assertRaises(ValueError):
+            batcher.submit(["a"])
+        self.assertEqual(batcher.submit([]), [])
+
+    def test_missing_outputs_fail_instead_of_hanging(self):
+        batcher = MicroBatcher("test", lambda items: items[:1], max_batch_size=8, max_latency=0.01)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            with self.assertRaises(RuntimeError):
+                pool.submit(batcher.submit, ["a", "b"]).result(timeout=2)
+
+
+class ModelBatchingTest(SimpleTestCase):
+    def test_embedding_calls_are_batched(self):
+        model = withEmbeddingBatching(FakeEncoder(), max_batch_size=32, max_latency=0.01)
+
+        self.assertEqual(model.embedText("abc"), [3.0, 0.0])
+        self.assertEqual(model._encode(["a", "bb"], 8).tolist(), [[1.0, 0.0], [2.0, 1.0]])
+        self.assertEqual(model._encode([], 8).shape, (0,))
+        self.assertEqual(model.batches, [["abc"], ["a", "bb"], []])
+
+    def test_entailment_calls_are_batched(self):
+        model = withEntailmentBatching(FakeEntailmentModel(), max_batch_size=16, max_latency=0.01)
+
+        self.assertEqual(model.predict("a", "b"), "ab")
+        self.assertEqual(model.predict_batch([("c", "d"), ("e", "f")]), ["cd", "ef"])
+        self.assertEqual(model.batches, [[("a", "b")], [("c", "d"), ("e", "f")]])
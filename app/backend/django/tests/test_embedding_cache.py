@@ -0,0 +1,94 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch, MagicMock
+import tempfile
+import numpy as np
+
+from models.EmbeddingCache import EmbeddingCache
+from models.EmbeddingModels import AbstractEmbeddingModel
+
+
+class FakeEmbeddingModel(AbstractEmbeddingModel):
+    def __init__(self):
+        self.identifier = "fake-model"
+        self.model = MagicMock()
+        self.model.get_sentence_embedding_dimension.return_value = 3
+        self.model.encode.side_effect = lambda texts, **kwargs: np.array(
+            [[len(text), 1.0, 0.0] for text in texts], dtype=np.float32
+        )
+
+
+class EmbeddingCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_roundtrip_and_miss(self):
+        cache = EmbeddingCache(self.directory, "some/model", dimension=3, capacity=10, dtype="float32")
+        cache.put_many([("1", "abstract one")], np.array([[1.0, 2.0, 3.0]]))
+
+        hit, miss, changed = cache.get_many([("1", "abstract one"), ("2", "abstract two"), ("1", "edited abstract")])
+
+        np.testing.assert_array_equal(hit, [1.0, 2.0, 3.0])
+        self.assertIsNone(miss)
+        self.assertIsNone(changed)
+
+    def test_evicts_least_recently_used(self):
+        cache = EmbeddingCache(self.directory, "some/model", dimension=3, capacity=2, dtype="float16")
+        cache.put_many([("1", "a")], np.ones((1, 3)))
+        cache.put_many([("2", "b")], np.ones((1, 3)) * 2)
+        cache.put_many([("3", "c")], np.ones((1, 3)) * 3)
+
+        first, second, third = cache.get_many([("1", "a"), ("2", "b"), ("3", "c")])
+
+        self.assertIsNone(first)
+        np.testing.assert_array_equal(second, [2.0, 2.0, 2.0])
+        np.testing.assert_array_equal(third, [3.0, 3.0, 3.0])
+
+    def test_pending_reservations_are_not_evicted(self):
+        cache = EmbeddingCache(self.directory, "some/model", dimension=3, capacity=2, dtype="float32")
+        cache.put_many([("1", "a")], np.ones((1, 3)))
+        # A writer that has reserved the least recently used slot but not yet marked it ready
+        cache._connection().execute("UPDATE entries SET ready = 0")
+        cache.put_many([("2", "b")], np.ones((1, 3)) * 2)
+        cache.put_many([("3", "c")], np.ones((1, 3)) * 3)
+
+        cache._connection().execute("UPDATE entries SET ready = 1 WHERE pmid = '1'")
+        first, second, third = cache.get_many([("1", "a"), ("2", "b"), ("3", "c")])
+
+        np.testing.assert_array_equal(first, [1.0, 1.0, 1.0])
+        self.assertIsNone(second)
+        np.testing.assert_array_equal(third, [3.0, 3.0, 3.0])
+
+    def test_abandoned_reservations_are_rewritten(self):
+        cache = EmbeddingCache(self.directory, "some/model", dimension=3, capacity=10, dtype="float32")
+        cache.put_many([("1", "a")], np.ones((1, 3)))
+        # A writer that died between reserving its slot and marking it ready
+        cache._connection().execute("UPDATE entries SET ready = 0")
+        self.assertIsNone(cache.get_many([("1", "a")])[0])
+
+        cache.put_many([("1", "a")], np.ones((1, 3)) * 2)
+        self.assertIsNone(cache.get_many([("1", "a")])[0])
+
+        with patch('models.EmbeddingCache.RESERVATION_TIMEOUT_SECONDS', -1):
+            cache.put_many([("1", "a")], np.ones((1, 3)) * 2)
+        np.testing.assert_array_equal(cache.get_many([("1", "a")])[0], [2.0, 2.0, 2.0])
+
+    def test_store_is_shared_between_instances(self):
+        EmbeddingCache(self.directory, "some/model", dimension=3, capacity=10).put_many([("1", "a")], np.ones((1, 3)))
+        reopened = EmbeddingCache(self.directory, "some/model", dimension=3, capacity=10)
+        other_model = EmbeddingCache(self.directory, "other/model", dimension=3, capacity=10)
+
+        self.assertIsNotNone(reopened.get_many([("1", "a")])[0])
+        self.assertIsNone(other_model.get_many([("1", "a")])[0])
+
+    def test_embed_texts_reads_through_cache(self):
+        with patch.dict('os.environ', {"EMBEDDING_CACHE_DIR": self.directory, "EMBEDDING_CACHE_DTYPE": "float32"}):
+            model = FakeEmbeddingModel()
+            first = model.embedTexts(["aa", "bbbb"], pmids=["1", "2"])
+            second = model.embedTexts(["aa", "cccccc"], pmids=["1", "3"])
+
+        np.testing.assert_array_equal(first[:, 0], [2.0, 4.0])
+        np.testing.assert_array_equal(second[:, 0], [2.0, 6.0])
+        encoded = [call.args[0] for call in model.model.encode.call_args_list]
+        self.assertEqual(encoded, [["aa", "bbbb"], ["cccccc"]])
@@ -0,0 +1,59 @@
+from django.test import SimpleTestCase
+from types import SimpleNamespace
+import torch
+
+from models.EntailmentModels import DeBERTaV3
+
+
+class FakeTokenizer:
+    """Encodes a text as its word lengths and pads batches to the longest text."""
+
+    def __call__(self, sentences_a, sentences_b=None, padding=False, truncation=False, return_tensors=None):
+        if isinstance(sentences_a, str):
+            sentences_a, sentences_b = [sentences_a], [sentences_b]
+        rows = [[len(word) for word in f"{a} {b}".split()] for a, b in zip(sentences_a, sentences_b)]
+        width = max(len(row) for row in rows)
+        return {
+            "input_ids": torch.tensor([row + [0] * (width - len(row)) for row in rows], dtype=torch.float32),
+            "attention_mask": torch.tensor([[1] * len(row) + [0] * (width - len(row)) for row in rows]),
+        }
+
+
+class FakeClassifier:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, input_ids, attention_mask):
+        self.batch_sizes.append(input_ids.shape[0])
+        total = (input_ids * attention_mask).sum(dim=1)
+        count = attention_mask.sum(dim=1)
+        return SimpleNamespace(logits=torch.stack([total / 10, count.float(), torch.zeros_like(total)], dim=1))
+
+
+class FakeNLIModel(DeBERTaV3):
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.model = FakeClassifier()
+        self.identifier = "fake-nli"
+
+
+class PredictBatchTest(SimpleTestCase):
+    def test_batched_predictions_match_single_predictions(self):
+        model = FakeNLIModel()
+        pairs = [
+            ("a much longer relevant sentence with many words", "query"),
+            ("short", "query"),
+            ("a medium length sentence", "query"),
+        ]
+
+        batched = model.predict_batch(pairs, batch_size=2)
+        single = [model.predict(sentence_a, sentence_b) for sentence_a, sentence_b in pairs]
+
+        self.assertEqual(model.model.batch_sizes[:2], [2, 1])
+        for expected, actual in zip(single, batched):
+            self.assertAlmostEqual(expected.entailment, actual.entailment, places=5)
+            self.assertAlmostEqual(expected.contradiction, actual.contradiction, places=5)
+            self.assertAlmostEqual(expected.neutral, actual.neutral, places=5)
+
+    def test_empty_batch(self):
+        self.assertEqual(FakeNLIModel().predict_batch([]), [])
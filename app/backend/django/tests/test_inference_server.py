@@ -0,0 +1,134 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+from multiprocessing.connection import Listener
+import numpy as np
+import os
+import stat
+import tempfile
+import threading
+
+from models.InferenceClient import InferenceClient, InferenceServerError, inferenceServerAuthkey
+from models.InferenceServer import InferenceHandler, InferenceServer
+from models.EmbeddingModels import RemoteEmbeddingModel
+from models.EntailmentModels import AbstractEntailmentModel, RemoteEntailmentModel
+from models.EntityLinking import RemoteEntityLinker
+
+
+class FakeEmbeddingModel:
+    identifier = "fake-embedding"
+
+    def embeddingDimension(self):
+        return 2
+
+    def _encode(self, texts, batch_size):
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+class FakeEntailmentModel:
+    identifier = "fake-nli"
+
+    def predict_batch(self, pairs, batch_size=16):
+        return [AbstractEntailmentModel.Prediction(0.1, 0.7, 0.2) for _ in pairs]
+
+
+class FakeLinker:
+    def link(self, text):
+        return [("coffee", ["coffee"]), ("sleepiness", [])]
+
+
+class InferenceServerTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.address = os.path.join(directory.name, "inference.sock")
+        self.listener = Listener(self.address, family="AF_UNIX", authkey=b"secret")
+        self.addCleanup(self.listener.close)
+        self.handler = handler = InferenceHandler(FakeEmbeddingModel(), FakeEntailmentModel(), FakeLinker())
+
+        def accept():
+            while True:
+                try:
+                    connection = self.listener.accept()
+                except OSError:
+                    return
+                threading.Thread(target=handler.serve, args=(connection,), daemon=True).start()
+        threading.Thread(target=accept, daemon=True).start()
+        self.client = InferenceClient(self.address, authkey=b"secret")
+
+    def test_remote_models_match_the_local_interfaces(self):
+        embedding_model = RemoteEmbeddingModel(client=self.client)
+        self.assertEqual(embedding_model.identifier, "fake-embedding")
+        np.testing.assert_array_equal(embedding_model._encode(["abc", "de"], 32), [[3.0, 1.0], [2.0, 1.0]])
+        self.assertEqual(embedding_model.embed("abcd"), [4.0, 1.0])
+        self.assertEqual(embedding_model._encode([], 32).shape, (0, 2))
+
+        entailment_model = RemoteEntailmentModel(client=self.client)
+        prediction = entailment_model.predict("a", "b")
+        self.assertEqual((prediction.contradiction, prediction.entailment, prediction.neutral), (0.1, 0.7, 0.2))
+        self.assertEqual(entailment_model.identifier, "fake-nli")
+
+        self.assertEqual(RemoteEntityLinker(client=self.client).link("coffee sleepiness"), [("coffee", ["coffee"]), ("sleepiness", [])])
+
+    def test_errors_and_lost_connections(self):
+        with self.assertRaises(InferenceServerError):
+            self.client.call("train")
+
+        # A connection dropped by the server is re-established transparently
+        self.client._connection().close()
+        self.assertEqual(self.client.call("entailment_info"), {"identifier": "fake-nli"})
+
+        with self.assertRaises(InferenceServerError):
+            InferenceClient(self.address + ".missing").call("entailment_info")
+
+    def test_key_errors_inside_a_method_are_not_reported_as_unknown_methods(self):
+        def link_entities(text):
+            raise KeyError("C0000000")
+        self.handler.methods["link_entities"] = link_entities
+
+        with self.assertRaisesRegex(InferenceServerError, "KeyError"):
+            self.client.call("link_entities", text="coffee")
+        with self.assertRaisesRegex(InferenceServerError, "Unknown inference method"):
+            self.client.call("train")
+
+    def test_unanswered_calls_time_out(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.handler.methods["slow"] = lambda: release.wait() and "late"
+        client = InferenceClient(self.address, authkey=b"secret", timeout=0.05)
+
+        with self.assertRaisesRegex(InferenceServerError, "did not answer"):
+            client.call("slow")
+        release.set()
+        # The late answer went to the dropped connection, not to the next call
+        self.assertEqual(client.call("entailment_info"), {"identifier": "fake-nli"})
+
+
+@patch.dict('os.environ', {"INFERENCE_SERVER_AUTHKEY": ""})
+class InferenceServerSocketTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.address = os.path.join(self.root, "inference", "inference.sock")
+
+    def test_socket_is_private_and_authenticated_by_a_generated_key(self):
+        listener = InferenceServer(self.address).bind()
+        self.addCleanup(listener.close)
+
+        directory = os.path.dirname(self.address)
+        self.assertEqual(stat.S_IMODE(os.stat(directory).st_mode), 0o750)
+        self.assertEqual(stat.S_IMODE(os.stat(self.address).st_mode), 0o660)
+        authkey = inferenceServerAuthkey(self.address)
+        self.assertEqual(len(authkey), 64)
+        # A restarted server keeps the key the web workers already read
+        listener.close()
+        listener = InferenceServer(self.address).bind()
+        self.addCleanup(listener.close)
+        self.assertEqual(inferenceServerAuthkey(self.address), authkey)
+
+    def test_directories_open_to_other_users_are_refused(self):
+        directory = os.path.dirname(self.address)
+        os.makedirs(directory)
+        os.chmod(directory, 0o755)
+        with self.assertRaises(PermissionError):
+            InferenceServer(self.address).bind()
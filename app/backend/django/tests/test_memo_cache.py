@@ -0,0 +1,30 @@
+from django.test import SimpleTestCase
+from django.core.cache import caches
+
+from services.memo_cache import MemoCache
+
+
+class MemoCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches["mesh_terms"].clear()
+
+    def test_in_process_tier_is_bounded(self):
+        cache = MemoCache(max_entries=2)
+        calls = []
+
+        def compute(key):
+            calls.append(key)
+            return key.upper()
+
+        for key in ["a", "b", "a", "c", "b", "a"]:
+            self.assertEqual(cache.get_or_compute(key, lambda: compute(key)), key.upper())
+
+        # 'b' was evicted by 'c' (least recently used), then 'a' by 'b'
+        self.assertEqual(calls, ["a", "b", "c", "b", "a"])
+
+    def test_shared_tier_serves_other_processes(self):
+        first = MemoCache(max_entries=10, alias="mesh_terms")
+        second = MemoCache(max_entries=10, alias="mesh_terms")
+
+        self.assertEqual(first.get_or_compute("key", lambda: [("aspirin", ["aspirin"])]), [("aspirin", ["aspirin"])])
+        self.assertEqual(second.get_or_compute("key", lambda: self.fail("must not recompute")), [("aspirin", ["aspirin"])])
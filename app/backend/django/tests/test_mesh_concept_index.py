@@ -0,0 +1,67 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+from pathlib import Path
+import tempfile
+
+import numpy as np
+
+from models.EntityLinking import EmbeddingMeshLinker
+from models.MeshConceptIndex import MeshConceptIndex, buildMeshConceptIndex
+
+# Names embed onto fixed axes, so the nearest concepts of a query vector are known
+AXES = {"aspirin": 0, "acetylsalicylic acid": 0, "coffee": 1, "sleep": 2, "insomnia": 3, "sleep initiation and maintenance disorders": 3}
+
+
+class FakeEmbeddingModel:
+    identifier = "fake-model"
+
+    def embeddingDimension(self):
+        return 4
+
+    def embedTexts(self, texts, batch_size=32, pmids=None):
+        vectors = np.zeros((len(texts), 4), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vectors[i, AXES[text]] = 2.0
+        return vectors
+
+    def embedText(self, text):
+        return [0.0, 1.0, 0.9, 0.0]
+
+
+class OtherEmbeddingModel(FakeEmbeddingModel):
+    identifier = "other-model"
+
+
+class MeshConceptIndexTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        concepts = [("Aspirin", ["Acetylsalicylic Acid", "1"]), ("Coffee", []), ("Sleep", []), ("Sleep Initiation and Maintenance Disorders", ["Insomnia"])]
+        with patch('models.MeshConceptIndex.SEARCH_CHUNK_ROWS', 2):
+            self.stats = buildMeshConceptIndex(concepts, FakeEmbeddingModel(), self.directory, batch_size=2)
+
+    def test_nearest_concepts(self):
+        index = MeshConceptIndex(self.directory)
+        self.assertEqual(self.stats, {"model": "fake-model", "concepts": 4, "names": 6})
+        self.assertEqual(index.vectors.dtype, np.float16)
+
+        with patch('models.MeshConceptIndex.SEARCH_CHUNK_ROWS', 2):
+            nearest = index.nearest([1.0, 0.0, 0.0, 0.1], k=3, min_similarity=0.05)
+        # Both names of aspirin score highest, but the concept is returned once
+        self.assertEqual([name for name, _ in nearest], ["aspirin", "sleep initiation and maintenance disorders"])
+        self.assertAlmostEqual(nearest[0][1], 1 / np.sqrt(1.01), places=3)
+
+    @patch('models.EmbeddingModels.default_embeddingModel_instance', FakeEmbeddingModel())
+    def test_linker_reuses_the_query_embedding(self):
+        linker = EmbeddingMeshLinker(self.directory, k=2, min_similarity=0.5)
+        self.assertEqual(linker.identifier, "mesh-index:fake-model:k=2:min_similarity=0.5")
+
+        self.assertEqual(linker.link("coffee and sleep"), [("coffee and sleep", []), ("coffee and sleep", ["coffee", "sleep"])])
+        self.assertEqual(linker.link("aspirin", embedding=[1.0, 0.0, 0.0, 0.0]), [("aspirin", []), ("aspirin", ["aspirin"])])
+        self.assertEqual(linker.link("nothing", embedding=[-1.0, 0.0, 0.0, 0.0]), [])
+
+    @patch('models.EmbeddingModels.default_embeddingModel_instance', new=OtherEmbeddingModel())
+    def test_index_of_another_model_is_rejected(self):
+        with self.assertRaises(ValueError):
+            EmbeddingMeshLinker(self.directory)
@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase
+from pathlib import Path
+import tempfile
+
+from models.EntityLinking import DictionaryMeshLinker
+from models.MeshDictionary import MeshDictionary, buildMeshDictionary
+
+CONCEPTS = [
+    ("Diabetes Mellitus, Type 2", ["Type 2 Diabetes", "T2DM"]),
+    ("Aspirin", ["Acetylsalicylic Acid", "ASA"]),
+    ("Acids", ["Acid"]),
+    ("Sleep", []),
+    ("Sleep Deprivation", ["Lack of Sleep"]),
+    ("Coffee", ["2"]),
+    ("Acquired Immunodeficiency Syndrome", ["AIDS"]),
+    ("Hearing Aids", ["Aids, Hearing"]),
+]
+
+
+class MeshDictionaryTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.stats = buildMeshDictionary(CONCEPTS, self.directory)
+
+    def test_matches_whole_words_preferring_the_longest_name(self):
+        dictionary = MeshDictionary(self.directory)
+        text = "Does acetylsalicylic acid help with type 2 diabetes and lack of sleep?"
+
+        matches = [(text[start:end], [dictionary.conceptName(c) for c in concepts]) for start, end, concepts in dictionary.matches(text)]
+        self.assertEqual(matches, [
+            ("acetylsalicylic acid", ["aspirin"]),
+            ("type 2 diabetes", ["diabetes mellitus, type 2"]),
+            ("lack of sleep", ["sleep deprivation"]),
+        ])
+        self.assertEqual(dictionary.matches("coffees and acidic drinks"), [])
+        # Numeric names are never compiled
+        self.assertEqual(self.stats["names"], 16)
+
+    def test_acronyms_only_match_in_capitals(self):
+        linker = DictionaryMeshLinker(self.directory)
+        self.assertEqual(linker.link("Is ASA safe with AIDS?"), [
+            ("ASA", ["aspirin"]), ("AIDS", ["acquired immunodeficiency syndrome"]),
+        ])
+        self.assertEqual(linker.link("Do sleep aids work?"), [("sleep", ["sleep"])])
+        self.assertEqual(linker.link("Aids, hearing"), [("Aids, hearing", ["hearing aids"])])
+
+    def test_linker_keeps_the_query_spelling(self):
+        linker = DictionaryMeshLinker(self.directory)
+        self.assertEqual(linker.link("Coffee, Sleep"), [("Coffee", ["coffee"]), ("Sleep", ["sleep"])])
+        self.assertEqual(linker.link("nothing medical"), [])
+
+    def test_missing_dictionary(self):
+        with self.assertRaises(FileNotFoundError):
+            MeshDictionary(self.directory / "missing")
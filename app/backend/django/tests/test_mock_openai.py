@@ -0,0 +1,64 @@
+from django.test import SimpleTestCase
+from unittest.mock import AsyncMock, patch
+from asgiref.sync import async_to_sync
+import json
+
+from controller import OpenAIController
+from services.load_test import format_report, percentile, report, sample_documents
+from services.mock_openai import mock_completion, stream_chunks
+
+
+async def answer(messages, **kwargs):
+    return mock_completion(messages)
+
+
+@patch('controller.OpenAIController.completion_cache.get', return_value=None)
+@patch('controller.OpenAIController.default_openai_client')
+class MockCompletionTest(SimpleTestCase):
+    """The mock answers parse like real ones in every OpenAIController pipeline."""
+
+    documents = sample_documents(4)
+
+    def test_agreeableness(self, client, _):
+        client.complete = AsyncMock(side_effect=answer)
+        first = async_to_sync(OpenAIController.assess_agreeableness)("Is coffee healthy?", self.documents)["agreeableness"]
+
+        self.assertEqual(list(first), [doc["pmid"] for doc in self.documents])
+        for scores in first.values():
+            self.assertEqual(scores["agree"] + scores["disagree"], 100)
+        # Deterministic
+        self.assertEqual(async_to_sync(OpenAIController.assess_agreeableness)("Is coffee healthy?", self.documents)["agreeableness"], first)
+
+    def test_summaries(self, client, _):
+        client.complete = AsyncMock(side_effect=answer)
+        summaries = async_to_sync(OpenAIController.summarize_documents)("Is coffee healthy?", self.documents)["documentSummaries"]
+        self.assertEqual(len(summaries), 4)
+
+        summary = async_to_sync(OpenAIController.summarize)("Is coffee healthy?", self.documents)["summary"]
+        parser = OpenAIController.CitationParser()
+        parser.feed(summary)
+        self.assertEqual(parser.citations, [1, 2, 3, 4])
+
+    def test_medical_keywords(self, client, _):
+        messages = [{"role": "system", "content": "You are a medical keyword extractor. Provide exactly 2 results"}, {"role": "user", "content": "Text"}]
+        self.assertEqual(len(json.loads(mock_completion(messages))), 2)
+
+    def test_stream_chunks_spell_the_answer(self, client, _):
+        chunks = list(stream_chunks("Yes ([2]).", "mock", prompt_tokens=10, include_usage=True))
+        text = "".join(chunk["choices"][0]["delta"].get("content") or "" for chunk in chunks if chunk["choices"])
+        self.assertEqual(text, "Yes ([2]).")
+        self.assertEqual(chunks[-1]["usage"]["prompt_tokens"], 10)
+
+
+class LoadTestReportTest(SimpleTestCase):
+    def test_percentiles(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertAlmostEqual(percentile(values, 50), 50.5)
+        self.assertAlmostEqual(percentile(values, 99), 99.01)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_report(self):
+        result = report("analysis", concurrency=4, elapsed=2.0, latencies=[0.1, 0.2, 0.3], first_events=[0.05], errors=1)
+        self.assertEqual((result["requests"], result["errors"], result["throughput"]), (4, 1, 1.5))
+        self.assertAlmostEqual(result["latency"]["p50"], 0.2)
+        self.assertIn("first event", format_report(result))
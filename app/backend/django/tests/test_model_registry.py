@@ -0,0 +1,127 @@
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase, RequestFactory
+from unittest.mock import MagicMock, patch
+import json
+import os
+import threading
+import time
+
+from models.ModelRegistry import LazyModel, ModelRegistry, warmupNamesFromEnvironment
+from controller import ModelController
+
+
+class FakeModel:
+    identifier = "fake"
+
+    def __init__(self):
+        time.sleep(0.02)
+
+    def embed(self, text):
+        return [len(text)]
+
+
+class ModelRegistryTest(SimpleTestCase):
+    def test_model_is_constructed_once_on_first_use(self):
+        constructed = []
+
+        def factory():
+            constructed.append(1)
+            return FakeModel()
+
+        model = LazyModel("embedding", factory)
+        self.assertFalse(model.loaded)
+        self.assertEqual(constructed, [])
+
+        threads = [threading.Thread(target=model.embed, args=("abc",)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(constructed), 1)
+        self.assertEqual(model.embed("abcd"), [4])
+        self.assertEqual(model.identifier, "fake")
+
+        model.unload()
+        self.assertFalse(model.loaded)
+
+    def test_protocol_probes_do_not_load_the_model(self):
+        model = LazyModel("embedding", FakeModel)
+        self.assertFalse(hasattr(model, "__func__"))
+        with patch.object(ModelRegistryTest, "lazy", model, create=True):
+            pass
+        self.assertFalse(model.loaded)
+
+    def test_configured_identifier_is_known_without_loading(self):
+        model = LazyModel("embedding", FakeModel, identifier="configured")
+        self.assertEqual(model.configuredIdentifier, "configured")
+        self.assertFalse(model.loaded)
+        self.assertEqual(LazyModel("embedding", FakeModel).configuredIdentifier, "fake")
+
+    def test_default_embedding_identifier_follows_the_backend(self):
+        from models.EmbeddingModels import DEFAULT_EMBEDDING_MODEL, configuredEmbeddingIdentifier
+        with patch.dict(os.environ, {"EMBEDDING_BACKEND": "onnx-int8"}):
+            self.assertEqual(configuredEmbeddingIdentifier(), DEFAULT_EMBEDDING_MODEL + "+onnx-int8")
+        with patch.dict(os.environ, {"EMBEDDING_BACKEND": ""}):
+            self.assertEqual(configuredEmbeddingIdentifier(), DEFAULT_EMBEDDING_MODEL)
+
+    def test_warmup_loads_requested_models(self):
+        registry = ModelRegistry()
+        registry.register("embedding", FakeModel)
+        registry.register("entailment", FakeModel)
+
+        timings = registry.warmup(["entailment"])
+        self.assertEqual(list(timings), ["entailment"])
+        self.assertEqual(registry.loaded(), {"embedding": False, "entailment": True})
+
+        self.assertEqual(registry.warmup()["entailment"] < timings["entailment"], True)
+        self.assertEqual(registry.loaded(), {"embedding": True, "entailment": True})
+
+    def test_warmup_names_from_environment(self):
+        with patch.dict(os.environ, {"MODEL_WARMUP": ""}):
+            self.assertIsNone(warmupNamesFromEnvironment())
+        with patch.dict(os.environ, {"MODEL_WARMUP": "embedding, entity_linker"}):
+            self.assertEqual(warmupNamesFromEnvironment(), ["embedding", "entity_linker"])
+
+
+class ModelControllerTest(SimpleTestCase):
+    def setUp(self):
+        self.registry = ModelRegistry()
+        self.registry.register("embedding", FakeModel)
+        patcher = patch('controller.ModelController.default_model_registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_warmup_endpoint(self):
+        factory = RequestFactory()
+        status = ModelController.get_model_status(factory.get("/models/status/"))
+        self.assertEqual(json.loads(status.content), {"models": {"embedding": False}})
+
+        response = ModelController.warmup_models(factory.post("/models/warmup/"))
+        self.assertEqual(json.loads(response.content)["models"], {"embedding": True})
+
+        unknown = ModelController.warmup_models(
+            factory.post("/models/warmup/", data={"models": ["nope"]}, content_type="application/json")
+        )
+        self.assertEqual(unknown.status_code, 400)
+
+    def test_warmup_endpoint_validates_the_model_names(self):
+        factory = RequestFactory()
+        for names in ("embedding", [1], {"embedding": True}):
+            response = ModelController.warmup_models(
+                factory.post("/models/warmup/", data={"models": names}, content_type="application/json")
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.registry.loaded(), {"embedding": False})
+
+    def test_warmup_endpoint_is_restricted_to_local_and_staff_requests(self):
+        factory = RequestFactory()
+        remote = factory.post("/models/warmup/", REMOTE_ADDR="203.0.113.7")
+        remote.user = AnonymousUser()
+        self.assertEqual(ModelController.warmup_models(remote).status_code, 403)
+        self.assertEqual(self.registry.loaded(), {"embedding": False})
+
+        staff = factory.post("/models/warmup/", REMOTE_ADDR="203.0.113.7")
+        staff.user = MagicMock(is_staff=True)
+        self.assertEqual(ModelController.warmup_models(staff).status_code, 200)
+        self.assertEqual(self.registry.loaded(), {"embedding": True})
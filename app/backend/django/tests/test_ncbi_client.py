@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase
+from asgiref.sync import async_to_sync
+from contextvars import ContextVar
+
+from services.background_loop import run_sync
+from services.ncbi_client import PubMedClient
+
+request_id: ContextVar[str] = ContextVar("request_id", default="")
+
+
+class PubMedClientLoopTest(SimpleTestCase):
+    def test_clients_are_closed_when_their_loop_ends(self):
+        pubmed = PubMedClient(api_key=None)
+
+        async def client():
+            return pubmed._client("ncbi")
+
+        first, second = async_to_sync(client)(), async_to_sync(client)()
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed)
+        self.assertTrue(second.is_closed)
+        self.assertEqual(len(pubmed._clients), 0)
+
+    def test_sync_callers_share_the_background_loop_client(self):
+        pubmed = PubMedClient(api_key=None)
+
+        async def client():
+            return pubmed._client("ncbi")
+
+        first, second = run_sync(client)(), run_sync(client)()
+        self.assertIs(first, second)
+        self.assertFalse(first.is_closed)
+
+        async def close():
+            await pubmed.aclose()
+
+        run_sync(close)()
+        self.assertTrue(first.is_closed)
+
+    def test_background_loop_sees_the_callers_context(self):
+        async def current():
+            return request_id.get()
+
+        token = request_id.set("abc")
+        try:
+            self.assertEqual(run_sync(current)(), "abc")
+        finally:
+            request_id.reset(token)
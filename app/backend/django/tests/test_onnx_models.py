@@ -0,0 +1,65 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+import os
+
+import numpy as np
+
+from models.EntailmentModels import AbstractEntailmentModel
+from models.OnnxModels import OnnxEmbeddingModel, backend, embeddingParity, entailmentParity, samplePairs
+
+
+class FakeEncoder:
+    def __init__(self, embeddings):
+        self.embeddings = np.array(embeddings, dtype=np.float32)
+
+    def _encode(self, texts, batch_size):
+        return self.embeddings[:len(texts)]
+
+
+class FakeEntailmentModel:
+    def __init__(self, probabilities):
+        self.probabilities = probabilities
+
+    def predict_batch(self, pairs, batch_size=16):
+        return [AbstractEntailmentModel.Prediction(*p) for p in self.probabilities[:len(pairs)]]
+
+
+class OnnxModelsTest(SimpleTestCase):
+    def test_backend_from_environment(self):
+        with patch.dict(os.environ, {"EMBEDDING_BACKEND": "onnx-int8"}):
+            self.assertEqual(backend("EMBEDDING_BACKEND"), "onnx-int8")
+        with patch.dict(os.environ, {"EMBEDDING_BACKEND": ""}):
+            self.assertEqual(backend("EMBEDDING_BACKEND"), "torch")
+        with patch.dict(os.environ, {"EMBEDDING_BACKEND": "tensorrt"}):
+            with self.assertRaises(ValueError):
+                backend("EMBEDDING_BACKEND")
+
+    def test_embedding_parity(self):
+        reference = FakeEncoder([[1, 0], [0, 1]])
+        candidate = FakeEncoder([[1, 0], [0.1, 1]])
+
+        report = embeddingParity(reference, candidate, ["a", "b"])
+        self.assertEqual(report["samples"], 2)
+        self.assertAlmostEqual(report["min_cosine"], 1 / np.sqrt(1.01), places=5)
+        self.assertAlmostEqual(report["max_abs_diff"], 0.1, places=5)
+
+    def test_entailment_parity(self):
+        reference = FakeEntailmentModel([(0.1, 0.8, 0.1), (0.6, 0.2, 0.2)])
+        candidate = FakeEntailmentModel([(0.1, 0.7, 0.2), (0.3, 0.5, 0.2)])
+
+        report = entailmentParity(reference, candidate, samplePairs(["a"]))
+        self.assertEqual(report["samples"], 2)
+        self.assertAlmostEqual(report["max_probability_drift"], 0.3)
+        self.assertEqual(report["label_agreement"], 0.5)
+
+    def test_mean_pooling_ignores_padding(self):
+        model = OnnxEmbeddingModel.__new__(OnnxEmbeddingModel)
+        model.pooling, model.normalize = "mean", False
+        hidden = np.array([[[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]]], dtype=np.float32)
+
+        pooled = model._pool(hidden, np.array([[1, 1, 0]]))
+        self.assertEqual(pooled.tolist(), [[2.0, 3.0]])
+
+        model.normalize = True
+        pooled = model._pool(hidden, np.array([[1, 1, 0]]))
+        self.assertAlmostEqual(float(np.linalg.norm(pooled)), 1.0, places=5)
@@ -0,0 +1,138 @@
+from django.test import SimpleTestCase
+from types import SimpleNamespace
+from asgiref.sync import async_to_sync
+import asyncio
+
+from unittest.mock import patch
+
+from services.openai_client import OpenAIClient, TokenBucket, count_tokens, estimate_tokens
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+def completion(content, total_tokens=10):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(total_tokens=total_tokens),
+    )
+
+
+class FakeCompletions:
+    def __init__(self, outcomes, delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            outcome = self.outcomes.pop(0) if self.outcomes else completion("ok")
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        finally:
+            self.running -= 1
+
+
+def client_for(completions, **options):
+    options.setdefault("retry_base_delay", 0.001)
+    return OpenAIClient(lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)), **options)
+
+
+class TokenBucketTest(SimpleTestCase):
+    def test_paces_to_the_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(per_minute=60, clock=lambda: now[0])
+
+        self.assertEqual(bucket.try_acquire(60), 0.0)
+        self.assertAlmostEqual(bucket.try_acquire(2), 2.0)
+        now[0] = 2.0
+        self.assertEqual(bucket.try_acquire(2), 0.0)
+        # Oversized requests wait for a full bucket instead of forever
+        self.assertAlmostEqual(bucket.try_acquire(1000), 60.0)
+        bucket.refund(30)
+        self.assertAlmostEqual(bucket.try_acquire(1000), 30.0)
+
+
+class OpenAIClientTest(SimpleTestCase):
+    def test_retries_rate_limits_and_server_errors(self):
+        completions = FakeCompletions([StatusError(429, retry_after="0.01"), StatusError(503), completion("summary")])
+        client = client_for(completions)
+
+        self.assertEqual(async_to_sync(client.complete)([{"role": "user", "content": "q"}]), "summary")
+        self.assertEqual(completions.calls, 3)
+
+    def test_client_errors_and_exhausted_retries_are_raised(self):
+        completions = FakeCompletions([StatusError(400)])
+        with self.assertRaises(StatusError):
+            async_to_sync(client_for(completions).complete)([])
+        self.assertEqual(completions.calls, 1)
+
+        completions = FakeCompletions([StatusError(500)] * 3)
+        with self.assertRaises(StatusError):
+            async_to_sync(client_for(completions, max_retries=2).complete)([])
+        self.assertEqual(completions.calls, 3)
+
+    def test_concurrency_is_bounded_and_the_client_is_reused(self):
+        created = []
+        completions = FakeCompletions([], delay=0.02)
+
+        def factory():
+            created.append(1)
+            return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+        client = OpenAIClient(factory, max_concurrency=2)
+
+        async def burst():
+            return await asyncio.gather(*(client.complete([]) for _ in range(6)))
+
+        self.assertEqual(async_to_sync(burst)(), ["ok"] * 6)
+        self.assertEqual(completions.max_running, 2)
+        self.assertEqual(len(created), 1)
+
+    def test_streams_deltas_and_retries_before_the_first_one(self):
+        async def chunks():
+            for content in ["Hel", None, "lo"]:
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=None)
+            yield SimpleNamespace(choices=[], usage=SimpleNamespace(total_tokens=5))
+
+        completions = FakeCompletions([StatusError(429), chunks()])
+        client = client_for(completions)
+
+        async def collect():
+            return [delta async for delta in client.stream([])]
+
+        self.assertEqual(async_to_sync(collect)(), ["Hel", "lo"])
+        self.assertEqual(completions.calls, 2)
+
+    def test_clients_are_closed_when_their_loop_ends(self):
+        closed = []
+
+        class FakeClient:
+            chat = SimpleNamespace(completions=FakeCompletions([]))
+
+            async def close(self):
+                closed.append(self)
+
+        client = OpenAIClient(FakeClient, retry_base_delay=0.001)
+        self.assertEqual(async_to_sync(client.complete)([]), "ok")
+        self.assertEqual(async_to_sync(client.complete)([]), "ok")
+        self.assertEqual(len(closed), 2)
+        self.assertEqual(len(client._loops), 0)
+
+    def test_token_estimate(self):
+        self.assertEqual(estimate_tokens([{"role": "user", "content": "x" * 40}], max_tokens=900), 910)
+
+    def test_token_count_falls_back_to_the_length_without_tiktoken(self):
+        with patch("services.openai_client._encoding", return_value=None):
+            self.assertEqual(count_tokens("x" * 41), 11)
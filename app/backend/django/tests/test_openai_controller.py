@@ -0,0 +1,283 @@
+from django.test import SimpleTestCase, RequestFactory
+from django.core.cache import caches
+from unittest.mock import AsyncMock, patch
+from asgiref.sync import async_to_sync
+import asyncio
+import json
+import re
+
+from controller import OpenAIController
+from controller.OpenAIController import CitationParser
+from models.EntailmentModels import AbstractEntailmentModel
+
+
+async def deltas(*parts):
+    for part in parts:
+        yield part
+
+
+class CitationParserTest(SimpleTestCase):
+    def test_markers_split_across_deltas(self):
+        parser = CitationParser()
+        self.assertEqual(parser.feed("Coffee helps ([1"), [])
+        self.assertEqual(parser.feed("2], [4"), [12])
+        self.assertEqual(parser.feed("]) and [1, 4]."), [4, 1])
+        self.assertEqual(parser.feed(" Again [12] and [x]"), [])
+        self.assertEqual(parser.citations, [12, 4, 1])
+
+
+def clear_completion_cache():
+    OpenAIController.completion_cache.clear()
+    caches["llm_completions"].clear()
+
+
+class CompletionCacheTest(SimpleTestCase):
+    def setUp(self):
+        clear_completion_cache()
+
+    @patch('controller.OpenAIController.default_openai_client')
+    def test_identical_requests_are_answered_from_the_cache(self, client):
+        client.complete = AsyncMock(return_value="summary")
+        messages = [{"role": "user", "content": "coffee?"}]
+
+        self.assertEqual(async_to_sync(OpenAIController.coalescedCompletion)(messages), "summary")
+        self.assertEqual(async_to_sync(OpenAIController.coalescedCompletion)(messages), "summary")
+        self.assertEqual(client.complete.await_count, 1)
+
+        # Other parameters are other requests, and the shared tier outlives the in-process one
+        async_to_sync(OpenAIController.coalescedCompletion)(messages, max_tokens=100)
+        OpenAIController.completion_cache.clear()
+        async_to_sync(OpenAIController.coalescedCompletion)(messages)
+        self.assertEqual(client.complete.await_count, 2)
+
+    def test_prompts_number_documents_by_position(self):
+        messages = OpenAIController.summary_messages("q", [{"pmid": "7", "abstract": "a"}, {"pmid": "3", "abstract": "b"}])
+        self.assertEqual(messages[1]["content"], "Query: q\n\nDocuments:\nDocument 1:\na\n\nDocument 2:\nb\n\n")
+
+
+class StreamSummaryTest(SimpleTestCase):
+    def setUp(self):
+        clear_completion_cache()
+
+    @patch('controller.OpenAIController.default_openai_client')
+    def test_streams_deltas_and_citations(self, client):
+        client.stream = lambda messages, **kwargs: deltas("Yes ([", "2]).", " Also [1]")
+        request = RequestFactory().post(
+            "/openai/document-summary/stream",
+            data={"query": "coffee?", "documents": [{"pmid": "11", "abstract": "a"}, {"pmid": "22", "abstract": "b"}]},
+            content_type="application/json",
+        )
+
+        async def read():
+            response = await OpenAIController.stream_summary(request)
+            return response, b"".join([chunk async for chunk in response.streaming_content])
+
+        response, body = async_to_sync(read)()
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = [
+            (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in body.decode().strip().split("\n\n")
+        ]
+        self.assertEqual(events, [
+            ("delta", {"text": "Yes (["}),
+            ("delta", {"text": "2])."}),
+            ("citation", {"document": 2, "pmid": "22"}),
+            ("delta", {"text": " Also [1]"}),
+            ("citation", {"document": 1, "pmid": "11"}),
+            ("done", {"summary": "Yes ([2]). Also [1]", "citations": [2, 1]}),
+        ])
+
+    @patch('controller.OpenAIController.default_openai_client')
+    def test_a_cached_summary_is_replayed(self, client):
+        client.stream = lambda messages, **kwargs: deltas("Yes [1]")
+        documents = [{"pmid": "11", "abstract": "a"}]
+
+        async def events():
+            return [event async for event in OpenAIController.summary_events("coffee?", documents)]
+
+        first = async_to_sync(events)()
+        client.stream = None
+        self.assertEqual(async_to_sync(events)(), first)
+
+    def test_rejects_other_methods(self):
+        response = async_to_sync(OpenAIController.stream_summary)(RequestFactory().get("/openai/document-summary/stream"))
+        self.assertEqual(response.status_code, 405)
+
+
+def read_events(body: bytes):
+    return [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in body.decode().strip().split("\n\n")
+    ]
+
+
+class AnalysisTest(SimpleTestCase):
+    def post(self, data):
+        request = RequestFactory().post("/openai/analysis", data=data, content_type="application/json")
+
+        async def read():
+            response = await OpenAIController.analyze(request)
+            if response.status_code != 200:
+                return response, None
+            return response, b"".join([chunk async for chunk in response.streaming_content])
+
+        return async_to_sync(read)()
+
+    def test_parts_run_concurrently_and_stream_as_they_finish(self):
+        async def slow(result, delay):
+            await asyncio.sleep(delay)
+            return result
+
+        async def failing(query, documents):
+            await asyncio.sleep(0.02)
+            raise ValueError("rate limited")
+
+        analyses = {
+            "summary": lambda query, documents: slow({"summary": f"{query} {len(documents)}"}, 0.1),
+            "documentSummaries": lambda query, documents: slow({"documentSummaries": ["a"]}, 0.0),
+            "agreeableness": failing,
+        }
+        with patch.dict(OpenAIController.ANALYSES, analyses):
+            response, body = self.post({"query": "coffee?", "documents": [{"pmid": "11", "abstract": "a"}]})
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(read_events(body), [
+            ("documentSummaries", {"documentSummaries": ["a"]}),
+            ("error", {"part": "agreeableness", "error": "rate limited"}),
+            ("summary", {"summary": "coffee? 1"}),
+            ("done", {}),
+        ])
+
+    @patch('controller.OpenAIController.default_openai_client')
+    def test_one_upload_gives_the_results_of_the_separate_endpoints(self, client):
+        clear_completion_cache()
+        client.complete = AsyncMock(return_value="Document 1: Yes: 80%, No: 20%")
+        response, body = self.post({"query": "coffee?", "documents": [{"pmid": "11", "abstract": "a"}], "parts": ["agreeableness"]})
+
+        self.assertEqual(read_events(body), [
+            ("agreeableness", {"agreeableness": {"11": {"agree": 80, "disagree": 20}}}),
+            ("done", {}),
+        ])
+
+    def test_rejects_unknown_parts_and_other_methods(self):
+        for parts in (["summary", "verdict"], [], "summary", [["summary"]], None):
+            response, _ = self.post({"query": "q", "documents": [], "parts": parts})
+            self.assertEqual(response.status_code, 400)
+        response = async_to_sync(OpenAIController.analyze)(RequestFactory().get("/openai/analysis"))
+        self.assertEqual(response.status_code, 405)
+
+
+# Budgets below are in tokens as counted without tiktoken (4 characters each)
+@patch('services.openai_client._encoding', return_value=None)
+class MapReduceSummaryTest(SimpleTestCase):
+    def setUp(self):
+        clear_completion_cache()
+
+    def test_chunks_keep_the_global_numbering(self, _):
+        docs = ["x" * 40, "y" * 40, "z" * 400, "w" * 8]
+        chunks = OpenAIController.chunk_documents(docs, budget=30)
+        self.assertEqual([[number for number, _ in chunk] for chunk in chunks], [[1, 2], [3], [4]])
+        self.assertIn("Document 3:\n" + "z" * 400, OpenAIController.findings_messages("q", chunks[1])[1]["content"])
+
+    def test_small_sets_are_summarized_in_one_call(self, _):
+        documents = [{"pmid": "1", "abstract": "a"}]
+        messages = async_to_sync(OpenAIController.summary_prompt)("q", documents)
+        self.assertEqual(messages, OpenAIController.summary_messages("q", documents))
+
+    @patch.multiple('controller.OpenAIController', SUMMARY_DOCUMENT_TOKEN_BUDGET=60, SUMMARY_CHUNK_TOKEN_BUDGET=50)
+    @patch('controller.OpenAIController.default_openai_client')
+    def test_large_sets_are_summarized_from_chunk_findings(self, client, _):
+        running = [0, 0]
+
+        async def complete(messages, **kwargs):
+            numbers = re.findall(r"Document (\d+):", messages[1]["content"])
+            running[0] += 1
+            running[1] = max(running)
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+            return f"- finding ([{'], ['.join(numbers)}])\n"
+
+        client.complete = AsyncMock(side_effect=complete)
+        documents = [{"pmid": str(i), "abstract": f"abstract {i} " + "x" * 60} for i in range(1, 6)]
+
+        messages = async_to_sync(OpenAIController.summary_prompt)("coffee?", documents)
+
+        # One call per chunk, all at once
+        self.assertEqual(client.complete.await_count, 3)
+        self.assertEqual(running[1], 3)
+        self.assertIs(messages[0], OpenAIController.SUMMARY_SYSTEM_MESSAGE)
+        self.assertTrue(messages[1]["content"].startswith("Query: coffee?\n\nFindings of 5 documents"))
+        self.assertIn("- finding ([1], [2])\n- finding ([3], [4])\n- finding ([5])", messages[1]["content"])
+
+
+    @patch.multiple('controller.OpenAIController', SUMMARY_DOCUMENT_TOKEN_BUDGET=60, SUMMARY_CHUNK_TOKEN_BUDGET=50)
+    @patch('controller.OpenAIController.default_openai_client')
+    def test_findings_over_the_budget_are_merged(self, client, _):
+        async def complete(messages, **kwargs):
+            if "Merge the findings" in messages[0]["content"]:
+                cited = re.findall(r"\[(\d+)\]", messages[1]["content"])
+                return f"- merged ([{'], ['.join(cited)}])"
+            numbers = re.findall(r"Document (\d+):", messages[1]["content"])
+            # 25 tokens each, so the three findings exceed the budget and the first two fit one group
+            return f"- finding ([{'], ['.join(numbers)}])".ljust(100, ".")
+
+        client.complete = AsyncMock(side_effect=complete)
+        documents = [{"pmid": str(i), "abstract": f"abstract {i} " + "x" * 60} for i in range(1, 6)]
+
+        messages = async_to_sync(OpenAIController.summary_prompt)("coffee?", documents)
+
+        self.assertEqual(client.complete.await_count, 5)
+        self.assertTrue(messages[1]["content"].endswith("- merged ([1], [2], [3], [4])\n- merged ([5])"))
+
+class FakeEntailmentModel:
+    """Entailment by the relevant sentence: 'yes' entails, 'no' contradicts, anything else is neutral."""
+    identifier = "fake-nli"
+
+    def predict_batch(self, pairs, batch_size=16):
+        probabilities = {"yes": (0.05, 0.9, 0.05), "no": (0.8, 0.1, 0.1)}
+        return [
+            AbstractEntailmentModel.Prediction(*probabilities.get(sentence, (0.2, 0.3, 0.5)))
+            for sentence, _ in pairs
+        ]
+
+
+@patch('controller.QueryController.default_entailmentModel_instance', new=FakeEntailmentModel())
+@patch('controller.QueryController.findRelevantSentences', side_effect=lambda query, abstracts, **kwargs: [(a, 0.5) for a in abstracts])
+@patch('controller.OpenAIController.default_openai_client')
+class LocalAgreeablenessTest(SimpleTestCase):
+    documents = [{"pmid": "1", "abstract": "yes"}, {"pmid": "2", "abstract": "no"}, {"pmid": "3", "abstract": "maybe"}, {"abstract": "yes"}]
+
+    def setUp(self):
+        clear_completion_cache()
+
+    def test_local_mode_needs_no_completion(self, client, *_):
+        client.complete = AsyncMock()
+        result = async_to_sync(OpenAIController.assess_agreeableness)("q", self.documents, "local")
+
+        self.assertEqual(result, {"agreeableness": {
+            "1": {"agree": 95, "disagree": 5},
+            "2": {"agree": 11, "disagree": 89},
+            "3": {"agree": 60, "disagree": 40},
+        }})
+        client.complete.assert_not_awaited()
+
+    def test_hybrid_mode_escalates_uncertain_documents(self, client, *_):
+        client.complete = AsyncMock(return_value="Document 1: Yes: 30%, No: 70%")
+        result = async_to_sync(OpenAIController.assess_agreeableness)("q", self.documents, "hybrid")
+
+        self.assertEqual(result["agreeableness"]["3"], {"agree": 30, "disagree": 70})
+        self.assertEqual(result["agreeableness"]["1"], {"agree": 95, "disagree": 5})
+        prompt = client.complete.await_args.args[0][1]["content"]
+        self.assertIn("Document 1:\nmaybe", prompt)
+        self.assertNotIn("Document 2:", prompt)
+
+    def test_hybrid_mode_keeps_local_ratings_if_the_completion_fails(self, client, *_):
+        client.complete = AsyncMock(side_effect=RuntimeError("unavailable"))
+        result = async_to_sync(OpenAIController.assess_agreeableness)("q", self.documents, "hybrid")
+        self.assertEqual(result["agreeableness"]["3"], {"agree": 60, "disagree": 40})
+
+    def test_unknown_modes_are_rejected(self, client, *_):
+        request = RequestFactory().post(
+            "/openai/agreeableness", data={"query": "q", "documents": [], "mode": "fast"}, content_type="application/json"
+        )
+        self.assertEqual(OpenAIController.get_agreeableness(request).status_code, 400)
@@ -0,0 +1,74 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+import os
+import tempfile
+
+from services.pubmed_parser import PubmedArticleParser, iterparse_articles, parse_articles
+
+EFETCH_XML = b"""<?xml version="1.0"?>
+<PubmedArticleSet>
+  <PubmedArticle><MedlineCitation><PMID>21</PMID><Article>
+    <Journal><JournalIssue><PubDate><Year>2019</Year></PubDate></JournalIssue></Journal>
+    <ArticleTitle>Effect of <i>E. coli</i> on outcomes</ArticleTitle>
+    <Abstract>
+      <AbstractText Label="METHODS">Dose of 5 mg/m<sup>2</sup> daily.</AbstractText>
+      <AbstractText Label="RESULTS">Improved.</AbstractText>
+    </Abstract>
+    <OtherAbstract><AbstractText>Translated abstract.</AbstractText></OtherAbstract>
+  </Article></MedlineCitation>
+  <PubmedData><ReferenceList><Reference><ArticleIdList><PMID>99</PMID></ArticleIdList></Reference></ReferenceList></PubmedData>
+  </PubmedArticle>
+  <PubmedArticle><MedlineCitation><PMID>22</PMID><Article>
+    <ArticleTitle>No abstract</ArticleTitle>
+  </Article></MedlineCitation></PubmedArticle>
+</PubmedArticleSet>"""
+
+
+class PubmedParserTest(SimpleTestCase):
+    def test_parses_fields_including_inline_markup(self):
+        first, second = parse_articles(EFETCH_XML)
+
+        self.assertEqual(first.pmid, "21")
+        self.assertEqual(first.title, "Effect of E. coli on outcomes")
+        self.assertEqual(first.sections, [("METHODS", "Dose of 5 mg/m2 daily."), ("RESULTS", "Improved.")])
+        self.assertEqual(first.year, "2019")
+        self.assertIsNone(first.xml)
+        self.assertEqual((second.pmid, second.sections, second.firstAbstractText), ("22", [], None))
+
+    def test_records_are_yielded_as_bytes_arrive(self):
+        parser = PubmedArticleParser(keep_xml=True)
+        split = EFETCH_XML.index(b"<PubmedArticle><MedlineCitation><PMID>22")
+
+        first = parser.feed(EFETCH_XML[:split])
+        self.assertEqual([record.pmid for record in first], ["21"])
+        self.assertIn(b"<PMID>21</PMID>", first[0].xml)
+
+        rest = []
+        for start in range(split, len(EFETCH_XML), 7):
+            rest.extend(parser.feed(EFETCH_XML[start:start + 7]))
+        rest.extend(parser.close())
+        self.assertEqual([record.pmid for record in rest], ["22"])
+
+    def test_finished_articles_are_released(self):
+        parser = PubmedArticleParser()
+        parser.feed(EFETCH_XML)
+        self.assertEqual(len(parser._root), 0)
+
+    def test_files_are_closed_after_parsing(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "efetch.xml")
+        with open(path, "wb") as f:
+            f.write(EFETCH_XML)
+        opened = []
+
+        def tracked_open(*args, **kwargs):
+            opened.append(open(*args, **kwargs))
+            return opened[-1]
+
+        with patch('services.pubmed_parser.open', tracked_open, create=True):
+            self.assertEqual([record.pmid for record in iterparse_articles(path)], ["21", "22"])
+            records = iterparse_articles(path)
+            next(records)
+            records.close()
+        self.assertEqual([f.closed for f in opened], [True, True])
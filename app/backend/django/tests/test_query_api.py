@@ -0,0 +1,327 @@
+from django.test import SimpleTestCase, RequestFactory
+from django.core.cache import caches
+from unittest.mock import patch, AsyncMock, MagicMock
+from asgiref.sync import async_to_sync
+import numpy as np
+import asyncio
+
+from controller import QueryController
+from models.RelevantSentences import splitSentences
+from services.article_store import ArticleStore
+from services.event_stream import format_stream_event
+import tempfile
+import os
+
+EFETCH_XML = b"""<?xml version="1.0"?>
+<PubmedArticleSet>
+  <PubmedArticle><MedlineCitation><PMID>1</PMID><Article>
+    <ArticleTitle>Far</ArticleTitle>
+    <Abstract><AbstractText>Unrelated abstract.</AbstractText></Abstract>
+  </Article></MedlineCitation><PubDate><Year>2001</Year></PubDate></PubmedArticle>
+  <PubmedArticle><MedlineCitation><PMID>2</PMID><Article>
+    <ArticleTitle>Close</ArticleTitle>
+    <Abstract><AbstractText Label="RESULTS">Relevant abstract.</AbstractText></Abstract>
+  </Article></MedlineCitation><PubDate><Year>2002</Year></PubDate></PubmedArticle>
+  <PubmedArticle><MedlineCitation><PMID>3</PMID><Article>
+    <ArticleTitle>Middle</ArticleTitle>
+    <Abstract><AbstractText>Somewhat relevant abstract.</AbstractText></Abstract>
+  </Article></MedlineCitation><PubDate><Year>2003</Year></PubDate></PubmedArticle>
+</PubmedArticleSet>"""
+
+
+def efetch_xml_for(pmids):
+    """Return only the articles of EFETCH_XML whose PMID was requested."""
+    articles = EFETCH_XML.split(b"<PubmedArticle>")[1:]
+    selected = [article for article in articles if any(f"<PMID>{pmid}</PMID>".encode() in article for pmid in pmids)]
+    return b"<PubmedArticleSet><PubmedArticle>" + b"<PubmedArticle>".join(selected).replace(b"</PubmedArticleSet>", b"") + b"</PubmedArticleSet>"
+
+
+async def stream_of(content, chunk_size=64):
+    for start in range(0, len(content), chunk_size):
+        yield content[start:start + chunk_size]
+
+
+class RankBySimilarityTest(SimpleTestCase):
+    def test_matches_pairwise_cosine_ranking(self):
+        rng = np.random.default_rng(0)
+        doc_embeddings = rng.normal(size=(40, 16)).astype(np.float32)
+        query_embedding = rng.normal(size=16).tolist()
+
+        indices, similarities = QueryController.rank_by_similarity(query_embedding, doc_embeddings, 10)
+
+        expected = sorted(
+            range(len(doc_embeddings)),
+            key=lambda i: -QueryController.cosine_similarity(query_embedding, doc_embeddings[i])
+        )[:10]
+        self.assertEqual(list(indices), expected)
+        for idx, similarity in zip(indices, similarities):
+            self.assertAlmostEqual(
+                float(similarity),
+                float(QueryController.cosine_similarity(query_embedding, doc_embeddings[idx])),
+                places=5
+            )
+
+    def test_empty_candidates(self):
+        indices, similarities = QueryController.rank_by_similarity([1.0, 0.0], np.zeros((0, 2)), 5)
+        self.assertEqual(len(indices), 0)
+        self.assertEqual(len(similarities), 0)
+
+
+class FakeSentenceModel:
+    identifier = "fake-model"
+    vectors = {
+        "query": [1.0, 0.0],
+        "Off topic.": [0.0, 1.0],
+        "On topic!": [1.0, 0.2],
+        "Close to topic?": [1.0, 0.5],
+        "Nothing here.": [-1.0, 0.0],
+    }
+
+    def embedText(self, text):
+        return self.vectors[text]
+
+    def embedTexts(self, texts, batch_size=32, pmids=None):
+        return np.array([self.vectors[text] for text in texts], dtype=np.float32)
+
+    def unitCosineSimilarity(self, text1, text2, prune=True):
+        return (QueryController.cosine_similarity(self.vectors[text1], self.vectors[text2]) + 1) / 2
+
+
+class RelevantSectionTest(SimpleTestCase):
+    @patch('models.RelevantSentences.default_embeddingModel_instance', new_callable=FakeSentenceModel)
+    def test_batched_sections_match_sentence_by_sentence_search(self, model):
+        abstracts = ["Off topic. On topic! Close to topic?", "Nothing here. Off topic."]
+
+        with patch.object(model, 'embedTexts', wraps=model.embedTexts) as embed_texts:
+            sections = QueryController.RelevantSection.forAbstracts("query", abstracts)
+
+        embed_texts.assert_called_once()
+        for abstract, section in zip(abstracts, sections):
+            expected = max(splitSentences(abstract), key=lambda sentence: model.unitCosineSimilarity("query", sentence))
+            self.assertEqual(section.mostRelevantSentence, expected)
+            self.assertAlmostEqual(section.similarityScore, model.unitCosineSimilarity("query", expected), places=5)
+
+
+class PubMedMockMixin:
+    """Routes the controller and the article store to one mocked PubMed client and an empty temporary store."""
+
+    def setUp(self):
+        self.client_mock = MagicMock()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = ArticleStore(os.path.join(directory.name, "articles.sqlite3"), ttl_seconds=3600)
+        for target, value in [
+            ('controller.QueryController.default_pubmed_client', self.client_mock),
+            ('services.article_store.default_pubmed_client', self.client_mock),
+            ('controller.QueryController.default_article_store', store),
+            ('services.article_store.default_article_store', store),
+        ]:
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class BaseQueryResultsTest(PubMedMockMixin, SimpleTestCase):
+    @patch('controller.QueryController.extract_keywords', return_value="query")
+    @patch('controller.QueryController.get_embedding', return_value=[1.0, 0.0])
+    @patch('controller.QueryController.get_embeddings')
+    def test_ranks_candidates_in_one_batch(self, mock_embeddings, mock_embedding, mock_keywords):
+        mock_client = self.client_mock
+        mock_client.esearch = AsyncMock(return_value=["1", "2", "3"])
+        mock_client.efetch_stream = MagicMock(side_effect=lambda pmids: stream_of(EFETCH_XML))
+        mock_client.fetch_icite = AsyncMock(return_value={"data": [{"pmid": 2, "citation_count": 7}]})
+        embeddings = np.array([[0.0, 1.0], [1.0, 0.1], [1.0, 1.0]], dtype=np.float32)
+        loop_threads = []
+
+        def embed(*args, **kwargs):
+            # Model calls must not run on (and block) the event loop
+            try:
+                asyncio.get_running_loop()
+                loop_threads.append(True)
+            except RuntimeError:
+                pass
+            return embeddings
+
+        mock_embeddings.side_effect = embed
+
+        results = async_to_sync(QueryController.get_base_query_results)("query", {"max_results": 2})
+        self.assertEqual(loop_threads, [])
+
+        mock_keywords.assert_called_once_with("query", {"max_results": 2}, [1.0, 0.0])
+        mock_client.esearch.assert_awaited_once_with("query", retmax=32)
+        mock_embeddings.assert_called_once_with(
+            ["Unrelated abstract.", "RESULTS: Relevant abstract.", "Somewhat relevant abstract."],
+            pmids=["1", "2", "3"]
+        )
+        mock_client.fetch_icite.assert_awaited_once_with(["2", "3"])
+        self.assertEqual([doc["pmid"] for doc in results], ["2", "3"])
+        self.assertGreater(results[0]["similarity"], results[1]["similarity"])
+        self.assertEqual(results[0]["citations"], {"total": 7})
+        self.assertEqual(results[1]["citations"], {"total": 0})
+
+
+class QueryCoalescingTest(SimpleTestCase):
+    def setUp(self):
+        caches["query_results"].clear()
+
+    def test_identical_concurrent_queries_run_the_pipeline_once(self):
+        calls = []
+
+        async def pipeline(queryText, filters):
+            calls.append(queryText)
+            await asyncio.sleep(0.05)
+            return [{"pmid": "1"}]
+
+        async def run():
+            requests = [RequestFactory().get("/query/x/") for _ in range(3)]
+            return await asyncio.gather(
+                QueryController.queryDocuments(requests[0], "Coffee  and sleep"),
+                QueryController.queryDocuments(requests[1], "coffee and sleep"),
+                QueryController.queryDocuments(requests[2], "coffee and tea"),
+            )
+
+        with patch('controller.QueryController.get_base_query_results', side_effect=pipeline):
+            responses = async_to_sync(run)()
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual({response.content for response in responses}, {b'{"documents": [{"pmid": "1"}]}'})
+
+        # A later user asking the same question is served from the shared result cache
+        with patch('controller.QueryController.get_base_query_results', side_effect=pipeline):
+            response = async_to_sync(QueryController.queryDocuments)(RequestFactory().get("/query/x/"), "coffee and sleep")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(response.content, b'{"documents": [{"pmid": "1"}]}')
+        self.assertEqual(
+            QueryController.query_key(" Coffee and  SLEEP", {"max_results": 20}),
+            QueryController.query_key("coffee and sleep", {"max_results": 20})
+        )
+
+
+class ExtractKeywordsTest(SimpleTestCase):
+    def setUp(self):
+        caches["mesh_terms"].clear()
+        QueryController.mesh_link_cache.clear()
+        # No MeSH concept index; the dictionary links nothing unless a test says otherwise
+        self.linker = MagicMock(spec=["link"])
+        self.dictionary = MagicMock(spec=["link"])
+        self.dictionary.link.return_value = []
+        for name, new in [
+            ("default_meshConceptIndex_instance", None),
+            ("default_meshDictionary_instance", self.dictionary),
+            ("default_entityLinker_instance", self.linker),
+        ]:
+            patcher = patch(f'controller.QueryController.{name}', new=new)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_links_each_query_text_once(self):
+        self.linker.link.return_value = [("coffee", ["coffee"]), ("sleep", [])]
+
+        query = QueryController.extract_keywords("coffee  and sleep", {"publication_types": ["review"]})
+        self.assertEqual(query, '(coffee) AND sleep AND ("review"[Publication Type])')
+
+        # Other filters reuse the linked entities, in this process and in others sharing the 'mesh_terms' cache
+        query = QueryController.extract_keywords("coffee and sleep", {"min_year": "2000", "max_year": "2010"})
+        self.assertEqual(query, "(coffee) AND sleep AND 2000:2010[Date - Publication]")
+        QueryController.mesh_link_cache.clear()
+        QueryController.extract_keywords("coffee and sleep", {})
+        self.linker.link.assert_called_once_with("coffee and sleep")
+
+    def test_dictionary_fast_path_falls_back_to_linker(self):
+        self.dictionary.link.side_effect = lambda text: [("aspirin", ["aspirin"])] if "aspirin" in text else []
+        self.linker.link.return_value = [("tea", [])]
+
+        self.assertEqual(QueryController.extract_keywords("aspirin for headache", {}), "(aspirin)")
+        self.linker.link.assert_not_called()
+        self.assertEqual(QueryController.extract_keywords("green tea", {}), "tea")
+        self.linker.link.assert_called_once_with("green tea")
+
+
+    def test_concept_index_expands_the_query(self):
+        index = MagicMock(spec=["link", "configuredIdentifier"], configuredIdentifier="mesh-index")
+        index.link.side_effect = lambda text, embedding=None: [(text, []), (text, ["coffee", "caffeine"])]
+
+        with patch('controller.QueryController.default_meshConceptIndex_instance', new=index):
+            query = QueryController.extract_keywords("morning coffee", {}, query_embedding=[1.0, 0.0])
+        self.assertEqual(query, "morning coffee AND (coffee OR caffeine)")
+        index.link.assert_called_once_with("morning coffee", embedding=[1.0, 0.0])
+        self.linker.link.assert_not_called()
+
+    def test_links_of_another_index_configuration_are_not_reused(self):
+        links = lambda text, embedding=None: [(text, []), (text, ["coffee"])]
+        first = MagicMock(spec=["link", "configuredIdentifier"], configuredIdentifier="mesh-index:model:k=5:min_similarity=0.5")
+        second = MagicMock(spec=["link", "configuredIdentifier"], configuredIdentifier="mesh-index:model:k=2:min_similarity=0.5")
+        first.link.side_effect = second.link.side_effect = links
+
+        for index in (first, second, first):
+            with patch('controller.QueryController.default_meshConceptIndex_instance', new=index):
+                QueryController.extract_keywords("coffee", {})
+        first.link.assert_called_once()
+        second.link.assert_called_once()
+
+class StreamQueryResultsTest(PubMedMockMixin, SimpleTestCase):
+    @patch('controller.QueryController.STREAM_EFETCH_BATCH_SIZE', 2)
+    @patch('controller.QueryController.RelevantSection.forAbstracts')
+    @patch('controller.QueryController.extract_keywords', return_value="query")
+    @patch('controller.QueryController.get_embedding', return_value=[1.0, 0.0])
+    @patch('controller.QueryController.get_embeddings')
+    def test_streams_documents_then_later_stages(self, mock_embeddings, mock_embedding, mock_keywords, mock_sections):
+        mock_client = self.client_mock
+        vectors = {"1": [0.0, 1.0], "2": [1.0, 0.1], "3": [1.0, 1.0]}
+        mock_client.esearch = AsyncMock(return_value=["1", "2", "3"])
+        mock_client.efetch_stream = MagicMock(side_effect=lambda pmids: stream_of(efetch_xml_for(pmids)))
+        mock_client.fetch_icite = AsyncMock(return_value={"data": [{"pmid": 2, "citation_count": 7}]})
+        mock_embeddings.side_effect = lambda texts, pmids: np.array([vectors[pmid] for pmid in pmids], dtype=np.float32)
+        mock_sections.side_effect = lambda query, abstracts, query_embedding=None: [
+            MagicMock(mostRelevantSentence=abstract) for abstract in abstracts
+        ]
+
+        async def collect():
+            return [event async for event in QueryController.stream_base_query_results("query", {"max_results": 2})]
+        events = async_to_sync(collect)()
+
+        self.assertCountEqual([call.args[0] for call in mock_client.efetch_stream.call_args_list], [["1", "2"], ["3"]])
+        names = [event["event"] for event in events]
+        self.assertEqual(names[-4:], ["ranking", "citations", "relevantSections", "done"])
+        self.assertEqual(names[:-4], ["documents", "documents"])
+        self.assertCountEqual([doc["pmid"] for event in events[:2] for doc in event["documents"]], ["1", "2", "3"])
+        self.assertEqual(events[-4]["pmids"], ["2", "3"])
+        self.assertEqual(events[-3]["citations"], {"2": {"total": 7}, "3": {"total": 0}})
+        self.assertEqual(events[-2]["relevantSections"]["2"]["mostRelevantSentence"], "RESULTS: Relevant abstract.")
+
+    @patch('controller.QueryController.STREAM_EFETCH_BATCH_SIZE', 2)
+    @patch('controller.QueryController.extract_keywords', return_value="query")
+    @patch('controller.QueryController.get_embedding', return_value=[1.0, 0.0])
+    @patch('controller.QueryController.get_embeddings', side_effect=lambda texts, pmids: np.ones((len(texts), 2), dtype=np.float32))
+    def test_batches_in_flight_are_cancelled_when_the_client_leaves(self, *_):
+        cancelled = []
+
+        async def stalled(pmids):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(pmids)
+                raise
+            yield b""
+
+        self.client_mock.esearch = AsyncMock(return_value=["1", "2", "3"])
+        self.client_mock.efetch_stream = MagicMock(
+            side_effect=lambda pmids: stream_of(efetch_xml_for(pmids)) if "1" in pmids else stalled(pmids)
+        )
+
+        async def first_event():
+            events = QueryController.stream_base_query_results("query", {"max_results": 2})
+            event = await events.__anext__()
+            await events.aclose()
+            # Let the cancellation reach the stalled batch; the loop itself is still running
+            await asyncio.sleep(0)
+            return event, list(cancelled)
+
+        event, cancelled_before_the_loop_ends = async_to_sync(first_event)()
+        self.assertEqual(event["event"], "documents")
+        self.assertEqual(cancelled_before_the_loop_ends, [["3"]])
+
+    def test_formats_ndjson_and_sse(self):
+        event = {"event": "ranking", "pmids": ["2"]}
+        self.assertEqual(format_stream_event(event, "ndjson"), b'{"event": "ranking", "pmids": ["2"]}\n')
+        self.assertEqual(format_stream_event(event, "sse"), b'event: ranking\ndata: {"pmids": ["2"]}\n\n')
@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase
+from django.core.cache import caches
+from asgiref.sync import async_to_sync
+from unittest.mock import patch
+import threading
+import time
+
+from services.result_cache import StaleWhileRevalidateCache
+
+
+class StaleWhileRevalidateCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches["query_results"].clear()
+        self.calls = []
+        self.refreshed = threading.Event()
+
+    async def compute(self):
+        self.calls.append(1)
+        self.refreshed.set()
+        return [{"pmid": str(len(self.calls))}]
+
+    def test_miss_is_computed_then_served_from_cache(self):
+        cache = StaleWhileRevalidateCache("query_results", ttl=60, stale_ttl=60)
+
+        first = async_to_sync(cache.get_or_compute)("key", self.compute)
+        second = async_to_sync(cache.get_or_compute)("key", self.compute)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        cache = StaleWhileRevalidateCache("query_results", ttl=60, stale_ttl=600)
+        async_to_sync(cache.get_or_compute)("key", self.compute)
+        self.refreshed.clear()
+
+        with patch("services.result_cache.time.time", return_value=time.time() + 120):
+            stale = async_to_sync(cache.get_or_compute)("key", self.compute)
+            self.assertEqual(stale, [{"pmid": "1"}])
+            self.assertTrue(self.refreshed.wait(5))
+
+        for _ in range(100):
+            if caches["query_results"].get("key:refreshing") is None:
+                break
+            time.sleep(0.01)
+        self.assertEqual(async_to_sync(cache.get_or_compute)("key", self.compute), [{"pmid": "2"}])
+        self.assertEqual(len(self.calls), 2)
+
+    def test_empty_results_and_disabled_cache_are_not_stored(self):
+        async def empty():
+            self.calls.append(1)
+            return []
+
+        cache = StaleWhileRevalidateCache("query_results", ttl=60, stale_ttl=60)
+        async_to_sync(cache.get_or_compute)("key", empty)
+        async_to_sync(cache.get_or_compute)("key", empty)
+        self.assertEqual(len(self.calls), 2)
+
+        disabled = StaleWhileRevalidateCache("query_results", ttl=60, stale_ttl=60, enabled=False)
+        async_to_sync(disabled.get_or_compute)("other", self.compute)
+        self.assertIsNone(caches["query_results"].get("other"))
@@ -0,0 +1,88 @@
+from django.test import SimpleTestCase
+from asgiref.sync import async_to_sync
+import asyncio
+import threading
+
+from services.singleflight import SingleFlight, request_key
+
+
+class SingleFlightTest(SimpleTestCase):
+    def test_concurrent_calls_share_one_computation(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return ["result"]
+
+        async def run():
+            return await asyncio.gather(*[flight.do("key", compute) for _ in range(5)])
+
+        results = async_to_sync(run)()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight.inflight(), 0)
+
+    def test_errors_reach_every_caller_and_are_not_kept(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream down")
+
+        async def run():
+            return await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+
+        results = async_to_sync(run)()
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+        async def succeed():
+            return "ok"
+        self.assertEqual(async_to_sync(flight.do)("key", succeed), "ok")
+
+    def test_waiting_caller_takes_over_when_leader_is_cancelled(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        async def run():
+            leader = asyncio.ensure_future(flight.do("key", compute))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.do("key", compute))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        self.assertEqual(async_to_sync(run)(), 2)
+
+    def test_callers_on_different_event_loops_are_coalesced(self):
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        async def compute():
+            calls.append(1)
+            started.set()
+            await asyncio.sleep(0.1)
+            return "shared"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(asyncio.run(flight.do("key", compute))))]
+        threads[0].start()
+        started.wait()
+        threads.append(threading.Thread(target=lambda: results.append(asyncio.run(flight.do("key", compute)))))
+        threads[1].start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["shared", "shared"])
+        self.assertEqual(len(calls), 1)
+
+    def test_request_key_ignores_dict_order(self):
+        self.assertEqual(request_key("q", {"a": 1, "b": [2]}), request_key("q", {"b": [2], "a": 1}))
+        self.assertNotEqual(request_key("q", {"a": 1}), request_key("q", {"a": 2}))
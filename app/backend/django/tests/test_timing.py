@@ -0,0 +1,55 @@
+from django.test import SimpleTestCase, RequestFactory
+from django.http import HttpResponse
+from asgiref.sync import async_to_sync
+
+from services.timing import Histogram, ServerTimingMiddleware, server_timing_header, stage
+from controller.MetricsController import metrics
+
+
+class HistogramTest(SimpleTestCase):
+    def test_renders_cumulative_buckets(self):
+        histogram = Histogram("test_seconds", "Test.", label="stage", buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe("esearch", seconds)
+
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{stage="esearch",le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="esearch",le="1.0"} 3', lines)
+        self.assertIn('test_seconds_bucket{stage="esearch",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_count{stage="esearch"} 4', lines)
+
+
+class ServerTimingMiddlewareTest(SimpleTestCase):
+    def test_sync_view_stages_become_header(self):
+        def view(request):
+            with stage("extract_keywords"):
+                pass
+
+            # Stages timed inside async_to_sync are recorded for the same request
+            async def fetch():
+                with stage("esearch"):
+                    pass
+            async_to_sync(fetch)()
+            return HttpResponse("ok")
+
+        response = ServerTimingMiddleware(view)(RequestFactory().get("/query/x/"))
+        names = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+        self.assertEqual(names, ["extract_keywords", "esearch", "total"])
+
+    def test_async_view(self):
+        async def view(request):
+            with stage("icite"):
+                pass
+            return HttpResponse("ok")
+
+        middleware = ServerTimingMiddleware(view)
+        response = async_to_sync(middleware)(RequestFactory().get("/query/x/"))
+        self.assertTrue(response["Server-Timing"].startswith("icite;dur="))
+
+    def test_header_format_and_metrics_view(self):
+        self.assertEqual(server_timing_header([("embed query", 0.0123)], 0.5), "embed_query;dur=12.3, total;dur=500.0")
+
+        with stage("rank"):
+            pass
+        response = metrics(RequestFactory().get("/metrics"))
+        self.assertIn(b'seba_stage_duration_seconds_count{stage="rank"}', response.content)